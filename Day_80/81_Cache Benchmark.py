@@ -0,0 +1,239 @@
+"""
+Project 81 — Cache Trace Replay & Hit-Ratio Benchmark
+
+Replays a key trace against the LRU + TTL cache engine and prints one JSON
+document, so runs with different capacity / policy / storage settings can be
+diffed or plotted.
+
+Run:
+    python "81_Cache Benchmark.py" --trace zipf --ops 200000 --capacity 5000
+    python "81_Cache Benchmark.py" --trace scan --policy tinylfu --threads 4
+    python "81_Cache Benchmark.py" --trace file --trace-file keys.txt --ttl 30
+
+Traces:
+    zipf  keys drawn from a Zipf(s) distribution over --keys distinct keys
+    scan  zipf traffic with a one-off sequential scan in the middle
+    loop  keys 0..keys-1 repeated in order
+    file  recorded trace, one "key", "get key" or "set key" per line
+
+Every GET that misses is followed by a SET (read-through), so the hit ratio
+is what a cache-aside caller would see.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import resource
+import threading
+import importlib.util
+from itertools import accumulate
+
+
+CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                          "81_LRU + TTL Cache Engine .py")
+
+
+def load_cache_module():
+    spec = importlib.util.spec_from_file_location("cache_engine", CACHE_FILE)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# -------------------------
+# Traces
+# -------------------------
+def zipf_keys(n_ops, n_keys, s, rng):
+    cum = list(accumulate(1.0 / (k ** s) for k in range(1, n_keys + 1)))
+    return rng.choices(range(n_keys), cum_weights=cum, k=n_ops)
+
+
+def scan_keys(n_ops, n_keys, s, rng, scan_fraction=0.2):
+    trace = zipf_keys(n_ops, n_keys, s, rng)
+    start = int(n_ops * (0.5 - scan_fraction / 2))
+    end = int(n_ops * (0.5 + scan_fraction / 2))
+    # scan keys live outside the zipf key space, so they are all cold
+    for i in range(start, end):
+        trace[i] = n_keys + i
+    return trace
+
+
+def loop_keys(n_ops, n_keys):
+    return [i % n_keys for i in range(n_ops)]
+
+
+def read_trace(path):
+    ops = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            parts = line.split()
+            if not parts:
+                continue
+            if len(parts) == 1:
+                ops.append(("get", parts[0]))
+            else:
+                ops.append((parts[0].lower(), parts[1]))
+    return ops
+
+
+def build_trace(args):
+    rng = random.Random(args.seed)
+    if args.trace == "file":
+        return read_trace(args.trace_file)
+    if args.trace == "zipf":
+        keys = zipf_keys(args.ops, args.keys, args.zipf_s, rng)
+    elif args.trace == "scan":
+        keys = scan_keys(args.ops, args.keys, args.zipf_s, rng)
+    else:
+        keys = loop_keys(args.ops, args.keys)
+    return [("get", k) for k in keys]
+
+
+# -------------------------
+# Replay
+# -------------------------
+def build_cache(module, args):
+    if args.shards > 1:
+        return module.ShardedLRUCache(
+            capacity=args.capacity, shards=args.shards,
+            storage=args.storage, policy=args.policy,
+        )
+    if args.storage == "compact":
+        return module.CompactLRUCache(capacity=args.capacity)
+    return module.LRUCache(capacity=args.capacity, policy=args.policy)
+
+
+def replay(cache, ops, ttl, result):
+    get_lat, set_lat = result["get"], result["set"]
+    hits = misses = 0
+    clock = time.perf_counter_ns
+
+    for op, key in ops:
+        if op == "set":
+            t0 = clock()
+            cache.set(key, key, ttl)
+            set_lat.append(clock() - t0)
+            continue
+
+        t0 = clock()
+        value = cache.get(key)
+        get_lat.append(clock() - t0)
+        if value is not None:
+            hits += 1
+            continue
+
+        misses += 1
+        t0 = clock()
+        cache.set(key, key, ttl)
+        set_lat.append(clock() - t0)
+
+    result["hits"] = hits
+    result["misses"] = misses
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def latency_summary(samples_ns):
+    samples_ns.sort()
+    return {
+        "count": len(samples_ns),
+        "p50_us": round(percentile(samples_ns, 0.50) / 1000, 3),
+        "p99_us": round(percentile(samples_ns, 0.99) / 1000, 3),
+    }
+
+
+def peak_rss_kb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == "darwin" else rss
+
+
+def run_benchmark(args):
+    module = load_cache_module()
+    ops = build_trace(args)
+    cache = build_cache(module, args)
+    ttl = args.ttl or None
+
+    # Round-robin stripes keep each thread's slice in roughly trace order.
+    results = [{"get": [], "set": []} for _ in range(args.threads)]
+    workers = [
+        threading.Thread(target=replay,
+                         args=(cache, ops[i::args.threads], ttl, results[i]))
+        for i in range(args.threads)
+    ]
+
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    hits = sum(r["hits"] for r in results)
+    misses = sum(r["misses"] for r in results)
+    get_lat = [x for r in results for x in r["get"]]
+    set_lat = [x for r in results for x in r["set"]]
+    total_ops = len(get_lat) + len(set_lat)
+
+    return {
+        "config": {
+            "trace": args.trace,
+            "trace_file": args.trace_file,
+            "ops": len(ops),
+            "keys": args.keys,
+            "zipf_s": args.zipf_s,
+            "capacity": args.capacity,
+            "ttl": args.ttl,
+            "threads": args.threads,
+            "shards": args.shards,
+            "storage": args.storage,
+            "policy": args.policy,
+            "seed": args.seed,
+        },
+        "elapsed_s": round(elapsed, 4),
+        "throughput_ops_s": round(total_ops / elapsed, 1) if elapsed else 0.0,
+        "hit_ratio": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        "get": latency_summary(get_lat),
+        "set": latency_summary(set_lat),
+        "peak_rss_kb": peak_rss_kb(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay key traces against LRUCache")
+    parser.add_argument("--trace", choices=["zipf", "scan", "loop", "file"], default="zipf")
+    parser.add_argument("--trace-file")
+    parser.add_argument("--ops", type=int, default=100_000)
+    parser.add_argument("--keys", type=int, default=10_000)
+    parser.add_argument("--zipf-s", type=float, default=1.0)
+    parser.add_argument("--capacity", type=int, default=1_000)
+    parser.add_argument("--ttl", type=float, default=0, help="seconds, 0 = no TTL")
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--storage", choices=["list", "compact"], default="list")
+    parser.add_argument("--policy", choices=["lru", "slru", "arc", "tinylfu"], default="lru")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if args.trace == "file" and not args.trace_file:
+        parser.error("--trace file needs --trace-file")
+    if args.storage == "compact" and args.policy != "lru":
+        parser.error("--storage compact only supports --policy lru")
+
+    report = json.dumps(run_benchmark(args), indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(report + "\n")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
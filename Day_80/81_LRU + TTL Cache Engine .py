@@ -6,13 +6,38 @@ A real in-memory cache with:
 - LRU eviction policy
 - Hit/Miss counters
 - Background cleaner thread
+- Min-heap expiry queue (cleanup only touches keys that expire)
+- Sharded mode: keys hash-partitioned across independent LRU segments
+- Compact mode: array-backed slots recycled through a free list
+- Pluggable eviction policies: LRU, SLRU, ARC, W-TinyLFU
+- Shadow policies: per-policy hit ratio measured on the live key stream
+- Batch get_many / set_many (one lock acquisition per batch or shard)
+- Read-through get_or_load with concurrent misses coalesced into one load
 """
 
+import sys
 import time
+import heapq
+import itertools
 import threading
+from array import array
+from collections import OrderedDict, defaultdict
+from concurrent.futures import Future
+
+
+# Rough size of one expiry-heap entry: the tuple, its float and its seq int.
+HEAP_ENTRY_BYTES = (
+    sys.getsizeof((0.0, 0, None)) + sys.getsizeof(0.0) + sys.getsizeof(1 << 40)
+)
+
+
+def heap_bytes(heap):
+    return sys.getsizeof(heap) + len(heap) * HEAP_ENTRY_BYTES
 
 
 class Node:
+    __slots__ = ("key", "value", "expire_at", "prev", "next")
+
     def __init__(self, key, value, expire_at):
         self.key = key
         self.value = value
@@ -21,8 +46,361 @@ class Node:
         self.next = None
 
 
+# -------------------------
+# Eviction Policies
+# -------------------------
+class EvictionPolicy:
+    """
+    Decides which keys stay resident. The cache owns the values; a policy
+    only tracks keys.
+
+    on_insert(key) is called for a key that is not resident and returns the
+    key to evict, or None if there was room.
+    """
+
+    name = "base"
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+
+    def __contains__(self, key):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def on_hit(self, key):
+        raise NotImplementedError
+
+    def on_insert(self, key):
+        raise NotImplementedError
+
+    def on_remove(self, key):
+        raise NotImplementedError
+
+
+class LRUPolicy(EvictionPolicy):
+    name = "lru"
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self.entries = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def on_hit(self, key):
+        self.entries.move_to_end(key)
+
+    def on_insert(self, key):
+        self.entries[key] = None
+        if len(self.entries) > self.capacity:
+            return self.entries.popitem(last=False)[0]
+        return None
+
+    def on_remove(self, key):
+        self.entries.pop(key, None)
+
+
+class SLRUPolicy(EvictionPolicy):
+    """
+    Segmented LRU: new keys enter a probation segment and are promoted to
+    the protected segment on their second access, so a one-pass scan only
+    churns probation.
+    """
+
+    name = "slru"
+
+    def __init__(self, capacity, protected_ratio=0.8):
+        super().__init__(capacity)
+        self.protected_cap = int(capacity * protected_ratio)
+        self.probation = OrderedDict()
+        self.protected = OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.probation or key in self.protected
+
+    def __len__(self):
+        return len(self.probation) + len(self.protected)
+
+    def on_hit(self, key):
+        if key in self.protected:
+            self.protected.move_to_end(key)
+            return
+        del self.probation[key]
+        self.protected[key] = None
+        if len(self.protected) > self.protected_cap:
+            demoted, _ = self.protected.popitem(last=False)
+            self.probation[demoted] = None
+
+    def peek_victim(self):
+        segment = self.probation or self.protected
+        return next(iter(segment)) if segment else None
+
+    def on_insert(self, key):
+        self.probation[key] = None
+        if len(self) > self.capacity:
+            victim = self.peek_victim()
+            self.on_remove(victim)
+            return victim
+        return None
+
+    def on_remove(self, key):
+        self.probation.pop(key, None)
+        self.protected.pop(key, None)
+
+
+class ARCPolicy(EvictionPolicy):
+    """
+    Adaptive Replacement Cache (Megiddo & Modha).
+
+    T1 holds keys seen once, T2 keys seen at least twice. B1/B2 are ghost
+    lists of recently evicted keys; a hit in a ghost list shifts the target
+    size `p` of T1 towards whichever side would have kept that key.
+    """
+
+    name = "arc"
+
+    def __init__(self, capacity):
+        super().__init__(capacity)
+        self.p = 0
+        self.t1, self.t2 = OrderedDict(), OrderedDict()
+        self.b1, self.b2 = OrderedDict(), OrderedDict()
+
+    def __contains__(self, key):
+        return key in self.t1 or key in self.t2
+
+    def __len__(self):
+        return len(self.t1) + len(self.t2)
+
+    def on_hit(self, key):
+        self.t1.pop(key, None)
+        self.t2[key] = None
+        self.t2.move_to_end(key)
+
+    def _replace(self, in_b2):
+        if self.t1 and (len(self.t1) > self.p or (in_b2 and len(self.t1) == self.p)):
+            victim, _ = self.t1.popitem(last=False)
+            self.b1[victim] = None
+        else:
+            victim, _ = self.t2.popitem(last=False)
+            self.b2[victim] = None
+        return victim
+
+    def on_insert(self, key):
+        c = self.capacity
+        full = len(self) >= c
+
+        if key in self.b1:
+            self.p = min(c, self.p + max(len(self.b2) // len(self.b1), 1))
+            del self.b1[key]
+            victim = self._replace(False) if full else None
+            self.t2[key] = None
+            return victim
+
+        if key in self.b2:
+            self.p = max(0, self.p - max(len(self.b1) // len(self.b2), 1))
+            del self.b2[key]
+            victim = self._replace(True) if full else None
+            self.t2[key] = None
+            return victim
+
+        victim = None
+        if len(self.t1) + len(self.b1) >= c:
+            if len(self.t1) < c:
+                self.b1.popitem(last=False)
+                if full:
+                    victim = self._replace(False)
+            else:
+                victim, _ = self.t1.popitem(last=False)
+        elif full:
+            if len(self) + len(self.b1) + len(self.b2) >= 2 * c and self.b2:
+                self.b2.popitem(last=False)
+            victim = self._replace(False)
+
+        self.t1[key] = None
+        return victim
+
+    def on_remove(self, key):
+        for segment in (self.t1, self.t2, self.b1, self.b2):
+            segment.pop(key, None)
+
+
+class CountMinSketch:
+    """
+    Frequency estimator with small saturating counters. Every `sample_size`
+    increments all counters are halved, so old popularity decays.
+    """
+
+    MAX_COUNT = 15
+    SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9,
+             0xD6E8FEB86659FD93)
+
+    def __init__(self, width, sample_size=None):
+        bits = max(4, (max(width, 1) - 1).bit_length())
+        self.shift = 64 - bits
+        self.rows = [array("B", bytes(1 << bits)) for _ in self.SEEDS]
+        self.sample_size = sample_size or 10 * max(width, 1)
+        self.additions = 0
+
+    def _indexes(self, key):
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        for seed in self.SEEDS:
+            yield (((h ^ seed) * 0xFF51AFD7ED558CCD) & 0xFFFFFFFFFFFFFFFF) >> self.shift
+
+    def increment(self, key):
+        for row, i in zip(self.rows, self._indexes(key)):
+            if row[i] < self.MAX_COUNT:
+                row[i] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.reset()
+
+    def estimate(self, key):
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
+
+    def reset(self):
+        self.rows = [array("B", (c >> 1 for c in row)) for row in self.rows]
+        self.additions //= 2
+
+
+class TinyLFUPolicy(EvictionPolicy):
+    """
+    W-TinyLFU: a small LRU window in front of an SLRU main area. When the
+    window overflows, its LRU key only enters the main area if the sketch
+    says it is more popular than the main area's victim.
+    """
+
+    name = "tinylfu"
+
+    def __init__(self, capacity, window_ratio=0.01):
+        super().__init__(capacity)
+        self.window_cap = max(1, int(capacity * window_ratio))
+        self.window = OrderedDict()
+        self.main = SLRUPolicy(capacity - self.window_cap)
+        self.sketch = CountMinSketch(capacity)
+
+    def __contains__(self, key):
+        return key in self.window or key in self.main
+
+    def __len__(self):
+        return len(self.window) + len(self.main)
+
+    def on_hit(self, key):
+        self.sketch.increment(key)
+        if key in self.window:
+            self.window.move_to_end(key)
+        else:
+            self.main.on_hit(key)
+
+    def on_insert(self, key):
+        self.sketch.increment(key)
+        self.window[key] = None
+        if len(self.window) <= self.window_cap:
+            return None
+
+        candidate, _ = self.window.popitem(last=False)
+        if len(self.main) < self.main.capacity:
+            self.main.on_insert(candidate)
+            return None
+
+        victim = self.main.peek_victim()
+        if victim is None:
+            return candidate
+        if self.sketch.estimate(candidate) > self.sketch.estimate(victim):
+            self.main.on_remove(victim)
+            self.main.on_insert(candidate)
+            return victim
+        return candidate
+
+    def on_remove(self, key):
+        self.window.pop(key, None)
+        self.main.on_remove(key)
+
+
+POLICIES = {
+    "lru": LRUPolicy,
+    "slru": SLRUPolicy,
+    "arc": ARCPolicy,
+    "tinylfu": TinyLFUPolicy,
+}
+
+
+class PolicySimulator:
+    """Replays accessed keys against a key-only policy to measure its hit ratio."""
+
+    def __init__(self, policy):
+        self.policy = policy
+        self.hits = 0
+        self.misses = 0
+
+    def access(self, key):
+        if key in self.policy:
+            self.policy.on_hit(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            self.policy.on_insert(key)
+
+    def admit(self, key):
+        if key not in self.policy:
+            self.policy.on_insert(key)
+
+
+class LoadCoalescer:
+    """
+    Collapses concurrent loads of the same key into one loader call. The
+    first caller runs the loader; everyone else arriving before it finishes
+    waits on the same Future and gets its result (or its exception).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.inflight = {}             # key -> Future
+        self.loads = 0
+        self.coalesced = 0
+
+    def load(self, key, loader, on_loaded):
+        with self.lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.inflight[key] = future
+                self.loads += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = loader(key)
+            on_loaded(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+
+def hit_ratio(hits, misses):
+    total = hits + misses
+    return round(hits / total, 4) if total else 0.0
+
+
 class LRUCache:
-    def __init__(self, capacity=5, cleanup_interval=2):
+    def __init__(self, capacity=5, cleanup_interval=2, start_cleaner=True,
+                 policy="lru", shadow_policies=()):
+        for name in (policy, *shadow_policies):
+            if name not in POLICIES:
+                raise ValueError(f"unknown policy: {name}")
         self.capacity = capacity
         self.map = {}
         self.lock = threading.Lock()
@@ -33,12 +411,31 @@ class LRUCache:
         self.hits = 0
         self.misses = 0
 
+        # "lru" uses the intrusive list above; other policies track order
+        # themselves and the list stays empty.
+        self.policy_name = policy
+        self.policy = None if policy == "lru" else POLICIES[policy](capacity)
+
+        # Shadow policies see the same keys but hold no values; they only
+        # exist to report what hit ratio each policy would have achieved.
+        self.shadows = {
+            name: PolicySimulator(POLICIES[name](capacity))
+            for name in shadow_policies
+        }
+
+        # Expiry queue: (expire_at, seq, key). Entries are never updated in
+        # place; stale ones (key overwritten/evicted) are skipped when popped.
+        self.expiry_heap = []
+        self._seq = itertools.count()
+        self.coalescer = LoadCoalescer()
+
         # Background cleanup
-        self.cleanup_thread = threading.Thread(
-            target=self._cleanup_loop, daemon=True
-        )
-        self.cleanup_thread.start()
         self.cleanup_interval = cleanup_interval
+        if start_cleaner:
+            self.cleanup_thread = threading.Thread(
+                target=self._cleanup_loop, daemon=True
+            )
+            self.cleanup_thread.start()
 
     # -------------------------
     # Internal List Operations
@@ -59,80 +456,605 @@ class LRUCache:
         self._remove(node)
         self._add_to_front(node)
 
+    def _schedule_expiry(self, key, expire_at):
+        heapq.heappush(self.expiry_heap, (expire_at, next(self._seq), key))
+
     # -------------------------
-    # Core Cache
+    # Policy Hooks
     # -------------------------
-    def set(self, key, value, ttl=None):
-        with self.lock:
-            expire_at = time.time() + ttl if ttl else None
-
-            if key in self.map:
-                node = self.map[key]
-                node.value = value
-                node.expire_at = expire_at
-                self._move_to_front(node)
-                return "OK"
+    def _touch(self, node):
+        if self.policy is None:
+            self._move_to_front(node)
+        else:
+            self.policy.on_hit(node.key)
 
-            if len(self.map) >= self.capacity:
+    def _insert(self, node):
+        self.map[node.key] = node
+        if self.policy is None:
+            if len(self.map) > self.capacity:
                 # evict LRU
                 lru = self.tail.prev
                 self._remove(lru)
                 del self.map[lru.key]
-
-            node = Node(key, value, expire_at)
-            self.map[key] = node
             self._add_to_front(node)
+            return
+
+        victim = self.policy.on_insert(node.key)
+        if victim is not None:
+            del self.map[victim]
+
+    def _drop(self, node):
+        if self.policy is None:
+            self._remove(node)
+        else:
+            self.policy.on_remove(node.key)
+        del self.map[node.key]
+
+    # -------------------------
+    # Core Cache
+    # -------------------------
+    def _set_locked(self, key, value, expire_at):
+        if expire_at:
+            self._schedule_expiry(key, expire_at)
+        for shadow in self.shadows.values():
+            shadow.admit(key)
+
+        if key in self.map:
+            node = self.map[key]
+            node.value = value
+            node.expire_at = expire_at
+            self._touch(node)
+            return
+
+        self._insert(Node(key, value, expire_at))
 
+    def _get_locked(self, key, now):
+        for shadow in self.shadows.values():
+            shadow.access(key)
+
+        if key not in self.map:
+            self.misses += 1
+            return None
+
+        node = self.map[key]
+
+        # TTL check
+        if node.expire_at and node.expire_at < now:
+            self._drop(node)
+            self.misses += 1
+            return None
+
+        self._touch(node)
+        self.hits += 1
+        return node.value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self._set_locked(key, value, time.time() + ttl if ttl else None)
             return "OK"
 
     def get(self, key):
         with self.lock:
-            if key not in self.map:
-                self.misses += 1
-                return None
+            return self._get_locked(key, time.time())
 
-            node = self.map[key]
+    # -------------------------
+    # Batch / Read-through
+    # -------------------------
+    def set_many(self, items, ttl=None):
+        """Set every (key, value) in `items` (dict or pairs) under one lock."""
+        if isinstance(items, dict):
+            items = items.items()
+        with self.lock:
+            expire_at = time.time() + ttl if ttl else None
+            for key, value in items:
+                self._set_locked(key, value, expire_at)
+            return "OK"
 
-            # TTL check
-            if node.expire_at and node.expire_at < time.time():
-                self._remove(node)
-                del self.map[key]
-                self.misses += 1
-                return None
+    def get_many(self, keys):
+        """Return {key: value} for the keys that hit, taking the lock once."""
+        found = {}
+        with self.lock:
+            now = time.time()
+            for key in keys:
+                value = self._get_locked(key, now)
+                if value is not None:
+                    found[key] = value
+        return found
 
-            # LRU update
-            self._move_to_front(node)
-            self.hits += 1
-            return node.value
+    def get_or_load(self, key, loader, ttl=None):
+        """
+        Return the cached value, or call loader(key), cache and return it.
+        Concurrent misses on the same key share a single loader call.
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+        return self.coalescer.load(key, loader, self._fill(ttl))
+
+    def _fill(self, ttl):
+        def fill(key, value):
+            if value is not None:
+                self.set(key, value, ttl)
+        return fill
 
     # -------------------------
     # Background cleaner
     # -------------------------
+    def purge_expired(self, now=None):
+        """Drop every key whose TTL has passed. Returns how many were removed.
+
+        Cost is O(k log n) for k expired heap entries instead of a scan
+        over the whole map.
+        """
+        now = now if now is not None else time.time()
+        removed = 0
+
+        with self.lock:
+            heap = self.expiry_heap
+            while heap and heap[0][0] < now:
+                expire_at, _, key = heapq.heappop(heap)
+                node = self.map.get(key)
+                if node is None or node.expire_at != expire_at:
+                    continue  # stale entry
+                self._drop(node)
+                removed += 1
+
+            # Overwrites leave stale entries behind; rebuild if they dominate.
+            if len(heap) > 2 * len(self.map) + 64:
+                live = []
+                for entry in heap:
+                    node = self.map.get(entry[2])
+                    if node is not None and node.expire_at == entry[0]:
+                        live.append(entry)
+                heapq.heapify(live)
+                self.expiry_heap = live
+
+        return removed
+
     def _cleanup_loop(self):
         while True:
             time.sleep(self.cleanup_interval)
+            self.purge_expired()
+
+    # -------------------------
+    # Stats
+    # -------------------------
+    def memory_overhead(self):
+        """Structural bytes held by the cache, excluding key/value objects."""
+        return (
+            sys.getsizeof(self.map)
+            + (len(self.map) + 2) * sys.getsizeof(self.head)
+            + heap_bytes(self.expiry_heap)
+        )
+
+    def policy_counts(self):
+        """(hits, misses) for the active policy and every shadow policy."""
+        counts = {self.policy_name: (self.hits, self.misses)}
+        for name, shadow in self.shadows.items():
+            if name != self.policy_name:
+                counts[name] = (shadow.hits, shadow.misses)
+        return counts
+
+    def stats(self):
+        count = len(self.map)
+        return {
+            "count": count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bytes_per_entry": round(self.memory_overhead() / max(count, 1), 1),
+            "policy": self.policy_name,
+            "policy_hit_ratio": {
+                name: hit_ratio(*c) for name, c in self.policy_counts().items()
+            },
+            "loads": self.coalescer.loads,
+            "coalesced_loads": self.coalescer.coalesced,
+            "keys": list(self.map.keys()),
+        }
+
+
+class CompactLRUCache:
+    """
+    LRU + TTL cache with array-backed storage.
+
+    Entries live in preallocated slots: prev/next links and expiry times are
+    parallel typed arrays, keys and values are parallel lists. Keys are
+    found through an open-addressed table of 32-bit slot numbers (linear
+    probing, backward-shift deletion) instead of a dict, so there is no
+    per-key int object or dict entry. Evicted or expired slots are chained
+    onto a free list through `next` and reused, so a full cache allocates
+    no per-entry objects on set().
+    """
+
+    FREE_END = -1
+    EMPTY = -1
+    FIB = 11400714819323198485         # 2**64 / golden ratio, spreads hash bits
+
+    def __init__(self, capacity=5, cleanup_interval=2, start_cleaner=True):
+        self.capacity = capacity
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        # Key index: table position -> slot, at most 3/4 full
+        table_size = 8
+        while table_size * 3 < capacity * 4:
+            table_size *= 2
+        self.mask = table_size - 1
+        self.shift = 64 - (table_size.bit_length() - 1)
+        self.table = array("i", [self.EMPTY]) * table_size
+
+        # Slot `capacity` is the sentinel of a circular list:
+        # next[sentinel] is the MRU slot, prev[sentinel] the LRU slot.
+        self.sentinel = capacity
+        self.prev = array("i", [self.sentinel]) * (capacity + 1)
+        self.next = array("i", range(1, capacity + 2))
+        self.next[self.sentinel] = self.sentinel
+        self.expire = array("d", [0.0]) * capacity   # 0.0 = no TTL
+        self.keys = [None] * capacity
+        self.values = [None] * capacity
+
+        # Free slots are chained through next[]
+        if capacity:
+            self.next[capacity - 1] = self.FREE_END
+            self.free_head = 0
+        else:
+            self.free_head = self.FREE_END
+
+        self.expiry_heap = []
+        self._seq = itertools.count()
+        self.coalescer = LoadCoalescer()
+
+        self.cleanup_interval = cleanup_interval
+        if start_cleaner:
+            self.cleanup_thread = threading.Thread(
+                target=self._cleanup_loop, daemon=True
+            )
+            self.cleanup_thread.start()
+
+    # -------------------------
+    # Key Index
+    # -------------------------
+    def _home(self, key):
+        return ((hash(key) * self.FIB) & 0xFFFFFFFFFFFFFFFF) >> self.shift
+
+    def _lookup(self, key):
+        """Table position holding `key`, or the empty position it would take."""
+        table, keys, mask = self.table, self.keys, self.mask
+        pos = self._home(key)
+        while True:
+            slot = table[pos]
+            if slot == self.EMPTY:
+                return pos
+            found = keys[slot]
+            if found is key or found == key:
+                return pos
+            pos = (pos + 1) & mask
+
+    def _delete_at(self, pos):
+        """Empty a table position, shifting later probes back over the hole."""
+        table, keys, mask = self.table, self.keys, self.mask
+        hole = pos
+        pos = (pos + 1) & mask
+        while table[pos] != self.EMPTY:
+            home = self._home(keys[table[pos]])
+            if (pos - home) & mask >= (pos - hole) & mask:
+                table[hole] = table[pos]
+                hole = pos
+            pos = (pos + 1) & mask
+        table[hole] = self.EMPTY
+
+    def _find(self, key):
+        return self.table[self._lookup(key)]
+
+    # -------------------------
+    # Internal Slot Operations
+    # -------------------------
+    def _link_front(self, slot):
+        s = self.sentinel
+        first = self.next[s]
+        self.next[s] = slot
+        self.prev[slot] = s
+        self.next[slot] = first
+        self.prev[first] = slot
+
+    def _unlink(self, slot):
+        p, n = self.prev[slot], self.next[slot]
+        self.next[p] = n
+        self.prev[n] = p
+
+    def _acquire(self):
+        slot = self.free_head
+        self.free_head = self.next[slot]
+        return slot
+
+    def _release(self, slot):
+        self._unlink(slot)
+        self._delete_at(self._lookup(self.keys[slot]))
+        self.size -= 1
+        self.keys[slot] = None
+        self.values[slot] = None
+        self.expire[slot] = 0.0
+        self.next[slot] = self.free_head
+        self.free_head = slot
+
+    def _schedule_expiry(self, key, expire_at):
+        heapq.heappush(self.expiry_heap, (expire_at, next(self._seq), key))
+
+    # -------------------------
+    # Core Cache
+    # -------------------------
+    def _set_locked(self, key, value, expire_at):
+        if expire_at:
+            self._schedule_expiry(key, expire_at)
+
+        pos = self._lookup(key)
+        slot = self.table[pos]
+        if slot != self.EMPTY:
+            self.values[slot] = value
+            self.expire[slot] = expire_at
+            self._unlink(slot)
+            self._link_front(slot)
+            return
+
+        if self.free_head == self.FREE_END:
+            # evict LRU, its slot goes straight back to the free list;
+            # the deletion may shift entries, so probe again
+            self._release(self.prev[self.sentinel])
+            pos = self._lookup(key)
+
+        slot = self._acquire()
+        self.keys[slot] = key
+        self.values[slot] = value
+        self.expire[slot] = expire_at
+        self.table[pos] = slot
+        self.size += 1
+        self._link_front(slot)
+
+    def _get_locked(self, key, now):
+        slot = self._find(key)
+        if slot == self.EMPTY:
+            self.misses += 1
+            return None
+
+        # TTL check
+        expire_at = self.expire[slot]
+        if expire_at and expire_at < now:
+            self._release(slot)
+            self.misses += 1
+            return None
+
+        # LRU update
+        self._unlink(slot)
+        self._link_front(slot)
+        self.hits += 1
+        return self.values[slot]
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self._set_locked(key, value, time.time() + ttl if ttl else 0.0)
+            return "OK"
+
+    def get(self, key):
+        with self.lock:
+            return self._get_locked(key, time.time())
+
+    # -------------------------
+    # Batch / Read-through
+    # -------------------------
+    def set_many(self, items, ttl=None):
+        if isinstance(items, dict):
+            items = items.items()
+        with self.lock:
+            expire_at = time.time() + ttl if ttl else 0.0
+            for key, value in items:
+                self._set_locked(key, value, expire_at)
+            return "OK"
+
+    def get_many(self, keys):
+        found = {}
+        with self.lock:
             now = time.time()
+            for key in keys:
+                value = self._get_locked(key, now)
+                if value is not None:
+                    found[key] = value
+        return found
 
-            with self.lock:
-                expired = []
-                for key, node in list(self.map.items()):
-                    if node.expire_at and node.expire_at < now:
-                        expired.append(key)
+    def get_or_load(self, key, loader, ttl=None):
+        value = self.get(key)
+        if value is not None:
+            return value
+        return self.coalescer.load(key, loader, self._fill(ttl))
 
-                for key in expired:
-                    node = self.map[key]
-                    self._remove(node)
-                    del self.map[key]
+    def _fill(self, ttl):
+        def fill(key, value):
+            if value is not None:
+                self.set(key, value, ttl)
+        return fill
+
+    # -------------------------
+    # Background cleaner
+    # -------------------------
+    def purge_expired(self, now=None):
+        now = now if now is not None else time.time()
+        removed = 0
+
+        with self.lock:
+            heap = self.expiry_heap
+            while heap and heap[0][0] < now:
+                expire_at, _, key = heapq.heappop(heap)
+                slot = self._find(key)
+                if slot == self.EMPTY or self.expire[slot] != expire_at:
+                    continue  # stale entry
+                self._release(slot)
+                removed += 1
+
+            if len(heap) > 2 * self.size + 64:
+                live = []
+                for entry in heap:
+                    slot = self._find(entry[2])
+                    if slot != self.EMPTY and self.expire[slot] == entry[0]:
+                        live.append(entry)
+                heapq.heapify(live)
+                self.expiry_heap = live
+
+        return removed
+
+    def _cleanup_loop(self):
+        while True:
+            time.sleep(self.cleanup_interval)
+            self.purge_expired()
 
     # -------------------------
     # Stats
     # -------------------------
+    def memory_overhead(self):
+        """Structural bytes held by the cache, excluding key/value objects."""
+        arrays = sum(
+            a.buffer_info()[1] * a.itemsize
+            for a in (self.table, self.prev, self.next, self.expire)
+        )
+        return (
+            arrays
+            + sys.getsizeof(self.keys)
+            + sys.getsizeof(self.values)
+            + heap_bytes(self.expiry_heap)
+        )
+
+    def policy_counts(self):
+        return {"lru": (self.hits, self.misses)}
+
+    def _keys_mru(self):
+        slot = self.next[self.sentinel]
+        while slot != self.sentinel:
+            yield self.keys[slot]
+            slot = self.next[slot]
+
     def stats(self):
+        count = self.size
         return {
-            "count": len(self.map),
+            "count": count,
             "hits": self.hits,
             "misses": self.misses,
-            "keys": list(self.map.keys()),
+            "bytes_per_entry": round(self.memory_overhead() / max(count, 1), 1),
+            "policy": "lru",
+            "policy_hit_ratio": {"lru": hit_ratio(self.hits, self.misses)},
+            "loads": self.coalescer.loads,
+            "coalesced_loads": self.coalescer.coalesced,
+            "keys": list(self._keys_mru()),
+        }
+
+
+class ShardedLRUCache:
+    """
+    Hash-partitions keys across N independent LRUCache segments.
+
+    Each segment has its own lock, list and expiry heap, so threads working
+    on different keys rarely contend. Eviction is LRU per segment, which
+    approximates global LRU when keys hash evenly.
+    """
+
+    STORAGE = {"list": LRUCache, "compact": CompactLRUCache}
+
+    def __init__(self, capacity=1024, shards=16, cleanup_interval=2,
+                 storage="list", policy="lru", shadow_policies=()):
+        if storage not in self.STORAGE:
+            raise ValueError(f"unknown storage: {storage}")
+        options = {}
+        if policy != "lru" or shadow_policies:
+            if storage != "list":
+                raise ValueError("eviction policies need storage='list'")
+            options = {"policy": policy, "shadow_policies": shadow_policies}
+        self.capacity = capacity
+        self.policy_name = policy
+        per_shard = max(1, -(-capacity // shards))
+        segment = self.STORAGE[storage]
+        self.shards = [
+            segment(per_shard, cleanup_interval, start_cleaner=False, **options)
+            for _ in range(shards)
+        ]
+
+        # One cleaner for all segments; each purge only holds one shard lock.
+        self.cleanup_interval = cleanup_interval
+        self.cleanup_thread = threading.Thread(
+            target=self._cleanup_loop, daemon=True
+        )
+        self.cleanup_thread.start()
+
+    def _shard(self, key):
+        return self.shards[hash(key) % len(self.shards)]
+
+    def set(self, key, value, ttl=None):
+        return self._shard(key).set(key, value, ttl)
+
+    def get(self, key):
+        return self._shard(key).get(key)
+
+    def _group(self, keys):
+        groups = defaultdict(list)
+        for key in keys:
+            groups[hash(key) % len(self.shards)].append(key)
+        return groups
+
+    def set_many(self, items, ttl=None):
+        """Set many keys, taking each shard's lock once."""
+        if isinstance(items, dict):
+            items = items.items()
+        groups = defaultdict(list)
+        for key, value in items:
+            groups[hash(key) % len(self.shards)].append((key, value))
+        for i, pairs in groups.items():
+            self.shards[i].set_many(pairs, ttl)
+        return "OK"
+
+    def get_many(self, keys):
+        """Return {key: value} for the keys that hit, one lock per shard."""
+        found = {}
+        for i, group in self._group(keys).items():
+            found.update(self.shards[i].get_many(group))
+        return found
+
+    def get_or_load(self, key, loader, ttl=None):
+        return self._shard(key).get_or_load(key, loader, ttl)
+
+    def purge_expired(self, now=None):
+        now = now if now is not None else time.time()
+        return sum(shard.purge_expired(now) for shard in self.shards)
+
+    def _cleanup_loop(self):
+        while True:
+            time.sleep(self.cleanup_interval)
+            self.purge_expired()
+
+    def memory_overhead(self):
+        return sum(shard.memory_overhead() for shard in self.shards)
+
+    def policy_counts(self):
+        totals = {}
+        for shard in self.shards:
+            for name, (h, m) in shard.policy_counts().items():
+                th, tm = totals.get(name, (0, 0))
+                totals[name] = (th + h, tm + m)
+        return totals
+
+    def stats(self):
+        parts = [shard.stats() for shard in self.shards]
+        count = sum(p["count"] for p in parts)
+        return {
+            "count": count,
+            "hits": sum(p["hits"] for p in parts),
+            "misses": sum(p["misses"] for p in parts),
+            "bytes_per_entry": round(self.memory_overhead() / max(count, 1), 1),
+            "policy": self.policy_name,
+            "policy_hit_ratio": {
+                name: hit_ratio(*c) for name, c in self.policy_counts().items()
+            },
+            "loads": sum(p["loads"] for p in parts),
+            "coalesced_loads": sum(p["coalesced_loads"] for p in parts),
+            "shards": len(self.shards),
+            "shard_counts": [p["count"] for p in parts],
+            "keys": [k for p in parts for k in p["keys"]],
         }
 
 
@@ -148,3 +1070,46 @@ if __name__ == "__main__":
     print(cache.get("a"))
     cache.set("d", 4)  # should evict LRU of b/c
     print(cache.stats())
+
+    sharded = ShardedLRUCache(capacity=64, shards=4)
+    for i in range(100):
+        sharded.set(f"k{i}", i, ttl=1 if i % 2 else None)
+    print(sharded.purge_expired(now=time.time() + 2), "expired")
+    print({k: v for k, v in sharded.stats().items() if k != "keys"})
+
+    # Memory per entry: linked Node objects vs. array-backed slots
+    for cls in (LRUCache, CompactLRUCache):
+        c = cls(capacity=100_000, start_cleaner=False)
+        for i in range(100_000):
+            c.set(i, i)
+        print(cls.__name__, c.stats()["bytes_per_entry"], "bytes/entry")
+
+    # Hot set + one big scan: compare policies on the same key stream
+    import random
+    trial = LRUCache(capacity=100, start_cleaner=False, policy="tinylfu",
+                     shadow_policies=tuple(POLICIES))
+    for i in range(20_000):
+        key = f"scan{i}" if 5_000 <= i < 7_000 else f"hot{random.randint(0, 80)}"
+        if trial.get(key) is None:
+            trial.set(key, i)
+    print(trial.stats()["policy_hit_ratio"])
+
+    # Batch calls and coalesced read-through loads
+    batch = ShardedLRUCache(capacity=1000, shards=8)
+    batch.set_many({f"user:{i}": i for i in range(100)}, ttl=60)
+    print(len(batch.get_many(f"user:{i}" for i in range(150))), "of 150 hit")
+
+    def slow_loader(key):
+        time.sleep(0.2)
+        return f"loaded {key}"
+
+    workers = [
+        threading.Thread(target=batch.get_or_load, args=("report", slow_loader))
+        for _ in range(10)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    loaded = batch.stats()
+    print(loaded["loads"], "load,", loaded["coalesced_loads"], "coalesced")
@@ -5,12 +5,254 @@ You're building a tiny relational engine yourself.
 
 Supported:
     CREATE table col1 col2 col3
+    CREATE table col1 col2 col3 USING columnar
     INSERT table val1 val2 val3
     SELECT table
     SELECT table WHERE col == value
+    SELECT table WHERE col < value          (also <=, >, >=)
+    SELECT table WHERE col BETWEEN lo AND hi
+    SELECT table WHERE col LIKE prefix%
+    SELECT table [WHERE ...] ORDER BY col [ASC|DESC] [LIMIT k]
+    SELECT items FROM table [JOIN table ON a == b ...]
+           [WHERE pred [AND pred ...]] [GROUP BY col]
+           [ORDER BY col [ASC|DESC]] [LIMIT k]
+        items: * | col | table.col | COUNT(*) | COUNT(col) | SUM(col) | AVG(col)
+    EXPLAIN SELECT ...                      print the chosen plan
+    INDEX table col                         hash index (== only)
+    INDEX table col ORDERED                 sorted index (==, ranges, prefix,
+                                            ORDER BY ... LIMIT as an index walk)
+
+Numeric-looking values compare as numbers and sort before strings.
+
+The planner picks index lookup vs. full scan per table and hash join vs.
+index nested-loop join per JOIN from row counts and distinct-value estimates.
+
+    COPY table FROM file.csv [HEADER]       bulk load in batches
+
+Prepared statements (Python API), parsed and planned once:
+    stmt = engine.prepare("SELECT t WHERE c == ?")
+    stmt.execute("42")
+Ad-hoc SELECT strings are also kept in an LRU parse cache, so repeating
+the exact same command skips tokenising.
+    python "82_Mini Relational Query Engine.py" --bench    queries/sec
+    python "82_Mini Relational Query Engine.py" --check    index self-check
+
+Storage:
+    row       list of dicts (default)
+    columnar  one typed array per column, strings dictionary-encoded;
+              unindexed WHERE runs as a column scan returning a row bitmap
+    paged     8 KB pages on disk with an mmap'd buffer pool; needs a data
+              directory (python "82_Mini Relational Query Engine.py" <data_dir>) and survives
+              restarts, indexes are rebuilt from the pages on open
 """
 
+import os
+import csv
+import sys
+import json
+import math
+import mmap
+import heapq
 import shlex
+import time
+import struct
+import operator
+from array import array
+from collections import OrderedDict
+from bisect import bisect_left, bisect_right
+
+try:
+    import numpy as np
+except ImportError:     # columnar scans fall back to plain Python loops
+    np = None
+
+
+# -------------------------
+# Row-id bitmaps
+# -------------------------
+# A bitmap is a Python int: bit i set <=> row i matches. Predicates on the
+# same table combine with & and |.
+
+def bitmap_from_mask(mask):
+    """numpy bool array -> bitmap"""
+    return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+
+def bitmap_from_ids(ids, n_rows):
+    buf = bytearray((n_rows + 7) // 8)
+    for i in ids:
+        buf[i >> 3] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+def bitmap_ids(bitmap, n_rows):
+    """Row ids set in `bitmap`, ascending."""
+    if not bitmap:
+        return []
+    raw = bitmap.to_bytes((n_rows + 7) // 8, "little")
+    if np is not None:
+        bits = np.unpackbits(np.frombuffer(raw, dtype=np.uint8), bitorder="little")
+        return np.flatnonzero(bits).tolist()
+    ids = []
+    for byte_index, byte in enumerate(raw):
+        if byte:
+            base = byte_index * 8
+            ids.extend(base + bit for bit in range(8) if byte >> bit & 1)
+    return ids
+
+
+INT64_MIN, INT64_MAX = -(1 << 63), (1 << 63) - 1
+
+
+def as_int64(value):
+    """int(value) if the string round-trips exactly and fits int64, else None."""
+    try:
+        n = int(value)
+    except ValueError:
+        return None
+    if str(n) != value or not INT64_MIN <= n <= INT64_MAX:
+        return None
+    return n
+
+
+# -------------------------
+# Ordering & predicates
+# -------------------------
+COMPARE = {"<": operator.lt, "<=": operator.le, ">": operator.gt, ">=": operator.ge}
+
+
+def as_number(value):
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        n = float(value)
+    except ValueError:
+        return None
+    return n if math.isfinite(n) else None
+
+
+def sort_key(value):
+    """Numbers order numerically and before all strings."""
+    n = as_number(value)
+    return (0, n) if n is not None else (1, value)
+
+
+def predicate(op, args):
+    """Python test for `value op args` on raw column strings."""
+    if op == "==":
+        target = args[0]
+        return lambda v: v == target
+    if op == "LIKE":
+        prefix = args[0]
+        return lambda v: v.startswith(prefix)
+    if op == "BETWEEN":
+        lo, hi = sort_key(args[0]), sort_key(args[1])
+        return lambda v: lo <= sort_key(v) <= hi
+    bound, cmp = sort_key(args[0]), COMPARE[op]
+    return lambda v: cmp(sort_key(v), bound)
+
+
+class OrderedIndex:
+    """
+    Sorted-array index: parallel lists of sort keys, raw values and row ids,
+    searched with bisect. Equal keys keep row ids in insertion order.
+
+    Bulk additions are buffered and merged with one sort on the next read,
+    so loading N rows in batches costs O(N log N) rather than a re-sort per
+    batch.
+    """
+
+    def __init__(self, pairs=()):
+        self.pending = []
+        self._build(sorted((sort_key(v), rid, v) for v, rid in pairs))
+
+    def _build(self, entries):
+        self.keys = [k for k, _, _ in entries]
+        self.row_ids = [rid for _, rid, _ in entries]
+        self.values = [v for _, _, v in entries]
+
+    def _settle(self):
+        if self.pending:
+            self._build(sorted(list(zip(self.keys, self.row_ids, self.values))
+                               + self.pending))
+            self.pending = []
+
+    def add(self, value, row_id):
+        key = sort_key(value)
+        i = bisect_right(self.keys, key)
+        self.keys.insert(i, key)
+        self.row_ids.insert(i, row_id)
+        self.values.insert(i, value)
+
+    def _span(self, op, args):
+        keys = self.keys
+        if op == "BETWEEN":
+            return bisect_left(keys, sort_key(args[0])), bisect_right(keys, sort_key(args[1]))
+        key = sort_key(args[0])
+        if op == "<":
+            return 0, bisect_left(keys, key)
+        if op == "<=":
+            return 0, bisect_right(keys, key)
+        if op == ">":
+            return bisect_right(keys, key), len(keys)
+        if op == ">=":
+            return bisect_left(keys, key), len(keys)
+        return bisect_left(keys, key), bisect_right(keys, key)      # ==
+
+    def lookup(self, op, args):
+        """Row ids matching `op args`, in index order."""
+        self._settle()
+        if op == "LIKE":
+            prefix = args[0]
+            # strings with the prefix are contiguous; numbers are checked one by one
+            lo = bisect_left(self.keys, (1, prefix))
+            hi = bisect_left(self.keys, (1, prefix + "\U0010ffff"))
+            numeric = bisect_left(self.keys, (1, ""))
+            spans = ((0, numeric), (lo, hi))
+            return [
+                self.row_ids[i]
+                for start, end in spans
+                for i in range(start, end)
+                if self.values[i].startswith(prefix)
+            ]
+
+        lo, hi = self._span(op, args)
+        if op == "==":
+            # "7" and "007" share a sort key; equality is on the raw string
+            return [self.row_ids[i] for i in range(lo, hi) if self.values[i] == args[0]]
+        return self.row_ids[lo:hi]
+
+    def add_many(self, pairs):
+        self.pending.extend((sort_key(v), rid, v) for v, rid in pairs)
+
+    def walk(self, descending=False):
+        self._settle()
+        return reversed(self.row_ids) if descending else iter(self.row_ids)
+
+
+def index_batch(table, start, batch=None):
+    """
+    Add rows start..row_count-1 to every index of `table`. `batch` holds
+    those rows' values when the caller still has them, saving a read back.
+    """
+    rows = range(start, table.row_count)
+    for col in dict.fromkeys([*table.indexes, *table.ordered]):
+        if batch is not None:
+            pos = table.columns.index(col)
+            pairs = [(values[pos], start + n) for n, values in enumerate(batch)]
+        else:
+            pairs = [(table.value(i, col), i) for i in rows]
+        if col in table.indexes:
+            idx = table.indexes[col]
+            for value, i in pairs:
+                idx.setdefault(value, []).append(i)
+        if col in table.ordered:
+            if len(pairs) == 1:
+                table.ordered[col].add(*pairs[0])
+            else:
+                table.ordered[col].add_many(pairs)
 
 
 class Table:
@@ -19,6 +261,11 @@ class Table:
         self.columns = columns          # list of column names
         self.rows = []                  # list of dicts
         self.indexes = {}               # col_name -> {value: [row_ids]}
+        self.ordered = {}               # col_name -> OrderedIndex
+
+    @property
+    def row_count(self):
+        return len(self.rows)
 
     def insert(self, values):
         if len(values) != len(self.columns):
@@ -32,13 +279,21 @@ class Table:
         for col, idx in self.indexes.items():
             value = row[col]
             idx.setdefault(value, []).append(row_id)
+        for col, idx in self.ordered.items():
+            idx.add(row[col], row_id)
 
         return "OK"
 
-    def create_index(self, col):
+    def create_index(self, col, kind="hash"):
         if col not in self.columns:
             return "ERR: no such column"
 
+        if kind == "ordered":
+            self.ordered[col] = OrderedIndex(
+                (row[col], i) for i, row in enumerate(self.rows)
+            )
+            return f"Ordered index created on {col}"
+
         idx = {}
         for i, row in enumerate(self.rows):
             value = row[col]
@@ -47,6 +302,37 @@ class Table:
         self.indexes[col] = idx
         return f"Index created on {col}"
 
+    def bulk_insert(self, rows):
+        for n, values in enumerate(rows):
+            if len(values) != len(self.columns):
+                return f"ERR: row {n + 1}: column count mismatch"
+        start = len(self.rows)
+        self.rows.extend(dict(zip(self.columns, values)) for values in rows)
+        index_batch(self, start, rows)
+        return "OK"
+
+    def row(self, i):
+        return self.rows[i]
+
+    def value(self, i, col):
+        return self.rows[i][col]
+
+    def rows_for(self, row_ids):
+        return [self.rows[i] for i in row_ids]
+
+    def filter(self, col, op, args):
+        """Row ids matching `col op args`, ascending."""
+        if col not in self.columns:
+            return []
+        if op == "==" and col in self.indexes:
+            return list(self.indexes[col].get(args[0], []))
+        if col in self.ordered:
+            return sorted(self.ordered[col].lookup(op, args))
+
+        # fallback scan
+        test = predicate(op, args)
+        return [i for i, r in enumerate(self.rows) if test(r[col])]
+
     def select_all(self):
         return self.rows
 
@@ -60,11 +346,1266 @@ class Table:
         return [r for r in self.rows if r.get(col) == value]
 
 
-class Engine:
+class Column:
+    """
+    One column of a ColumnTable.
+
+    Starts as an int64 array and switches to dictionary encoding (int64
+    codes + code -> string list) the first time a non-integer value arrives.
+    Values always read back as the original strings.
+    """
+
     def __init__(self):
+        self.kind = "int"
+        self.data = array("q")
+        self.dictionary = []            # code -> string
+        self.codes = {}                 # string -> code
+
+    def append(self, value):
+        if self.kind == "int":
+            n = as_int64(value)
+            if n is not None:
+                self.data.append(n)
+                return
+            self._dictionary_encode()
+        self.data.append(self._code(value))
+
+    def _code(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = len(self.dictionary)
+            self.dictionary.append(value)
+            self.codes[value] = code
+        return code
+
+    def _dictionary_encode(self):
+        old = self.data
+        self.kind = "dict"
+        self.data = array("q", (self._code(str(n)) for n in old))
+
+    def value(self, i):
+        v = self.data[i]
+        return str(v) if self.kind == "int" else self.dictionary[v]
+
+    def scan_eq(self, value):
+        """Bitmap of rows equal to `value`."""
+        target = as_int64(value) if self.kind == "int" else self.codes.get(value)
+        if target is None:
+            return 0
+        if np is not None:
+            return bitmap_from_mask(np.frombuffer(self.data, dtype=np.int64) == target)
+        return bitmap_from_ids(
+            (i for i, v in enumerate(self.data) if v == target), len(self.data)
+        )
+
+    def scan(self, op, args):
+        """Bitmap of rows matching `op args`."""
+        if op == "==":
+            return self.scan_eq(args[0])
+
+        n = len(self.data)
+        test = predicate(op, args)
+        if np is None:
+            return bitmap_from_ids((i for i in range(n) if test(self.value(i))), n)
+
+        data = np.frombuffer(self.data, dtype=np.int64)
+        if self.kind == "dict":
+            # evaluate once per distinct string, then match codes
+            matched = [code for code, v in enumerate(self.dictionary) if test(v)]
+            return bitmap_from_mask(np.isin(data, matched))
+        if op == "LIKE":
+            return bitmap_from_mask(np.char.startswith(data.astype(str), args[0]))
+
+        # strings sort after every number, so they bound like +inf
+        bounds = [
+            key[1] if key[0] == 0 else math.inf
+            for key in map(sort_key, args)
+        ]
+        if op == "BETWEEN":
+            return bitmap_from_mask((data >= bounds[0]) & (data <= bounds[1]))
+        return bitmap_from_mask(COMPARE[op](data, bounds[0]))
+
+
+class ColumnTable:
+    """Same interface as Table, stored column-wise."""
+
+    def __init__(self, name, columns):
+        self.name = name
+        self.columns = columns
+        self.data = {col: Column() for col in columns}
+        self.row_count = 0
+        self.indexes = {}               # col_name -> {value: [row_ids]}
+        self.ordered = {}               # col_name -> OrderedIndex
+
+    def insert(self, values):
+        if len(values) != len(self.columns):
+            return "ERR: column count mismatch"
+
+        row_id = self.row_count
+        for col, value in zip(self.columns, values):
+            self.data[col].append(value)
+        self.row_count += 1
+
+        for col, idx in self.indexes.items():
+            idx.setdefault(values[self.columns.index(col)], []).append(row_id)
+        for col, idx in self.ordered.items():
+            idx.add(values[self.columns.index(col)], row_id)
+
+        return "OK"
+
+    def create_index(self, col, kind="hash"):
+        if col not in self.columns:
+            return "ERR: no such column"
+
+        column = self.data[col]
+        if kind == "ordered":
+            self.ordered[col] = OrderedIndex(
+                (column.value(i), i) for i in range(self.row_count)
+            )
+            return f"Ordered index created on {col}"
+
+        idx = {}
+        for i in range(self.row_count):
+            idx.setdefault(column.value(i), []).append(i)
+
+        self.indexes[col] = idx
+        return f"Index created on {col}"
+
+    def bulk_insert(self, rows):
+        for n, values in enumerate(rows):
+            if len(values) != len(self.columns):
+                return f"ERR: row {n + 1}: column count mismatch"
+        start = self.row_count
+        for col, values in zip(self.columns, zip(*rows)):
+            column = self.data[col]
+            for value in values:
+                column.append(value)
+        self.row_count += len(rows)
+        index_batch(self, start, rows)
+        return "OK"
+
+    def row(self, i):
+        return {col: self.data[col].value(i) for col in self.columns}
+
+    def value(self, i, col):
+        return self.data[col].value(i)
+
+    def rows_for(self, row_ids):
+        return [self.row(i) for i in row_ids]
+
+    def scan(self, col, op, args):
+        """Vectorized column scan -> row-id bitmap."""
+        if col not in self.data:
+            return 0
+        return self.data[col].scan(op, args)
+
+    def filter(self, col, op, args):
+        """Row ids matching `col op args`, ascending."""
+        if op == "==" and col in self.indexes:
+            return list(self.indexes[col].get(args[0], []))
+        if col in self.ordered:
+            return sorted(self.ordered[col].lookup(op, args))
+        return bitmap_ids(self.scan(col, op, args), self.row_count)
+
+    def select_all(self):
+        return self.rows_for(range(self.row_count))
+
+    def select_where(self, col, value):
+        return self.rows_for(self.filter(col, "==", (value,)))
+
+
+# -------------------------
+# Paged on-disk storage
+# -------------------------
+PAGE_SIZE = 8192
+PAGE_HEADER = struct.Struct("<HH")       # rows in page, bytes used
+FIELD_LEN = struct.Struct("<H")
+
+
+def encode_row(values):
+    out = bytearray()
+    for v in values:
+        data = v.encode("utf-8")
+        out += FIELD_LEN.pack(len(data))
+        out += data
+    return bytes(out)
+
+
+def decode_page(buf, width):
+    """Page bytes -> list of row tuples."""
+    n_rows, used = PAGE_HEADER.unpack_from(buf, 0)
+    rows = []
+    pos = PAGE_HEADER.size
+    for _ in range(n_rows):
+        row = []
+        for _ in range(width):
+            (length,) = FIELD_LEN.unpack_from(buf, pos)
+            pos += FIELD_LEN.size
+            row.append(bytes(buf[pos:pos + length]).decode("utf-8"))
+            pos += length
+        rows.append(tuple(row))
+    return rows
+
+
+class BufferPool:
+    """LRU cache of decoded pages shared by every paged table of an engine."""
+
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.pages = OrderedDict()       # (table, page_no) -> [row tuples]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, load):
+        rows = self.pages.get(key)
+        if rows is not None:
+            self.pages.move_to_end(key)
+            self.hits += 1
+            return rows
+        self.misses += 1
+        rows = load()
+        self.pages[key] = rows
+        if len(self.pages) > self.capacity:
+            self.pages.popitem(last=False)
+        return rows
+
+
+class PagedTable:
+    """
+    Table stored in fixed-size pages in `<data_dir>/<name>.tbl`.
+
+    Full pages are read through a read-only mmap and decoded into the
+    shared BufferPool on demand; the last, partially filled page stays in
+    memory and is rewritten in place on flush(). Only the pool, the tail
+    page, one row-id offset per page and the indexes live in RAM.
+    """
+
+    def __init__(self, name, columns, data_dir, pool):
+        self.name = name
+        self.columns = columns
+        self.positions = {col: i for i, col in enumerate(columns)}
+        self.indexes = {}               # col_name -> {value: [row_ids]}
+        self.ordered = {}               # col_name -> OrderedIndex
+        self.pool = pool
+        self.path = os.path.join(data_dir, f"{name}.tbl")
+
+        mode = "r+b" if os.path.exists(self.path) else "w+b"
+        self.file = open(self.path, mode)
+        self.mm = None
+        self.mapped_pages = 0
+
+        # page_starts[p] = row id of the first row in page p
+        self.page_starts = []
+        self.row_count = 0
+        self.tail = []                  # encoded records of the last page
+        self.tail_rows = []             # the same rows, decoded
+        self.tail_bytes = PAGE_HEADER.size
+        self._load()
+
+    # -------------------------
+    # Pages
+    # -------------------------
+    def _load(self):
+        pages = os.path.getsize(self.path) // PAGE_SIZE
+        for p in range(pages):
+            self.page_starts.append(self.row_count)
+            n_rows, _ = PAGE_HEADER.unpack_from(self._page_bytes(p), 0)
+            self.row_count += n_rows
+        if pages:
+            # reopen the last page for appends
+            last = self._page_bytes(pages - 1)
+            self.tail_rows = decode_page(last, len(self.columns))
+            self.tail = [encode_row(r) for r in self.tail_rows]
+            self.tail_bytes = PAGE_HEADER.size + sum(map(len, self.tail))
+        else:
+            self.page_starts.append(0)
+
+    def _page_bytes(self, page_no):
+        if page_no >= self.mapped_pages:
+            self.file.flush()
+            if self.mm is not None:
+                self.mm.close()
+            self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.mapped_pages = len(self.mm) // PAGE_SIZE
+        start = page_no * PAGE_SIZE
+        return memoryview(self.mm)[start:start + PAGE_SIZE]
+
+    @property
+    def tail_page(self):
+        return len(self.page_starts) - 1
+
+    def _write_tail(self):
+        page = bytearray(PAGE_SIZE)
+        PAGE_HEADER.pack_into(page, 0, len(self.tail), self.tail_bytes)
+        pos = PAGE_HEADER.size
+        for record in self.tail:
+            page[pos:pos + len(record)] = record
+            pos += len(record)
+        self.file.seek(self.tail_page * PAGE_SIZE)
+        self.file.write(page)
+
+    def _append(self, values):
+        record = encode_row(values)
+        if PAGE_HEADER.size + len(record) > PAGE_SIZE:
+            raise ValueError("row larger than a page")
+        if self.tail_bytes + len(record) > PAGE_SIZE:
+            self._write_tail()
+            self.page_starts.append(self.row_count)
+            self.tail = []
+            self.tail_rows = []
+            self.tail_bytes = PAGE_HEADER.size
+        self.tail.append(record)
+        self.tail_rows.append(tuple(values))
+        self.tail_bytes += len(record)
+        self.row_count += 1
+
+    def flush(self):
+        if self.tail:
+            self._write_tail()
+        self.file.flush()
+        os.fsync(self.file.fileno())
+
+    def close(self):
+        self.flush()
+        if self.mm is not None:
+            self.mm.close()
+        self.file.close()
+
+    def _page_rows(self, page_no):
+        if page_no == self.tail_page:
+            return self.tail_rows
+        return self.pool.get(
+            (self.name, page_no),
+            lambda: decode_page(self._page_bytes(page_no), len(self.columns)),
+        )
+
+    def iter_values(self):
+        """(row_id, values) for every row. Reads pages directly so a full
+        scan does not flush the buffer pool."""
+        width = len(self.columns)
+        row_id = 0
+        for p in range(self.tail_page):
+            for values in decode_page(self._page_bytes(p), width):
+                yield row_id, values
+                row_id += 1
+        for values in list(self.tail_rows):
+            yield row_id, values
+            row_id += 1
+
+    # -------------------------
+    # Table interface
+    # -------------------------
+    def _values(self, i):
+        p = bisect_right(self.page_starts, i) - 1
+        return self._page_rows(p)[i - self.page_starts[p]]
+
+    def row(self, i):
+        return dict(zip(self.columns, self._values(i)))
+
+    def value(self, i, col):
+        return self._values(i)[self.positions[col]]
+
+    def rows_for(self, row_ids):
+        return [self.row(i) for i in row_ids]
+
+    def insert(self, values):
+        if len(values) != len(self.columns):
+            return "ERR: column count mismatch"
+        try:
+            self._append(values)
+        except ValueError as e:
+            return f"ERR: {e}"
+        index_batch(self, self.row_count - 1)
+        self.flush()
+        return "OK"
+
+    def bulk_insert(self, rows):
+        for n, values in enumerate(rows):
+            if len(values) != len(self.columns):
+                return f"ERR: row {n + 1}: column count mismatch"
+        start = self.row_count
+        result = "OK"
+        try:
+            for values in rows:
+                self._append(values)
+        except ValueError as e:
+            result = f"ERR: {e}"
+        index_batch(self, start, rows[:self.row_count - start])
+        self.flush()
+        return result
+
+    def create_index(self, col, kind="hash"):
+        if col not in self.columns:
+            return "ERR: no such column"
+
+        pos = self.positions[col]
+        if kind == "ordered":
+            self.ordered[col] = OrderedIndex(
+                (values[pos], i) for i, values in self.iter_values()
+            )
+            return f"Ordered index created on {col}"
+
+        idx = {}
+        for i, values in self.iter_values():
+            idx.setdefault(values[pos], []).append(i)
+        self.indexes[col] = idx
+        return f"Index created on {col}"
+
+    def filter(self, col, op, args):
+        """Row ids matching `col op args`, ascending."""
+        if col not in self.columns:
+            return []
+        if op == "==" and col in self.indexes:
+            return list(self.indexes[col].get(args[0], []))
+        if col in self.ordered:
+            return sorted(self.ordered[col].lookup(op, args))
+
+        test, pos = predicate(op, args), self.positions[col]
+        return [i for i, values in self.iter_values() if test(values[pos])]
+
+    def select_all(self):
+        return [dict(zip(self.columns, values)) for _, values in self.iter_values()]
+
+    def select_where(self, col, value):
+        return self.rows_for(self.filter(col, "==", (value,)))
+
+
+TABLE_TYPES = {"row": Table, "columnar": ColumnTable, "paged": PagedTable}
+
+
+# -------------------------
+# SELECT clauses
+# -------------------------
+def parse_predicate(tokens, i):
+    """`col op value` starting at tokens[i] -> ((col, op, args), next_i)"""
+    try:
+        col, op = tokens[i], tokens[i + 1].upper()
+        if op == "BETWEEN":
+            if tokens[i + 3].upper() != "AND":
+                raise ValueError("use: col BETWEEN lo AND hi")
+            return (col, op, (tokens[i + 2], tokens[i + 4])), i + 5
+        if op == "LIKE":
+            pattern = tokens[i + 2]
+            if not pattern.endswith("%") or "%" in pattern[:-1]:
+                raise ValueError("LIKE only supports prefix patterns ('abc%')")
+            return (col, op, (pattern[:-1],)), i + 3
+        if op == "==" or op in COMPARE:
+            return (col, op, (tokens[i + 2],)), i + 3
+    except IndexError:
+        raise ValueError("incomplete WHERE clause")
+    raise ValueError(f"unsupported operator '{tokens[i + 1]}'")
+
+
+def order_ids(table, col, descending, row_ids, limit):
+    """
+    Row ids sorted on `col`. With an ordered index this is an index walk
+    that stops after `limit` matches; otherwise a bounded heap for LIMIT or
+    a full sort without it.
+    """
+    index = table.ordered.get(col)
+    if index is not None:
+        allowed = None if row_ids is None else set(row_ids)
+        out = []
+        for rid in index.walk(descending):
+            if allowed is None or rid in allowed:
+                out.append(rid)
+                if len(out) == limit:
+                    break
+        return out
+
+    if row_ids is None:
+        row_ids = range(table.row_count)
+    key = lambda i: sort_key(table.value(i, col))
+    if limit is not None:
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        return pick(limit, row_ids, key=key)
+    return sorted(row_ids, key=key, reverse=descending)
+
+
+# -------------------------
+# SELECT parsing
+# -------------------------
+AGGREGATES = ("COUNT", "SUM", "AVG")
+
+
+class Query:
+    """
+    Parsed SELECT.
+
+    items     [(func, ref)]  func is None for a plain column, ref may be "*"
+    tables    [name, ...]    FROM table first, then each JOIN in order
+    joins     [(left_ref, right_ref)] one ON condition per JOIN
+    where     [(col_ref, op, args)] ANDed together
+    """
+
+    def __init__(self, items, tables, joins=(), where=(), group_by=None,
+                 order_by=None, limit=None, legacy=False):
+        self.items = list(items)
+        self.tables = list(tables)
+        self.joins = list(joins)
+        self.where = list(where)
+        self.group_by = group_by
+        self.order_by = order_by
+        self.limit = limit
+        self.legacy = legacy          # "SELECT table ..." without FROM
+
+    def with_where(self, where):
+        return Query(self.items, self.tables, self.joins, where, self.group_by,
+                     self.order_by, self.limit, self.legacy)
+
+    @property
+    def aggregated(self):
+        return self.group_by is not None or any(f for f, _ in self.items)
+
+
+def item_name(item):
+    func, ref = item
+    return f"{func}({ref})" if func else ref
+
+
+def parse_items(text):
+    items = []
+    for raw in text.split(","):
+        raw = raw.strip()
+        if not raw:
+            raise ValueError("empty select item")
+        upper = raw.upper()
+        func = next((f for f in AGGREGATES if upper.startswith(f + "(")), None)
+        if func:
+            if not raw.endswith(")"):
+                raise ValueError(f"bad aggregate '{raw}'")
+            ref = raw[len(func) + 1:-1].strip()
+            if ref == "*" and func != "COUNT":
+                raise ValueError(f"{func}(*) is not supported")
+            items.append((func, ref))
+        else:
+            items.append((None, raw))
+    return items
+
+
+def parse_clauses(tokens):
+    """
+    [WHERE pred [AND pred ...]] [GROUP BY col] [ORDER BY col [ASC|DESC]]
+    [LIMIT k] -> (where, group_by, order_by, limit)
+    """
+    where = []
+    group_by = order_by = limit = None
+    i = 0
+    while i < len(tokens):
+        word = tokens[i].upper()
+        if word == "WHERE":
+            pred, i = parse_predicate(tokens, i + 1)
+            where.append(pred)
+            while i < len(tokens) and tokens[i].upper() == "AND":
+                pred, i = parse_predicate(tokens, i + 1)
+                where.append(pred)
+        elif word == "GROUP":
+            if i + 2 >= len(tokens) or tokens[i + 1].upper() != "BY":
+                raise ValueError("use: GROUP BY col")
+            group_by, i = tokens[i + 2], i + 3
+        elif word == "ORDER":
+            if i + 2 >= len(tokens) or tokens[i + 1].upper() != "BY":
+                raise ValueError("use: ORDER BY col [ASC|DESC]")
+            col, i = tokens[i + 2], i + 3
+            descending = False
+            if i < len(tokens) and tokens[i].upper() in ("ASC", "DESC"):
+                descending = tokens[i].upper() == "DESC"
+                i += 1
+            order_by = (col, descending)
+        elif word == "LIMIT":
+            if i + 1 >= len(tokens) or not tokens[i + 1].isdigit():
+                raise ValueError("LIMIT needs a number")
+            limit, i = int(tokens[i + 1]), i + 2
+        else:
+            raise ValueError(f"unexpected '{tokens[i]}'")
+    return where, group_by, order_by, limit
+
+
+def parse_select(tokens):
+    """
+    tokens after SELECT. Two forms:
+        table [clauses]
+        items FROM table [JOIN table ON a == b ...] [clauses]
+    """
+    if not tokens:
+        raise ValueError("SELECT needs a table")
+    upper = [t.upper() for t in tokens]
+
+    if "FROM" not in upper:
+        items, tables, joins, i = [(None, "*")], [tokens[0]], [], 1
+    else:
+        f = upper.index("FROM")
+        if f == 0 or f + 1 >= len(tokens):
+            raise ValueError("use: SELECT items FROM table")
+        items = parse_items(" ".join(tokens[:f]))
+        tables, joins, i = [tokens[f + 1]], [], f + 2
+        while i < len(tokens) and upper[i] == "JOIN":
+            if i + 5 >= len(tokens) or upper[i + 2] != "ON" or tokens[i + 4] != "==":
+                raise ValueError("use: JOIN table ON a == b")
+            tables.append(tokens[i + 1])
+            joins.append((tokens[i + 3], tokens[i + 5]))
+            i += 6
+
+    if len(set(tables)) != len(tables):
+        raise ValueError("a table can only appear once")
+    where, group_by, order_by, limit = parse_clauses(tokens[i:])
+    return Query(items, tables, joins, where, group_by, order_by, limit,
+                 legacy="FROM" not in upper)
+
+
+PLACEHOLDER = "?"
+
+
+class PreparedStatement:
+    """
+    A SELECT parsed and planned once, with `?` placeholders in WHERE values
+    (`LIKE ?%` binds a prefix). execute(*params) writes the values into the
+    cached plan's predicates and runs it. The plan is rebuilt only when a
+    table it reads changes size or gains an index, since those are the
+    inputs the planner's costs depend on.
+    """
+
+    def __init__(self, engine, query, explain=False):
+        self.engine = engine
+        # fresh args tuples, so plan predicates can be traced back by identity
+        self.query = query.with_where([(c, op, tuple(list(args))) for c, op, args in query.where])
+        self.explain = explain
+        self.slots = [
+            (p, a)
+            for p, (_, _, args) in enumerate(self.query.where)
+            for a, arg in enumerate(args)
+            if arg == PLACEHOLDER
+        ]
+        self.plan = None
+        self.signature = None
+        self.sites = []
+
+    def _signature(self):
+        out = []
+        for name in self.query.tables:
+            table = self.engine.tables.get(name)
+            if table is None:
+                return None
+            out.append((id(table), table.row_count, tuple(table.indexes), tuple(table.ordered)))
+        return tuple(out)
+
+    def _binding_sites(self, root):
+        """(node, attr, index, col, op, where position) for every bound predicate."""
+        positions = {id(self.query.where[p][2]): p for p, _ in self.slots}
+        sites = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            for attr in ("preds", "rest"):
+                for i, (col, op, args) in enumerate(getattr(node, attr, ())):
+                    if id(args) in positions:
+                        sites.append((node, attr, i, col, op, positions[id(args)]))
+            pred = getattr(node, "pred", None)
+            if pred is not None and id(pred[2]) in positions:
+                sites.append((node, "pred", None, pred[0], pred[1], positions[id(pred[2])]))
+            stack.extend(n for n in (getattr(node, "left", None), getattr(node, "right", None)) if n)
+        return sites
+
+    def execute(self, *params):
+        if len(params) != len(self.slots):
+            return f"ERR: expected {len(self.slots)} parameters, got {len(params)}"
+        if self.query.legacy and self.query.tables[0] not in self.engine.tables:
+            return "ERR: no such table"
+
+        signature = self._signature()
+        if self.plan is None or signature != self.signature:
+            try:
+                self.plan = self.engine.planner.plan(self.query)
+            except ValueError as e:
+                self.plan = None
+                return f"ERR: {e}"
+            self.signature = signature
+            self.sites = self._binding_sites(self.plan.root)
+
+        bound = {p: list(self.query.where[p][2]) for p, _ in self.slots}
+        for (p, a), value in zip(self.slots, params):
+            bound[p][a] = str(value)
+        for node, attr, i, col, op, p in self.sites:
+            pred = (col, op, tuple(bound[p]))
+            if i is None:
+                setattr(node, attr, pred)
+            else:
+                getattr(node, attr)[i] = pred
+        try:
+            return self.plan.explain() if self.explain else self.plan.execute()
+        except ValueError as e:
+            return f"ERR: {e}"
+
+
+# -------------------------
+# Statistics
+# -------------------------
+class TableStats:
+    """Row count and distinct-value estimates, recomputed when the table grows."""
+
+    SAMPLE = 1000
+
+    def __init__(self, table):
+        self.table = table
+        self.rows = table.row_count
+        self.distinct_cache = {}
+
+    def distinct(self, col):
+        if col not in self.distinct_cache:
+            self.distinct_cache[col] = self._estimate_distinct(col)
+        return self.distinct_cache[col]
+
+    def _estimate_distinct(self, col):
+        table = self.table
+        if self.rows == 0:
+            return 1
+        if col in table.indexes:
+            return max(1, len(table.indexes[col]))
+        step = max(1, self.rows // self.SAMPLE)
+        sample = [table.value(i, col) for i in range(0, self.rows, step)]
+        seen = len(set(sample))
+        if seen < 0.9 * len(sample):
+            return seen                               # small domain, mostly seen
+        return max(1, self.rows * seen // len(sample))  # scale up a near-unique sample
+
+    def selectivity(self, pred):
+        col, op, _ = pred
+        if op == "==":
+            return 1 / self.distinct(col)
+        if op == "BETWEEN":
+            return 0.25
+        if op == "LIKE":
+            return 0.1
+        return 1 / 3
+
+
+# -------------------------
+# Plan nodes
+# -------------------------
+# Every node produces a list of row-id tuples, one id per table in
+# `node.tables`. Costs are in "rows touched".
+
+SCAN_COST = {"row": 1.0, "columnar": 0.1, "paged": 2.0}
+
+
+class FullScan:
+    def __init__(self, name, table, stats, preds):
+        self.tables = [name]
+        self.name, self.table, self.preds = name, table, preds
+        self.est_rows = stats.rows
+        for p in preds:
+            self.est_rows *= stats.selectivity(p)
+        kind = ("columnar" if hasattr(table, "scan")
+                else "paged" if hasattr(table, "iter_values") else "row")
+        self.cost = stats.rows * SCAN_COST[kind] * max(1, len(preds))
+
+    def execute(self):
+        table, n = self.table, self.table.row_count
+        if not self.preds:
+            return [(i,) for i in range(n)]
+        if hasattr(table, "scan"):
+            bitmap = -1
+            for col, op, args in self.preds:
+                bitmap &= table.scan(col, op, args)
+            return [(i,) for i in bitmap_ids(bitmap & ((1 << n) - 1), n)]
+        if hasattr(table, "iter_values"):
+            tests = [(table.positions[col], predicate(op, args))
+                     for col, op, args in self.preds]
+            return [
+                (i,) for i, values in table.iter_values()
+                if all(test(values[pos]) for pos, test in tests)
+            ]
+        tests = [(col, predicate(op, args)) for col, op, args in self.preds]
+        return [
+            (i,) for i in range(n)
+            if all(test(table.value(i, col)) for col, test in tests)
+        ]
+
+    def explain(self):
+        where = " AND ".join(format_pred(self.name, p) for p in self.preds)
+        return [f"FullScan {self.name}" + (f" WHERE {where}" if where else "")
+                + f"  (rows={self.est_rows:.0f} cost={self.cost:.0f})"]
+
+
+class IndexLookup:
+    def __init__(self, name, table, stats, pred, rest):
+        self.tables = [name]
+        self.name, self.table, self.pred, self.rest = name, table, pred, rest
+        col, op, _ = pred
+        self.kind = "hash" if op == "==" and col in table.indexes else "ordered"
+        matched = stats.rows * stats.selectivity(pred)
+        self.cost = math.log2(stats.rows + 1) + matched
+        self.est_rows = matched
+        for p in rest:
+            self.est_rows *= stats.selectivity(p)
+
+    def execute(self):
+        ids = self.table.filter(*self.pred)
+        tests = [(col, predicate(op, args)) for col, op, args in self.rest]
+        value = self.table.value
+        return [(i,) for i in ids if all(test(value(i, col)) for col, test in tests)]
+
+    def explain(self):
+        line = f"IndexLookup {format_pred(self.name, self.pred)} ({self.kind})"
+        if self.rest:
+            line += " filter " + " AND ".join(format_pred(self.name, p) for p in self.rest)
+        return [line + f"  (rows={self.est_rows:.0f} cost={self.cost:.0f})"]
+
+
+class HashJoin:
+    def __init__(self, left, right, left_key, right_key, est_rows):
+        self.left, self.right = left, right
+        self.left_key, self.right_key = left_key, right_key
+        self.tables = left.tables + right.tables
+        self.est_rows = est_rows
+        self.cost = left.cost + right.cost + left.est_rows + right.est_rows
+        self.build_left = left.est_rows <= right.est_rows
+
+    def execute(self):
+        left, right = self.left.execute(), self.right.execute()
+        lget, rget = self.left_key.getter(self.left.tables), self.right_key.getter(self.right.tables)
+        build, probe = (left, right) if self.build_left else (right, left)
+        bget, pget = (lget, rget) if self.build_left else (rget, lget)
+
+        buckets = {}
+        for t in build:
+            buckets.setdefault(bget(t), []).append(t)
+        out = []
+        for t in probe:
+            for match in buckets.get(pget(t), ()):
+                out.append(match + t if self.build_left else t + match)
+        return out
+
+    def explain(self):
+        build = self.left if self.build_left else self.right
+        head = (f"HashJoin {self.left_key} == {self.right_key} "
+                f"build={'+'.join(build.tables)}  (rows={self.est_rows:.0f} cost={self.cost:.0f})")
+        return [head] + indent(self.left.explain()) + indent(self.right.explain())
+
+
+class IndexNestedLoopJoin:
+    def __init__(self, left, name, table, stats, left_key, right_col, preds, est_rows):
+        self.left = left
+        self.name, self.table, self.preds = name, table, preds
+        self.left_key, self.right_col = left_key, right_col
+        self.tables = left.tables + [name]
+        self.est_rows = est_rows
+        per_probe = 1 + stats.rows / stats.distinct(right_col)
+        self.cost = left.cost + left.est_rows * per_probe
+
+    def execute(self):
+        lget = self.left_key.getter(self.left.tables)
+        table, col = self.table, self.right_col
+        tests = [(c, predicate(op, args)) for c, op, args in self.preds]
+        out = []
+        for t in self.left.execute():
+            for rid in table.filter(col, "==", (lget(t),)):
+                if all(test(table.value(rid, c)) for c, test in tests):
+                    out.append(t + (rid,))
+        return out
+
+    def explain(self):
+        line = f"IndexNestedLoopJoin {self.left_key} == {self.name}.{self.right_col}"
+        if self.preds:
+            line += " filter " + " AND ".join(format_pred(self.name, p) for p in self.preds)
+        return ([line + f"  (rows={self.est_rows:.0f} cost={self.cost:.0f})"]
+                + indent(self.left.explain()))
+
+
+def indent(lines):
+    return ["  " + line for line in lines]
+
+
+def format_pred(name, pred):
+    col, op, args = pred
+    if op == "BETWEEN":
+        return f"{name}.{col} BETWEEN {args[0]} AND {args[1]}"
+    if op == "LIKE":
+        return f"{name}.{col} LIKE {args[0]}%"
+    return f"{name}.{col} {op} {args[0]}"
+
+
+class ColumnRef:
+    def __init__(self, table, col, table_obj):
+        self.table, self.col, self.table_obj = table, col, table_obj
+
+    def getter(self, tables):
+        pos, value, col = tables.index(self.table), self.table_obj.value, self.col
+        return lambda t: value(t[pos], col)
+
+    def __str__(self):
+        return f"{self.table}.{self.col}"
+
+
+def output_key(v):
+    if v is None:
+        return (2, "")
+    if isinstance(v, (int, float)):
+        return (0, v)
+    return sort_key(v)
+
+
+# -------------------------
+# Planner
+# -------------------------
+class SelectPlan:
+    """Access/join tree plus the aggregate, order, limit and projection steps."""
+
+    def __init__(self, query, tables, root, order_step):
+        self.query = query
+        self.tables = tables          # name -> table
+        self.root = root
+        self.order_step = order_step  # None | "index" | "topk" | "sort"
+
+    def execute(self):
+        q = self.query
+        tuples = self.root.execute()
+        if q.aggregated:
+            rows = self.aggregate(tuples)
+            if q.order_by:
+                name, desc = q.order_by
+                key = lambda r: output_key(r[name])
+                if q.limit is not None:
+                    pick = heapq.nlargest if desc else heapq.nsmallest
+                    rows = pick(q.limit, rows, key=key)
+                else:
+                    rows = sorted(rows, key=key, reverse=desc)
+            return rows[:q.limit] if q.limit is not None else rows
+
+        if q.order_by:
+            tuples = self.order(tuples)
+        elif q.limit is not None:
+            tuples = tuples[:q.limit]
+        return [self.project(t) for t in tuples]
+
+    def order(self, tuples):
+        q = self.query
+        ref = self.resolve(q.order_by[0])
+        desc = q.order_by[1]
+        if len(self.root.tables) == 1:
+            ids = None if not q.where else [t[0] for t in tuples]
+            return [(i,) for i in order_ids(ref.table_obj, ref.col, desc, ids, q.limit)]
+        get = ref.getter(self.root.tables)
+        key = lambda t: sort_key(get(t))
+        if q.limit is not None:
+            pick = heapq.nlargest if desc else heapq.nsmallest
+            return pick(q.limit, tuples, key=key)
+        return sorted(tuples, key=key, reverse=desc)
+
+    def resolve(self, ref):
+        return resolve_ref(ref, self.tables)
+
+    def project(self, t):
+        names = self.root.tables
+        items = self.query.items
+        if items == [(None, "*")]:
+            if len(names) == 1:
+                return self.tables[names[0]].row(t[0])
+            row = {}
+            for name, rid in zip(names, t):
+                for col, v in self.tables[name].row(rid).items():
+                    row[f"{name}.{col}"] = v
+            return row
+        out = {}
+        for item in items:
+            ref = self.resolve(item[1])
+            out[item_name(item)] = ref.table_obj.value(t[names.index(ref.table)], ref.col)
+        return out
+
+    def aggregate(self, tuples):
+        q = self.query
+        names = self.root.tables
+        group = self.resolve(q.group_by).getter(names) if q.group_by else None
+        getters = []
+        for func, ref in q.items:
+            if func is None or ref == "*":
+                getters.append(None)
+            else:
+                getters.append(self.resolve(ref).getter(names))
+
+        groups = {}
+        for t in tuples:
+            key = group(t) if group else None
+            acc = groups.get(key)
+            if acc is None:
+                acc = groups[key] = [[0, 0] for _ in q.items]   # [count, sum]
+            for (func, _), get, slot in zip(q.items, getters, acc):
+                if func is None:
+                    continue
+                if func == "COUNT":
+                    slot[0] += 1
+                    continue
+                n = as_number(get(t))
+                if n is not None:
+                    slot[0] += 1
+                    slot[1] += n
+
+        if not groups and group is None:
+            groups[None] = [[0, 0] for _ in q.items]
+
+        rows = []
+        for key, acc in groups.items():
+            row = {}
+            for item, (count, total) in zip(q.items, acc):
+                func = item[0]
+                if func is None:
+                    value = key
+                elif func == "COUNT":
+                    value = count
+                elif func == "SUM":
+                    value = total if count else None
+                else:
+                    value = total / count if count else None
+                row[item_name(item)] = value
+            rows.append(row)
+        return rows
+
+    def explain(self):
+        q = self.query
+        lines = []
+        if q.limit is not None:
+            lines.append(f"Limit {q.limit}")
+        if q.order_by:
+            col, desc = q.order_by
+            label = {"index": "IndexOrderWalk", "topk": "TopK", "sort": "Sort"}[self.order_step]
+            lines.append(f"{label} {col}{' DESC' if desc else ''}")
+        if q.aggregated:
+            aggs = ", ".join(item_name(i) for i in q.items if i[0])
+            by = f" group by {q.group_by}" if q.group_by else ""
+            lines.append(f"HashAggregate {aggs}{by}")
+        else:
+            lines.append("Project " + ", ".join(item_name(i) for i in q.items))
+        body = self.root.explain()
+        for depth in range(len(lines)):
+            lines[depth] = "  " * depth + lines[depth]
+        return "\n".join(lines + ["  " * len(lines) + line for line in body])
+
+
+def resolve_ref(ref, tables):
+    """'col' or 'table.col' -> ColumnRef, checked against the query's tables."""
+    if "." in ref:
+        name, col = ref.split(".", 1)
+        if name not in tables or col not in tables[name].columns:
+            raise ValueError(f"no such column '{ref}'")
+        return ColumnRef(name, col, tables[name])
+    owners = [name for name, t in tables.items() if ref in t.columns]
+    if not owners:
+        raise ValueError(f"no such column '{ref}'")
+    if len(owners) > 1:
+        raise ValueError(f"ambiguous column '{ref}'")
+    return ColumnRef(owners[0], ref, tables[owners[0]])
+
+
+class Planner:
+    """
+    Picks access paths and join methods from row counts and distinct-value
+    estimates. Joins are left-deep in the order written; each join is either
+    a hash join or, when the new table has an index on its join column and
+    that is cheaper, an index nested-loop join.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def plan(self, query):
+        tables = {}
+        for name in query.tables:
+            if name not in self.engine.tables:
+                raise ValueError(f"no such table '{name}'")
+            tables[name] = self.engine.tables[name]
+
+        self.validate(query, tables)
+
+        # push every predicate down to its table
+        preds = {name: [] for name in tables}
+        for col, op, args in query.where:
+            ref = resolve_ref(col, tables)
+            preds[ref.table].append((ref.col, op, args))
+
+        first = query.tables[0]
+        root = self.access_path(first, tables[first], preds[first])
+        for name, (a, b) in zip(query.tables[1:], query.joins):
+            ra, rb = resolve_ref(a, tables), resolve_ref(b, tables)
+            if rb.table == name and ra.table in root.tables:
+                left_key, right_key = ra, rb
+            elif ra.table == name and rb.table in root.tables:
+                left_key, right_key = rb, ra
+            else:
+                raise ValueError(f"JOIN {name} ON must compare {name} with an earlier table")
+            root = self.join(root, name, tables[name], preds[name], left_key, right_key)
+
+        order_step = None
+        if query.order_by:
+            order_step = "topk" if query.limit is not None else "sort"
+            if not query.aggregated and len(tables) == 1:
+                ref = resolve_ref(query.order_by[0], tables)
+                if ref.col in tables[ref.table].ordered:
+                    order_step = "index"
+        return SelectPlan(query, tables, root, order_step)
+
+    def validate(self, query, tables):
+        group = str(resolve_ref(query.group_by, tables)) if query.group_by else None
+        for func, ref in query.items:
+            if ref == "*":
+                continue
+            resolved = str(resolve_ref(ref, tables))
+            if query.aggregated and func is None and resolved != group:
+                raise ValueError(f"{ref} must appear in GROUP BY")
+        if query.order_by:
+            name = query.order_by[0]
+            if not query.aggregated:
+                resolve_ref(name, tables)
+            elif name not in {item_name(i) for i in query.items}:
+                raise ValueError(f"ORDER BY {name} must be a selected column")
+
+    def access_path(self, name, table, preds):
+        stats = self.engine.table_stats(name)
+        best = FullScan(name, table, stats, preds)
+        for i, pred in enumerate(preds):
+            col, op, _ = pred
+            indexed = col in table.ordered or (op == "==" and col in table.indexes)
+            if not indexed:
+                continue
+            candidate = IndexLookup(name, table, stats, pred, preds[:i] + preds[i + 1:])
+            if candidate.cost < best.cost:
+                best = candidate
+        return best
+
+    def join(self, left, name, table, preds, left_key, right_key):
+        left_stats = self.engine.table_stats(left_key.table)
+        stats = self.engine.table_stats(name)
+        right = self.access_path(name, table, preds)
+        d = max(left_stats.distinct(left_key.col), stats.distinct(right_key.col))
+        est_rows = left.est_rows * right.est_rows / d
+
+        best = HashJoin(left, right, left_key, right_key, est_rows)
+        col = right_key.col
+        if col in table.indexes or col in table.ordered:
+            inl = IndexNestedLoopJoin(left, name, table, stats, left_key, col, preds, est_rows)
+            if inl.cost < best.cost:
+                best = inl
+        return best
+
+
+class Engine:
+    BATCH_ROWS = 10_000
+
+    def __init__(self, data_dir=None, pool_pages=256, parse_cache_size=256):
         self.tables = {}
+        self.stats = {}                 # table name -> TableStats
+        self.planner = Planner(self)
+        self.parse_cache = OrderedDict()  # command -> (Query, explain)
+        self.parse_cache_size = parse_cache_size
+        self.data_dir = data_dir
+        self.pool = BufferPool(pool_pages)
+        if data_dir:
+            os.makedirs(data_dir, exist_ok=True)
+            self._open_catalog()
+
+    # -------------------------
+    # Catalog (paged tables only)
+    # -------------------------
+    @property
+    def catalog_path(self):
+        return os.path.join(self.data_dir, "catalog.json")
+
+    def _open_catalog(self):
+        if not os.path.exists(self.catalog_path):
+            return
+        with open(self.catalog_path, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+        for name, meta in catalog["tables"].items():
+            table = PagedTable(name, meta["columns"], self.data_dir, self.pool)
+            for col, kinds in meta["indexes"].items():
+                # older catalogs stored a single kind per column
+                for kind in [kinds] if isinstance(kinds, str) else kinds:
+                    table.create_index(col, kind)
+            self.tables[name] = table
+
+    def _save_catalog(self):
+        tables = {}
+        for name, table in self.tables.items():
+            if isinstance(table, PagedTable):
+                indexes = {col: ["hash"] for col in table.indexes}
+                for col in table.ordered:
+                    indexes.setdefault(col, []).append("ordered")
+                tables[name] = {"columns": table.columns, "indexes": indexes}
+        tmp = self.catalog_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"tables": tables}, f, indent=2)
+        os.replace(tmp, self.catalog_path)
+
+    def close(self):
+        for table in self.tables.values():
+            if isinstance(table, PagedTable):
+                table.close()
+
+    def copy_from(self, name, path, header=False):
+        """Bulk-load a CSV file, BATCH_ROWS rows at a time."""
+        table = self.tables[name]
+        loaded = 0
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            if header:
+                next(reader, None)
+            batch = []
+            for values in reader:
+                batch.append(values)
+                if len(batch) == self.BATCH_ROWS:
+                    result = table.bulk_insert(batch)
+                    if result != "OK":
+                        return f"{result} (after {loaded} rows)"
+                    loaded += len(batch)
+                    batch = []
+            if batch:
+                result = table.bulk_insert(batch)
+                if result != "OK":
+                    return f"{result} (after {loaded} rows)"
+                loaded += len(batch)
+        return f"COPY {loaded}"
+
+    def table_stats(self, name):
+        table = self.tables[name]
+        stats = self.stats.get(name)
+        if stats is None or stats.rows != table.row_count:
+            stats = self.stats[name] = TableStats(table)
+        return stats
+
+    # -------------------------
+    # Parse cache / prepared statements
+    # -------------------------
+    def _parse_query(self, parts):
+        """SELECT/EXPLAIN tokens -> (Query, explain); raises ValueError."""
+        explain = parts[0].upper() == "EXPLAIN"
+        if explain:
+            if len(parts) < 2 or parts[1].upper() != "SELECT":
+                raise ValueError("use EXPLAIN SELECT ...")
+            parts = parts[1:]
+        return parse_select(parts[1:]), explain
+
+    def prepare(self, command):
+        """Parse a SELECT once; returns a PreparedStatement."""
+        parts = shlex.split(command)
+        if not parts or parts[0].upper() not in ("SELECT", "EXPLAIN"):
+            raise ValueError("only SELECT / EXPLAIN can be prepared")
+        query, explain = self._parse_query(parts)
+        return PreparedStatement(self, query, explain)
+
+    def run_select(self, query, explain=False):
+        if query.legacy and query.tables[0] not in self.tables:
+            return "ERR: no such table"
+        try:
+            plan = self.planner.plan(query)
+            return plan.explain() if explain else plan.execute()
+        except ValueError as e:
+            return f"ERR: {e}"
 
     def execute(self, command):
+        cached = self.parse_cache.get(command)
+        if cached is not None:
+            self.parse_cache.move_to_end(command)
+            return self.run_select(*cached)
+
         parts = shlex.split(command)
         if not parts:
             return ""
@@ -74,9 +1615,21 @@ class Engine:
         if cmd == "CREATE":
             name = parts[1]
             cols = parts[2:]
+            storage = "row"
+            if len(cols) >= 2 and cols[-2].upper() == "USING":
+                storage = cols[-1].lower()
+                cols = cols[:-2]
+            if storage not in TABLE_TYPES:
+                return "ERR: unknown storage"
             if name in self.tables:
                 return "ERR: table exists"
-            self.tables[name] = Table(name, cols)
+            if storage == "paged":
+                if not self.data_dir:
+                    return "ERR: paged storage needs a data directory"
+                self.tables[name] = PagedTable(name, cols, self.data_dir, self.pool)
+                self._save_catalog()
+            else:
+                self.tables[name] = TABLE_TYPES[storage](name, cols)
             return f"Table '{name}' created"
 
         if cmd == "INSERT":
@@ -86,32 +1639,109 @@ class Engine:
             values = parts[2:]
             return self.tables[name].insert(values)
 
-        if cmd == "SELECT":
-            name = parts[1]
-            if name not in self.tables:
-                return "ERR: no such table"
-
-            if len(parts) == 2:
-                return self.tables[name].select_all()
-
-            if parts[2].upper() == "WHERE":
-                col = parts[3]
-                assert parts[4] == "==", "Use '=='"
-                value = parts[5]
-                return self.tables[name].select_where(col, value)
+        if cmd in ("SELECT", "EXPLAIN"):
+            try:
+                parsed = self._parse_query(parts)
+            except ValueError as e:
+                return f"ERR: {e}"
+            if self.parse_cache_size:
+                self.parse_cache[command] = parsed
+                if len(self.parse_cache) > self.parse_cache_size:
+                    self.parse_cache.popitem(last=False)
+            return self.run_select(*parsed)
 
         if cmd == "INDEX":
             name = parts[1]
             col = parts[2]
             if name not in self.tables:
                 return "ERR: no such table"
-            return self.tables[name].create_index(col)
+            kind = parts[3].lower() if len(parts) > 3 else "hash"
+            if kind not in ("hash", "ordered"):
+                return "ERR: index kind must be HASH or ORDERED"
+            result = self.tables[name].create_index(col, kind)
+            if self.data_dir and isinstance(self.tables[name], PagedTable):
+                self._save_catalog()
+            return result
+
+        if cmd == "COPY":
+            if len(parts) < 4 or parts[2].upper() != "FROM":
+                return "ERR: use COPY table FROM file.csv [HEADER]"
+            name, path = parts[1], parts[3]
+            if name not in self.tables:
+                return "ERR: no such table"
+            if not os.path.exists(path):
+                return "ERR: no such file"
+            header = len(parts) > 4 and parts[4].upper() == "HEADER"
+            return self.copy_from(name, path, header)
 
         return "ERR: unknown command"
 
 
-def repl():
-    engine = Engine()
+def benchmark(rows=10_000, queries=20_000):
+    """
+    Queries/sec for point lookups of the same shape with a different key each
+    time: re-parsed, through the parse cache (keyed on the literal text, so
+    mostly misses), and as a prepared statement (parsed and planned once).
+    """
+    def load(engine):
+        engine.execute("CREATE users id name")
+        engine.execute("INDEX users id")
+        engine.tables["users"].bulk_insert([[str(i), f"user{i}"] for i in range(rows)])
+        return engine
+
+    keys = [str(i % rows) for i in range(queries)]
+
+    def run(label, fn):
+        start = time.perf_counter()
+        for key in keys:
+            fn(key)
+        elapsed = time.perf_counter() - start
+        print(f"{label:<28} {queries / elapsed:>10,.0f} queries/s")
+
+    plain = load(Engine(parse_cache_size=0))
+    run("execute (no parse cache)", lambda k: plain.execute(f"SELECT users WHERE id == {k}"))
+
+    cached = load(Engine())
+    run("execute (parse cache)", lambda k: cached.execute(f"SELECT users WHERE id == {k}"))
+
+    stmt = cached.prepare("SELECT users WHERE id == ?")
+    run("prepared statement", stmt.execute)
+
+
+def check():
+    """
+    A column with both a hash and an ordered index must return each row once
+    after COPY and after single-row INSERT, for every storage type.
+    """
+    import tempfile
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "t.csv")
+        with open(path, "w", newline="") as f:
+            csv.writer(f).writerows([["1", "a"], ["2", "b"], ["2", "c"]])
+        engine = Engine(tmp)
+        for storage in TABLE_TYPES:
+            name = f"t_{storage}"
+            engine.execute(f"CREATE {name} id val USING {storage}")
+            engine.execute(f"INDEX {name} id")
+            engine.execute(f"INDEX {name} id ORDERED")
+            engine.execute(f"COPY {name} FROM {path}")
+            engine.execute(f"INSERT {name} 3 d")
+            stmt = engine.prepare(f"SELECT {name} WHERE id == ?")
+            for query, expected in [
+                (f"SELECT {name} WHERE id == 2", 2),
+                (f"SELECT {name} WHERE id >= 2", 3),
+                (f"SELECT {name} WHERE id == 3", 1),
+            ]:
+                got = len(engine.execute(query))
+                status = "ok" if got == expected else f"FAIL (got {got})"
+                print(f"{storage:<9} {query:<32} {expected} rows  {status}")
+            got = len(stmt.execute("2"))
+            print(f"{storage:<9} {'prepared id == 2':<32} 2 rows  {'ok' if got == 2 else f'FAIL (got {got})'}")
+        engine.close()
+
+
+def repl(data_dir=None):
+    engine = Engine(data_dir)
     print("Mini SQL Engine (type EXIT to quit)")
 
     while True:
@@ -121,6 +1751,13 @@ def repl():
         result = engine.execute(raw)
         print(result)
 
+    engine.close()
+
 
 if __name__ == "__main__":
-    repl()
+    if len(sys.argv) > 1 and sys.argv[1] == "--bench":
+        benchmark()
+    elif len(sys.argv) > 1 and sys.argv[1] == "--check":
+        check()
+    else:
+        repl(sys.argv[1] if len(sys.argv) > 1 else None)
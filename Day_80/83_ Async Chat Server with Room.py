@@ -14,51 +14,306 @@ Commands available:
     /rooms
     /users
     /msg <message>
+    /stats
     /quit
+
+Slow consumers:
+    Every client has a bounded outbound buffer (--max-queue frames). When it
+    is full the --slow-policy decides what happens:
+        drop-new    discard the frame that did not fit (default)
+        drop-old    discard the oldest queued frame to make room
+        disconnect  abort the client's connection
+
+Multi-process mode:
+    python "83_ Async Chat Server with Room.py" --workers 4
+
+    Each worker is a separate process with its own event loop and its own
+    SO_REUSEPORT listening socket on the same port, so the kernel spreads
+    connections across cores. The parent process runs a small room bus on a
+    Unix socket: workers publish presence changes and /msg broadcasts to it
+    and the bus relays them to every other worker. /rooms and /users report
+    users on all workers.
 """
 
+import os
+import sys
+import json
+import signal
+import socket
 import asyncio
-from collections import defaultdict
+import argparse
+import tempfile
+import itertools
+import multiprocessing
+from collections import defaultdict, deque
 
 
-class ChatServer:
+SLOW_POLICIES = ("drop-new", "drop-old", "disconnect")
+
+
+# -------------------------
+# Outbound buffer
+# -------------------------
+class Outbox:
+    """Bounded FIFO of encoded frames waiting to be written to one client."""
+
+    __slots__ = ("frames", "limit", "wakeup", "closed", "sent", "dropped", "peak")
+
+    def __init__(self, limit):
+        self.frames = deque()
+        self.limit = limit
+        self.wakeup = asyncio.Event()
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.peak = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def full(self):
+        return len(self.frames) >= self.limit
+
+    def push(self, frame):
+        self.frames.append(frame)
+        if len(self.frames) > self.peak:
+            self.peak = len(self.frames)
+        self.wakeup.set()
+
+    def drop_oldest(self):
+        self.frames.popleft()
+        self.dropped += 1
+
+    def take_all(self):
+        frames = list(self.frames)
+        self.frames.clear()
+        self.wakeup.clear()
+        return frames
+
+    def close(self):
+        self.closed = True
+        self.wakeup.set()
+
+
+# -------------------------
+# Cross-worker room bus
+# -------------------------
+class RoomBus:
+    """
+    Star relay between worker processes. Every line a worker sends is copied
+    to all other workers. Presence lines are remembered so a worker that
+    (re)connects can catch up, and a worker that drops off has its users
+    announced as gone.
+    """
+
     def __init__(self):
+        self.writers = set()
+        self.presence = {}      # (worker, uid) -> encoded "user" line
+
+    def relay(self, line, source):
+        for w in self.writers:
+            if w is not source:
+                w.write(line)
+
+    async def handle(self, reader, writer):
+        for line in self.presence.values():
+            writer.write(line)
+        self.writers.add(writer)
+        owned = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                event = json.loads(line)
+                key = (event.get("w"), event.get("u"))
+                if event["op"] == "user":
+                    self.presence[key] = line
+                    owned.add(key)
+                elif event["op"] == "gone":
+                    self.presence.pop(key, None)
+                    owned.discard(key)
+                self.relay(line, writer)
+        except Exception:
+            pass
+        finally:
+            self.writers.discard(writer)
+            for w, u in owned:
+                self.presence.pop((w, u), None)
+                self.relay(encode_event({"op": "gone", "w": w, "u": u}), None)
+            writer.close()
+
+    async def serve(self, sock):
+        server = await asyncio.start_unix_server(self.handle, sock=sock)
+        async with server:
+            await server.serve_forever()
+
+
+def encode_event(event):
+    return (json.dumps(event, separators=(",", ":")) + "\n").encode()
+
+
+class ChatServer:
+    def __init__(self, max_queue=256, slow_policy="drop-new", worker_id=None, bus_path=None):
+        if slow_policy not in SLOW_POLICIES:
+            raise ValueError(f"slow_policy must be one of {SLOW_POLICIES}")
         self.rooms = defaultdict(set)      # room -> set of writers
         self.usernames = {}                # writer -> name
         self.user_rooms = {}               # writer -> room
-        self.message_queues = {}           # writer -> asyncio.Queue
+        self.outboxes = {}                 # writer -> Outbox
+        self.user_ids = {}                 # writer -> id announced on the bus
+        self.remote_users = {}             # (worker, id) -> [name, room]
+        self.worker_id = worker_id
+        self.bus_path = bus_path
+        self.bus = None
+        self.next_id = itertools.count(1)
+        self.max_queue = max_queue
+        self.slow_policy = slow_policy
+        self.metrics = {
+            "broadcasts": 0,
+            "frames_queued": 0,
+            "frames_dropped": 0,
+            "slow_disconnects": 0,
+            "bus_events_out": 0,
+            "bus_events_in": 0,
+        }
 
     async def register(self, writer):
-        self.usernames[writer] = f"user{len(self.usernames)+1}"
+        uid = next(self.next_id)
+        if self.worker_id is None:
+            self.usernames[writer] = f"user{len(self.usernames)+1}"
+        else:
+            self.usernames[writer] = f"user{self.worker_id}-{uid}"
         self.user_rooms[writer] = None
-        self.message_queues[writer] = asyncio.Queue()
-        await self.send(writer, f"Welcome. Set name with: /nick <name>")
+        self.user_ids[writer] = uid
+        self.outboxes[writer] = Outbox(self.max_queue)
+        self.announce(writer)
+        self.send(writer, f"Welcome. Set name with: /nick <name>")
 
     async def unregister(self, writer):
         room = self.user_rooms.get(writer)
         if room and writer in self.rooms[room]:
             self.rooms[room].remove(writer)
 
+        uid = self.user_ids.pop(writer, None)
+        if uid is not None:
+            self.publish({"op": "gone", "w": self.worker_id, "u": uid})
+
         self.usernames.pop(writer, None)
         self.user_rooms.pop(writer, None)
-        self.message_queues.pop(writer, None)
+        outbox = self.outboxes.pop(writer, None)
+        if outbox and not outbox.closed:
+            # flush whatever is still queued (e.g. "Goodbye.") before closing
+            try:
+                writer.writelines(outbox.take_all())
+            except Exception:
+                pass
+            outbox.close()
 
         writer.close()
-        await writer.wait_closed()
+        try:
+            await writer.wait_closed()
+        except Exception:
+            pass
 
-    async def send(self, writer, message):
-        # push message into user's queue
-        await self.message_queues[writer].put(message + "\n")
+    def enqueue(self, writer, frame):
+        # frame is already encoded; room fan-out shares one bytes object
+        outbox = self.outboxes.get(writer)
+        if outbox is None or outbox.closed:
+            return
+        if outbox.full():
+            if self.slow_policy == "disconnect":
+                self.metrics["slow_disconnects"] += 1
+                outbox.close()
+                writer.transport.abort()
+                return
+            self.metrics["frames_dropped"] += 1
+            if self.slow_policy == "drop-new":
+                outbox.dropped += 1
+                return
+            outbox.drop_oldest()
+        outbox.push(frame)
+        self.metrics["frames_queued"] += 1
+
+    def send(self, writer, message):
+        self.enqueue(writer, (message + "\n").encode())
+
+    def broadcast(self, room, message):
+        """Encode once, then queue the same frame for every member of the room."""
+        frame = (message + "\n").encode()
+        self.metrics["broadcasts"] += 1
+        for w in list(self.rooms[room]):
+            self.enqueue(w, frame)
 
     async def broadcaster(self, writer):
-        queue = self.message_queues[writer]
-        while True:
-            msg = await queue.get()
+        outbox = self.outboxes[writer]
+        while not outbox.closed:
+            if not outbox.frames:
+                await outbox.wakeup.wait()
+                continue
+            frames = outbox.take_all()
             try:
-                writer.write(msg.encode())
+                writer.writelines(frames)
                 await writer.drain()
             except Exception:
                 break
+            outbox.sent += len(frames)
+
+    # -------------------------
+    # Bus (multi-process mode)
+    # -------------------------
+    def publish(self, event):
+        if self.bus is None:
+            return
+        self.bus.write(encode_event(event))
+        self.metrics["bus_events_out"] += 1
+
+    def announce(self, writer):
+        self.publish({
+            "op": "user", "w": self.worker_id, "u": self.user_ids[writer],
+            "name": self.usernames[writer], "room": self.user_rooms[writer],
+        })
+
+    async def bus_listener(self, reader):
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            event = json.loads(line)
+            self.metrics["bus_events_in"] += 1
+            op = event["op"]
+            if op == "msg":
+                self.broadcast(event["room"], event["text"])
+            elif op == "user":
+                self.remote_users[(event["w"], event["u"])] = [event["name"], event["room"]]
+            elif op == "gone":
+                self.remote_users.pop((event["w"], event["u"]), None)
+
+    def all_rooms(self):
+        rooms = list(self.rooms)
+        seen = set(rooms)
+        for _, room in self.remote_users.values():
+            if room and room not in seen:
+                seen.add(room)
+                rooms.append(room)
+        return rooms
+
+    def all_users(self):
+        return list(self.usernames.values()) + [name for name, _ in self.remote_users.values()]
+
+    def stats(self):
+        depths = [len(box) for box in self.outboxes.values()]
+        return {
+            **self.metrics,
+            "clients": len(self.outboxes),
+            "queue_depth_total": sum(depths),
+            "queue_depth_max": max(depths, default=0),
+            "queue_depth_peak": max((box.peak for box in self.outboxes.values()), default=0),
+            "max_queue": self.max_queue,
+            "slow_policy": self.slow_policy,
+            "worker": self.worker_id,
+            "remote_users": len(self.remote_users),
+        }
 
     async def handle(self, reader, writer):
         await self.register(writer)
@@ -74,7 +329,7 @@ class ChatServer:
                 if text.startswith("/"):
                     await self.handle_command(writer, text)
                 else:
-                    await self.send(writer, "Unknown command. Use /msg to chat.")
+                    self.send(writer, "Unknown command. Use /msg to chat.")
         except Exception:
             pass
 
@@ -87,7 +342,8 @@ class ChatServer:
 
         if cmd == "/nick":
             self.usernames[writer] = arg or self.usernames[writer]
-            await self.send(writer, f"Name set to {self.usernames[writer]}")
+            self.announce(writer)
+            self.send(writer, f"Name set to {self.usernames[writer]}")
 
         elif cmd == "/join":
             new_room = arg.strip()
@@ -98,39 +354,107 @@ class ChatServer:
 
             self.rooms[new_room].add(writer)
             self.user_rooms[writer] = new_room
-            await self.send(writer, f"You joined room '{new_room}'")
+            self.announce(writer)
+            self.send(writer, f"You joined room '{new_room}'")
 
         elif cmd == "/rooms":
-            await self.send(writer, "Rooms: " + ", ".join(self.rooms.keys()))
+            self.send(writer, "Rooms: " + ", ".join(self.all_rooms()))
 
         elif cmd == "/users":
-            names = [self.usernames[w] for w in self.usernames]
-            await self.send(writer, "Users: " + ", ".join(names))
+            self.send(writer, "Users: " + ", ".join(self.all_users()))
 
         elif cmd == "/msg":
             room = self.user_rooms.get(writer)
             if not room:
-                await self.send(writer, "Join a room first with /join <room>")
+                self.send(writer, "Join a room first with /join <room>")
                 return
             sender = self.usernames.get(writer, "unknown")
             message = f"[{room}] {sender}: {arg}"
-            for w in list(self.rooms[room]):
-                await self.send(w, message)
+            self.broadcast(room, message)
+            self.publish({"op": "msg", "room": room, "text": message})
+
+        elif cmd == "/stats":
+            stats = self.stats()
+            self.send(writer, "Stats: " + ", ".join(f"{k}={v}" for k, v in stats.items()))
 
         elif cmd == "/quit":
-            await self.send(writer, "Goodbye.")
+            self.send(writer, "Goodbye.")
             await self.unregister(writer)
 
         else:
-            await self.send(writer, "Unknown command")
+            self.send(writer, "Unknown command")
 
-    async def run(self, host="127.0.0.1", port=8888):
-        server = await asyncio.start_server(self.handle, host, port)
+    async def run(self, host="127.0.0.1", port=8888, reuse_port=False):
+        if self.bus_path:
+            reader, self.bus = await asyncio.open_unix_connection(self.bus_path)
+            asyncio.create_task(self.bus_listener(reader))
+
+        server = await asyncio.start_server(self.handle, host, port, reuse_port=reuse_port)
         addrs = ", ".join(str(sock.getsockname()) for sock in server.sockets)
-        print(f"Server running on {addrs}")
+        label = "Server" if self.worker_id is None else f"Worker {self.worker_id}"
+        print(f"{label} running on {addrs}")
         async with server:
             await server.serve_forever()
 
 
+# -------------------------
+# Multi-process mode
+# -------------------------
+def run_worker(worker_id, bus_path, host, port, max_queue, slow_policy):
+    server = ChatServer(max_queue=max_queue, slow_policy=slow_policy,
+                        worker_id=worker_id, bus_path=bus_path)
+    try:
+        asyncio.run(server.run(host, port, reuse_port=True))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_workers(workers, host, port, max_queue=256, slow_policy="drop-new"):
+    if not hasattr(socket, "SO_REUSEPORT"):
+        raise SystemExit("--workers needs SO_REUSEPORT (Linux / BSD / macOS)")
+
+    # Bind the bus before forking so workers can connect straight away.
+    bus_path = os.path.join(tempfile.mkdtemp(prefix="chatbus-"), "bus.sock")
+    bus_sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    bus_sock.bind(bus_path)
+    bus_sock.listen(workers)
+
+    ctx = multiprocessing.get_context("fork")
+    procs = [
+        ctx.Process(target=run_worker, daemon=True,
+                    args=(i + 1, bus_path, host, port, max_queue, slow_policy))
+        for i in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    try:
+        asyncio.run(RoomBus().serve(bus_sock))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.join()
+        os.unlink(bus_path)
+        os.rmdir(os.path.dirname(bus_path))
+
+
 if __name__ == "__main__":
-    asyncio.run(ChatServer().run())
+    parser = argparse.ArgumentParser(description="Async chat server with rooms")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--max-queue", type=int, default=256,
+                        help="frames buffered per client before the slow policy kicks in")
+    parser.add_argument("--slow-policy", choices=SLOW_POLICIES, default="drop-new")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes sharing the port via SO_REUSEPORT")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        run_workers(args.workers, args.host, args.port, args.max_queue, args.slow_policy)
+    else:
+        server = ChatServer(max_queue=args.max_queue, slow_policy=args.slow_policy)
+        asyncio.run(server.run(args.host, args.port))
@@ -0,0 +1,420 @@
+"""
+Project 83 — Chat Server Load Generator
+
+Opens many simulated clients against one of the chat servers, spreads them
+over rooms, sends messages at a target rate and prints one JSON report with
+end-to-end delivery latency, throughput and server memory.
+
+Run:
+    python "83_Chat Load Generator.py" --server 83 --spawn --clients 2000 --rate 2000
+    python "83_Chat Load Generator.py" --server 97 --spawn --clients 500 --rate 200
+    python "83_Chat Load Generator.py" --server 83 --spawn --ramp-step 500 --max-clients 5000
+
+Servers:
+    83  "83_ Async Chat Server with Room.py"  (/nick, /join, /msg line protocol)
+    97  "97_Real-Time Chat Server.py"          (NICK handshake, every message goes
+                                              to everyone, so there is one room;
+                                              --server-args "--mode threads" for
+                                              the thread-per-client variant)
+
+Every message carries the perf_counter_ns at which it was written, and every
+client scans what it receives for those stamps, so latency is measured from
+the sender's write to the receiver's read (same process, same clock).
+
+Ramp mode (--ramp-step) adds clients in steps, runs a probe at each step and
+stops at the first step that breaks the SLO (--slo-p99-ms, --slo-delivery)
+or fails to connect. "max_healthy_clients" is the last step that held.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shlex
+import random
+import asyncio
+import argparse
+import resource
+import subprocess
+from itertools import accumulate
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVERS = {
+    "83": {"file": "83_ Async Chat Server with Room.py", "port": 8888},
+    "97": {"file": "97_Real-Time Chat Server.py", "port": 5555},
+}
+
+STAMP = re.compile(rb"LG\|(\d+)\|")
+CONNECT_CONCURRENCY = 200
+
+
+# -------------------------
+# Recording
+# -------------------------
+class Recorder:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.latencies = []
+        self.sent = 0
+        self.expected = 0
+        self.delivered = 0
+        self.started = time.perf_counter()
+
+    def deliver(self, now_ns, stamp_ns):
+        self.delivered += 1
+        self.latencies.append(now_ns - stamp_ns)
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def server_rss_kb(pid):
+    """RSS of pid plus all of its descendants (workers), Linux only."""
+    if pid is None or not os.path.exists(f"/proc/{pid}"):
+        return None
+    total = 0
+    stack = [pid]
+    while stack:
+        p = stack.pop()
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+                        break
+            for tid in os.listdir(f"/proc/{p}/task"):
+                with open(f"/proc/{p}/task/{tid}/children") as f:
+                    stack.extend(int(c) for c in f.read().split())
+        except OSError:
+            continue
+    return total
+
+
+# -------------------------
+# Room assignment
+# -------------------------
+def room_assigner(dist, size, max_clients, rng):
+    """Yields a room name for each new client."""
+    if dist == "fixed":
+        cid = 0
+        while True:
+            yield f"room{cid // size}"
+            cid += 1
+
+    if dist == "uniform":
+        room = 0
+        while True:
+            for _ in range(rng.randint(1, 2 * size - 1)):
+                yield f"room{room}"
+            room += 1
+
+    # zipf: a few very large rooms and a long tail of small ones
+    n_rooms = max(1, max_clients // size)
+    cum = list(accumulate(1.0 / k for k in range(1, n_rooms + 1)))
+    while True:
+        yield f"room{rng.choices(range(n_rooms), cum_weights=cum)[0]}"
+
+
+# -------------------------
+# Simulated clients
+# -------------------------
+class SimClient:
+    __slots__ = ("cid", "room", "reader", "writer", "task")
+
+    def __init__(self, cid, room):
+        self.cid = cid
+        self.room = room
+        self.reader = None
+        self.writer = None
+        self.task = None
+
+    async def connect(self, host, port, server):
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        if server == "83":
+            await self.reader.readline()                      # welcome
+            self.writer.write(f"/nick lg{self.cid}\n/join {self.room}\n".encode())
+            await self.reader.readline()                      # name set
+            await self.reader.readline()                      # joined
+        else:
+            await self.reader.readexactly(4)                  # NICK
+            self.writer.write(f"lg{self.cid}\n".encode())
+            # wait for our own join broadcast so the nick is not merged
+            # with the first chat message in the server's recv()
+            await self.reader.readuntil(f"lg{self.cid} joined the chat!".encode())
+
+    def frame(self, server, padding):
+        stamp = b"LG|%d|" % time.perf_counter_ns()
+        if server == "83":
+            return b"/msg " + stamp + padding + b"\n"
+        return stamp + padding + b"\n"
+
+    async def receive(self, rec):
+        buf = b""
+        clock = time.perf_counter_ns
+        try:
+            while True:
+                chunk = await self.reader.read(65536)
+                if not chunk:
+                    break
+                buf += chunk
+                cut = buf.rfind(b"\n")
+                if cut < 0:
+                    continue
+                now = clock()
+                for m in STAMP.finditer(buf, 0, cut):
+                    rec.deliver(now, int(m.group(1)))
+                buf = buf[cut + 1:]
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+    def close(self):
+        if self.task:
+            self.task.cancel()
+        if self.writer:
+            self.writer.close()
+
+
+class LoadGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.rooms = room_assigner(args.room_dist, args.room_size,
+                                   max(args.clients, args.max_clients), self.rng)
+        self.clients = []
+        self.next_cid = 0
+        self.room_members = {}
+        self.rec = Recorder()
+        self.connect_errors = 0
+        self.padding = b"x" * max(0, args.msg_size - 24)
+
+    async def add_clients(self, count):
+        sem = asyncio.Semaphore(CONNECT_CONCURRENCY)
+        new = []
+        for _ in range(count):
+            room = next(self.rooms) if self.args.server == "83" else "all"
+            new.append(SimClient(self.next_cid, room))
+            self.next_cid += 1
+
+        async def open_one(client):
+            async with sem:
+                try:
+                    await asyncio.wait_for(
+                        client.connect(self.args.host, self.args.port, self.args.server),
+                        self.args.connect_timeout)
+                    return True
+                except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                    client.close()
+                    return False
+
+        results = await asyncio.gather(*(open_one(c) for c in new))
+        for client, ok in zip(new, results):
+            if not ok:
+                self.connect_errors += 1
+                continue
+            self.clients.append(client)
+            self.room_members[client.room] = self.room_members.get(client.room, 0) + 1
+            client.task = asyncio.create_task(client.receive(self.rec))
+        return results.count(False)
+
+    async def drive(self, seconds):
+        """Send at --rate msgs/s from random clients, in ~10 ms ticks."""
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + seconds
+        sent = 0
+        server = self.args.server
+        while True:
+            now = loop.time()
+            if now >= deadline:
+                break
+            # catch up on whatever is due, so a late tick does not lower the rate
+            due = int((now - start) * self.args.rate) - sent
+            for _ in range(due):
+                client = self.rng.choice(self.clients)
+                client.writer.write(client.frame(server, self.padding))
+                self.rec.expected += self.room_members[client.room]
+            sent += due
+            self.rec.sent += due
+            await asyncio.sleep(0.01)
+
+    async def probe(self, pid):
+        """Run one measurement at the current client count."""
+        self.rec.reset()
+        await self.drive(self.args.duration)
+        sent_elapsed = time.perf_counter() - self.rec.started
+        await asyncio.sleep(self.args.grace)
+
+        rec = self.rec
+        lat = sorted(rec.latencies)
+        return {
+            "clients": len(self.clients),
+            "rooms": len(self.room_members),
+            "largest_room": max(self.room_members.values(), default=0),
+            "sent": rec.sent,
+            "sent_per_s": round(rec.sent / sent_elapsed, 1),
+            "delivered": rec.delivered,
+            "delivered_per_s": round(rec.delivered / sent_elapsed, 1),
+            "delivery_ratio": round(rec.delivered / rec.expected, 4) if rec.expected else 1.0,
+            "latency_ms": {
+                "p50": round(percentile(lat, 0.50) / 1e6, 3),
+                "p90": round(percentile(lat, 0.90) / 1e6, 3),
+                "p99": round(percentile(lat, 0.99) / 1e6, 3),
+                "max": round(lat[-1] / 1e6, 3) if lat else 0.0,
+            },
+            "server_rss_kb": server_rss_kb(pid),
+        }
+
+    def healthy(self, step, failed):
+        return (not failed
+                and step["latency_ms"]["p99"] <= self.args.slo_p99_ms
+                and step["delivery_ratio"] >= self.args.slo_delivery)
+
+    async def run(self, pid):
+        if self.args.ramp_step:
+            targets = list(range(self.args.ramp_step, self.args.max_clients + 1,
+                                 self.args.ramp_step))
+        else:
+            targets = [self.args.clients]
+
+        steps = []
+        max_healthy = 0
+        for target in targets:
+            failed = await self.add_clients(target - len(self.clients))
+            if not self.clients:
+                break
+            step = await self.probe(pid)
+            step["connect_failures"] = failed
+            step["healthy"] = self.healthy(step, failed)
+            steps.append(step)
+            print(f"  {step['clients']:>6} clients  p99={step['latency_ms']['p99']} ms  "
+                  f"delivered={step['delivery_ratio']}", file=sys.stderr)
+            if not step["healthy"]:
+                break
+            max_healthy = step["clients"]
+
+        for client in self.clients:
+            client.close()
+        return steps, max_healthy
+
+
+# -------------------------
+# Server process
+# -------------------------
+def spawn_server(args):
+    path = os.path.join(HERE, SERVERS[args.server]["file"])
+    cmd = [sys.executable, path, "--host", args.host, "--port", str(args.port)]
+    cmd += shlex.split(args.server_args)
+    proc = subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return proc
+
+
+async def wait_for_port(host, port, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection(host, port)
+            writer.close()
+            return True
+        except OSError:
+            await asyncio.sleep(0.1)
+    return False
+
+
+def raise_fd_limit():
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return resource.getrlimit(resource.RLIMIT_NOFILE)[0]
+
+
+async def main_async(args):
+    proc = spawn_server(args) if args.spawn else None
+    pid = proc.pid if proc else args.server_pid
+    try:
+        # probing the 97 server with a bare connect would leave a stuck
+        # NICK handshake in its accept loop, so just give it a moment
+        if proc and args.server == "97":
+            await asyncio.sleep(1.0)
+        elif not await wait_for_port(args.host, args.port):
+            raise SystemExit(f"server not reachable on {args.host}:{args.port}")
+
+        gen = LoadGenerator(args)
+        steps, max_healthy = await gen.run(pid)
+        return {
+            "config": {
+                "server": args.server,
+                "server_args": args.server_args,
+                "clients": args.clients,
+                "ramp_step": args.ramp_step,
+                "max_clients": args.max_clients,
+                "room_dist": args.room_dist if args.server == "83" else "single",
+                "room_size": args.room_size,
+                "rate": args.rate,
+                "msg_size": args.msg_size,
+                "duration": args.duration,
+                "slo_p99_ms": args.slo_p99_ms,
+                "slo_delivery": args.slo_delivery,
+                "seed": args.seed,
+            },
+            "connect_errors": gen.connect_errors,
+            "max_healthy_clients": max_healthy,
+            "steps": steps,
+        }
+    finally:
+        if proc:
+            proc.terminate()
+            proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load generator for the chat servers")
+    parser.add_argument("--server", choices=sorted(SERVERS), default="83")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="defaults to the server's own port")
+    parser.add_argument("--spawn", action="store_true", help="start the server as a subprocess")
+    parser.add_argument("--server-args", default="", help="extra args for a spawned server")
+    parser.add_argument("--server-pid", type=int, help="pid to sample RSS from when not spawning")
+    parser.add_argument("--clients", type=int, default=1_000)
+    parser.add_argument("--ramp-step", type=int, default=0, help="0 = single run at --clients")
+    parser.add_argument("--max-clients", type=int, default=10_000)
+    parser.add_argument("--room-dist", choices=["fixed", "uniform", "zipf"], default="fixed")
+    parser.add_argument("--room-size", type=int, default=50, help="mean clients per room")
+    parser.add_argument("--rate", type=float, default=1_000, help="messages sent per second")
+    parser.add_argument("--msg-size", type=int, default=64, help="bytes per message")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per probe")
+    parser.add_argument("--grace", type=float, default=1.0, help="seconds to wait for stragglers")
+    parser.add_argument("--connect-timeout", type=float, default=10.0)
+    parser.add_argument("--slo-p99-ms", type=float, default=100.0)
+    parser.add_argument("--slo-delivery", type=float, default=0.99)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    if args.port is None:
+        args.port = SERVERS[args.server]["port"]
+    if args.ramp_step and args.ramp_step > args.max_clients:
+        parser.error("--ramp-step must not exceed --max-clients")
+
+    fd_limit = raise_fd_limit()
+    if max(args.clients, args.max_clients if args.ramp_step else 0) + 64 > fd_limit:
+        print(f"warning: open file limit is {fd_limit}", file=sys.stderr)
+
+    report = asyncio.run(main_async(args))
+    report["loadgen_peak_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
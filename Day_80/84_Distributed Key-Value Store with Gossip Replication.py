@@ -6,6 +6,17 @@ Run nodes:
     python distributed_kv.py --port 5002 --peers 5001 5003
     python distributed_kv.py --port 5003 --peers 5001 5002
 
+Partitioning:
+    Keys are placed on a consistent-hash ring (--vnodes virtual nodes per
+    node) and stored on N replicas (--replicas, default 3). Any node accepts
+    /put and /get: a node outside the key's preference list forwards the put
+    to one that is inside; reads ask all N replicas and return once R have
+    answered (--read-quorum), writes return once W have acked
+    (--write-quorum). A replica that is down gets its write parked on the
+    next healthy node on the ring as a hint, which is handed back when the
+    replica is reachable again. Start five nodes with --replicas 3 and each
+    one holds roughly 3/5 of the keys.
+
 Set:
     curl -X POST localhost:5001/put -d "key=a&value=10"
 
@@ -13,20 +24,88 @@ Get:
     curl "localhost:5003/get?key=a"
 
 Nodes will gossip and converge eventually.
+
+Gossip is incremental. Every round, for each peer, a node:
+    1. pushes the keys it changed since its last successful round with that
+       peer, together with its Merkle root  (POST /gossip/sync)
+    2. if the peer's root still differs, compares leaf digests and swaps
+       per-key digests for the differing buckets only  (POST /gossip/diff)
+    3. pushes whatever the peer asked for  (POST /gossip)
+So an idle cluster exchanges one small request per peer per round.
+Byte and key counters for the last round and in total are at GET /stats.
+
+Gossip runs on the server's event loop. Rounds start every --gossip-interval
+seconds (+/- --gossip-jitter) and talk to all peers concurrently over
+keep-alive connections. Bodies are msgpack when the msgpack package is
+installed, JSON otherwise. GET /stats also reports each peer's RTT and
+failure counts.
+
+Persistence (--storage log --data-dir DIR):
+    Writes are appended to DIR/wal.dat. Once the log outgrows the live data
+    (and --snapshot-mb), the live records are rewritten into DIR/snapshot.dat
+    and the log starts over. Only keys, file offsets and digests stay in
+    RAM; values are read from disk on demand. On start the node replays
+    snapshot + log headers, rebuilds its Merkle leaves, and then needs only
+    a delta sync with its peers. Startup and recovery figures are printed
+    and served under "storage" in GET /stats.
 """
 
+import os
+import json
+import zlib
+import struct
+import bisect
+import random
+import asyncio
 import argparse
 import threading
 import time
+import hashlib
+from functools import lru_cache
+from contextlib import asynccontextmanager
+from collections import OrderedDict, defaultdict
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import httpx
 import requests
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
+from starlette.concurrency import run_in_threadpool
 from uvicorn import run
 
+try:
+    import msgpack
+except ImportError:     # gossip falls back to JSON bodies
+    msgpack = None
+
 app = FastAPI()
 
-store = {}          # key -> { "value": ..., "vclock": {node: counter} }
+store = None        # key -> { "value": ..., "vclock": {node: counter} }, set up in start()
 peers = []          # peer ports
 node_id = None
+store_lock = threading.Lock()
+
+MERKLE_BUCKETS = 256
+leaves = [0] * MERKLE_BUCKETS   # XOR of entry digests per bucket
+peer_leaves = {}                # peer -> leaves over the keys both of us replicate
+entry_digests = {}              # key -> digest of (key, value, vclock)
+
+ring = None
+quorum = {"n": 3, "r": 2, "w": 2}
+hints = defaultdict(dict)       # intended replica -> {key: item} parked here
+replica_pool = ThreadPoolExecutor(max_workers=16)
+
+change_seq = 0
+change_log = OrderedDict()      # key -> seq of its last change, oldest first
+peer_synced = {}                # peer -> change_seq covered by the last sync
+
+gossip_config = {"interval": 2.0, "jitter": 0.2}
+transport = None
+
+gossip_stats = {
+    "rounds": 0,
+    "last_round": {},
+    "total": {"bytes_sent": 0, "bytes_received": 0, "keys_sent": 0, "keys_received": 0},
+}
 
 
 def merge_vclocks(vc1, vc2):
@@ -61,78 +140,797 @@ def vclock_compare(vc1, vc2):
     return 0
 
 
+# -------------------------
+# Merkle summary
+# -------------------------
+def _digest(data):
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "big")
+
+
+def bucket_of(key):
+    # not hash(): it is salted per process, buckets must agree across nodes
+    return _digest(key.encode()) % MERKLE_BUCKETS
+
+
+def entry_digest(key, item):
+    return _digest(json.dumps([key, item["value"], item["vclock"]], sort_keys=True).encode())
+
+
+def merkle_root(digests=None):
+    digests = leaves if digests is None else digests
+    return _digest(b"".join(leaf.to_bytes(8, "big") for leaf in digests))
+
+
+# -------------------------
+# Consistent-hash ring
+# -------------------------
+class HashRing:
+    def __init__(self, nodes, vnodes=64):
+        self.nodes = sorted(nodes)
+        points = sorted(
+            (_digest(f"{node}#{i}".encode()), node)
+            for node in self.nodes for i in range(vnodes)
+        )
+        self.hashes = [h for h, _ in points]
+        self.owners = [node for _, node in points]
+
+    def walk(self, key):
+        """Distinct nodes clockwise from the key's position."""
+        start = bisect.bisect(self.hashes, _digest(key.encode()))
+        seen = []
+        for i in range(len(self.owners)):
+            node = self.owners[(start + i) % len(self.owners)]
+            if node not in seen:
+                seen.append(node)
+                if len(seen) == len(self.nodes):
+                    break
+        return seen
+
+
+@lru_cache(maxsize=65536)
+def preference_list(key):
+    return tuple(ring.walk(key)[:quorum["n"]])
+
+
+def fallback_nodes(key):
+    return ring.walk(key)[quorum["n"]:]
+
+
+def shares(key, peer):
+    return peer in preference_list(key)
+
+
+def track_digest(key, old, new):
+    entry_digests[key] = new
+    b = bucket_of(key)
+    leaves[b] ^= old ^ new
+    for p in preference_list(key):
+        if p in peer_leaves:
+            peer_leaves[p][b] ^= old ^ new
+
+
+def store_set(key, item):
+    """Every write goes through here so the digests and change log stay current."""
+    global change_seq
+    new = entry_digest(key, item)
+    old = entry_digests.get(key, 0)
+    if new == old:
+        return
+    store.put(key, item, new)
+    track_digest(key, old, new)
+
+    change_seq += 1
+    change_log[key] = change_seq
+    change_log.move_to_end(key)
+
+
+def merge_item(key, item):
+    if key not in store:
+        store_set(key, item)
+        return
+
+    local = store[key]
+    cmp = vclock_compare(local["vclock"], item["vclock"])
+
+    if cmp == -1:
+        store_set(key, item)
+    elif cmp == 0:
+        store_set(key, resolve_concurrent(local, item))
+
+
+def resolve_concurrent(a, b):
+    # concurrent -> merge vector clocks; the larger value wins so every
+    # replica picks the same one regardless of merge order
+    merged_vc = merge_vclocks(a["vclock"], b["vclock"])
+    return {"value": max(a["value"], b["value"]), "vclock": merged_vc}
+
+
+def reconcile(items):
+    """Newest version among replica answers (None = replica has no copy)."""
+    best = None
+    for item in items:
+        if item is None:
+            continue
+        if best is None:
+            best = item
+            continue
+        cmp = vclock_compare(best["vclock"], item["vclock"])
+        if cmp == -1:
+            best = item
+        elif cmp == 0:
+            best = resolve_concurrent(best, item)
+    return best
+
+
+def changed_since(seq):
+    keys = []
+    for key in reversed(change_log):
+        if change_log[key] <= seq:
+            break
+        keys.append(key)
+    return keys
+
+
+def trim_change_log():
+    """Forget changes every peer has already been synced past."""
+    if not peers:
+        change_log.clear()
+        return
+    floor = min(peer_synced.get(p, 0) for p in peers)
+    while change_log:
+        key, seq = next(iter(change_log.items()))
+        if seq > floor:
+            break
+        change_log.popitem(last=False)
+
+
+def bucket_digests(buckets, peer):
+    wanted = set(buckets)
+    out = {b: {} for b in wanted}
+    for key, d in entry_digests.items():
+        b = bucket_of(key)
+        if b in wanted and shares(key, peer):
+            out[b][key] = d
+    return out
+
+
+# -------------------------
+# Persistence
+# -------------------------
+class MemoryStore(dict):
+    """Default storage: a dict, nothing survives a restart."""
+
+    kind = "memory"
+
+    def put(self, key, item, digest):
+        self[key] = item
+
+    def recover(self):
+        return iter(())
+
+    def needs_snapshot(self):
+        return False
+
+    def sync(self):
+        pass
+
+    def stats(self):
+        return {"kind": self.kind}
+
+
+RECORD = struct.Struct(">IIIQ")     # crc32, key length, item length, entry digest
+
+
+class LogStore(Mapping):
+    """
+    Append-only log + snapshot. The keydir maps key -> (file, offset, size)
+    of the newest record, so reads are one pread and values stay on disk.
+    """
+
+    kind = "log"
+    SNAPSHOT, WAL = 0, 1
+
+    def __init__(self, data_dir, snapshot_mb=64, fsync="batch"):
+        os.makedirs(data_dir, exist_ok=True)
+        self.paths = [os.path.join(data_dir, "snapshot.dat"), os.path.join(data_dir, "wal.dat")]
+        self.snapshot_bytes = snapshot_mb * 1024 * 1024
+        self.fsync = fsync
+        self.keydir = {}
+        self.live_bytes = 0
+        self.snapshots = 0
+        self.recovery = {}
+        self.files = [None, None]
+        self.dirty = False
+
+    # ---- Mapping ----
+    def __getitem__(self, key):
+        file_no, offset, size = self.keydir[key]
+        return json.loads(os.pread(self.files[file_no].fileno(), size, offset))
+
+    def __iter__(self):
+        return iter(self.keydir)
+
+    def __len__(self):
+        return len(self.keydir)
+
+    def __contains__(self, key):
+        return key in self.keydir
+
+    # ---- writes ----
+    def _encode(self, key, item, digest):
+        k = key.encode()
+        v = json.dumps(item, separators=(",", ":")).encode()
+        crc = zlib.crc32(v, zlib.crc32(k, digest))
+        return RECORD.pack(crc, len(k), len(v), digest) + k + v, len(v)
+
+    def put(self, key, item, digest):
+        record, size = self._encode(key, item, digest)
+        wal = self.files[self.WAL]
+        offset = wal.seek(0, os.SEEK_END)
+        wal.write(record)
+        wal.flush()
+        if self.fsync == "always":
+            os.fsync(wal.fileno())
+        else:
+            self.dirty = True
+
+        previous = self.keydir.get(key)
+        if previous:
+            self.live_bytes -= RECORD.size + len(key.encode()) + previous[2]
+        self.live_bytes += len(record)
+        self.keydir[key] = (self.WAL, offset + len(record) - size, size)
+
+    def sync(self):
+        if self.dirty and self.fsync != "never":
+            os.fsync(self.files[self.WAL].fileno())
+        self.dirty = False
+
+    # ---- recovery ----
+    def _scan(self, file_no):
+        """Yield (key, digest, value offset, size) per intact record; cut off a torn tail."""
+        f = self.files[file_no]
+        f.seek(0)
+        offset = 0
+        while True:
+            header = f.read(RECORD.size)
+            if len(header) < RECORD.size:
+                break
+            crc, klen, vlen, digest = RECORD.unpack(header)
+            k = f.read(klen)
+            v = f.read(vlen)
+            if len(v) < vlen or zlib.crc32(v, zlib.crc32(k, digest)) != crc:
+                break
+            yield k.decode(), digest, offset + RECORD.size + klen, vlen
+            offset += RECORD.size + klen + vlen
+        if offset < f.seek(0, os.SEEK_END):
+            print(f"storage: truncating torn tail of {self.paths[file_no]} at byte {offset}")
+            f.truncate(offset)
+
+    def recover(self):
+        """Open the files and yield (key, digest) for every live key."""
+        started = time.perf_counter()
+        records = 0
+        digests = {}
+        for file_no, path in enumerate(self.paths):
+            self.files[file_no] = open(path, "a+b")
+            for key, digest, offset, size in self._scan(file_no):
+                records += 1
+                previous = self.keydir.get(key)
+                if previous:
+                    self.live_bytes -= RECORD.size + len(key.encode()) + previous[2]
+                self.live_bytes += RECORD.size + len(key.encode()) + size
+                self.keydir[key] = (file_no, offset, size)
+                digests[key] = digest
+
+        elapsed = time.perf_counter() - started
+        scanned = sum(os.path.getsize(p) for p in self.paths)
+        self.recovery = {
+            "records": records,
+            "keys": len(self.keydir),
+            "bytes": scanned,
+            "seconds": round(elapsed, 4),
+            "records_per_s": round(records / elapsed) if elapsed else None,
+            "mb_per_s": round(scanned / elapsed / 1e6, 2) if elapsed else None,
+        }
+        return iter(digests.items())
+
+    # ---- snapshot ----
+    def needs_snapshot(self):
+        wal_bytes = self.files[self.WAL].seek(0, os.SEEK_END)
+        return wal_bytes > self.snapshot_bytes and wal_bytes > self.live_bytes
+
+    def snapshot(self, lock):
+        """
+        Rewrite live records into snapshot.dat and start a fresh log. `lock`
+        (store_lock) is held only to copy the keydir and to swap files; the
+        copy itself runs while writes keep appending to the old log.
+        """
+        with lock:
+            keydir = dict(self.keydir)
+            wal_start = self.files[self.WAL].seek(0, os.SEEK_END)
+
+        tmp_path = self.paths[self.SNAPSHOT] + ".tmp"
+        placed = {}
+        with open(tmp_path, "wb") as out:
+            for key, (file_no, offset, size) in keydir.items():
+                k = key.encode()
+                start = offset - RECORD.size - len(k)
+                record = os.pread(self.files[file_no].fileno(), RECORD.size + len(k) + size, start)
+                placed[key] = (self.SNAPSHOT, out.tell() + RECORD.size + len(k), size)
+                out.write(record)
+            out.flush()
+            os.fsync(out.fileno())
+
+        # records appended since the copy move to the head of a new log
+        wal_tmp = self.paths[self.WAL] + ".tmp"
+        wal_fd = self.files[self.WAL].fileno()
+        with open(wal_tmp, "wb") as tail:
+            copied = wal_start + self._copy_range(wal_fd, wal_start, tail)
+            tail.flush()
+            os.fsync(tail.fileno())
+
+            with lock:
+                if self._copy_range(wal_fd, copied, tail):
+                    tail.flush()
+                    os.fsync(tail.fileno())
+                # crash before the log is replaced just means it is replayed
+                # over a snapshot that already contains it, which is harmless
+                self.files[self.SNAPSHOT].close()
+                os.replace(tmp_path, self.paths[self.SNAPSHOT])
+                self.files[self.SNAPSHOT] = open(self.paths[self.SNAPSHOT], "a+b")
+                self.files[self.WAL].close()
+                os.replace(wal_tmp, self.paths[self.WAL])
+                self.files[self.WAL] = open(self.paths[self.WAL], "a+b")
+                self.dirty = False
+
+                for key, (file_no, offset, size) in self.keydir.items():
+                    if file_no == self.WAL and offset >= wal_start:
+                        placed[key] = (self.WAL, offset - wal_start, size)
+                self.keydir = placed
+        self.snapshots += 1
+
+    @staticmethod
+    def _copy_range(fd, start, out, block=1 << 20):
+        """Copy fd from `start` to its current end into `out`; returns bytes copied."""
+        copied = 0
+        while True:
+            data = os.pread(fd, block, start + copied)
+            if not data:
+                return copied
+            out.write(data)
+            copied += len(data)
+
+    def stats(self):
+        return {
+            "kind": self.kind,
+            "snapshot_bytes": os.path.getsize(self.paths[self.SNAPSHOT]),
+            "wal_bytes": os.path.getsize(self.paths[self.WAL]),
+            "live_bytes": self.live_bytes,
+            "snapshots": self.snapshots,
+            "fsync": self.fsync,
+            "recovery": self.recovery,
+        }
+
+
+storage_stats = {}
+
+
+def open_storage(kind, data_dir, snapshot_mb, fsync):
+    global store
+    store = LogStore(data_dir, snapshot_mb, fsync) if kind == "log" else MemoryStore()
+    for key, digest in store.recover():
+        track_digest(key, 0, digest)
+
+
+async def maintain_storage():
+    if not store.needs_snapshot():
+        await asyncio.to_thread(store.sync)
+        return
+
+    started = time.perf_counter()
+    await asyncio.to_thread(store.snapshot, store_lock)
+    storage_stats["last_snapshot_ms"] = round((time.perf_counter() - started) * 1000, 2)
+
+
+# -------------------------
+# Replica coordination
+# -------------------------
+def me():
+    return int(node_id)
+
+
+def send_replica(peer, items, hint=None):
+    resp = requests.post(f"http://localhost:{peer}/replica/put",
+                         json={"items": items, "hint": hint}, timeout=1)
+    resp.raise_for_status()
+
+
+def write_replica(peer, key, item):
+    """Write to one replica, or park a hint on the next healthy node. Returns how it landed."""
+    try:
+        send_replica(peer, {key: item})
+        return "ok"
+    except Exception:
+        pass
+    for fallback in fallback_nodes(key):
+        try:
+            if fallback == me():
+                with store_lock:
+                    hints[peer][key] = item
+            else:
+                send_replica(fallback, {key: item}, hint=peer)
+            return "hinted"
+        except Exception:
+            continue
+    return "failed"
+
+
+def read_replica(peer, key):
+    if peer == me():
+        with store_lock:
+            return store.get(key)
+    resp = requests.get(f"http://localhost:{peer}/replica/get", params={"key": key}, timeout=1)
+    resp.raise_for_status()
+    return resp.json()["item"]
+
+
+def coordinate_put(key, value):
+    pref = preference_list(key)
+    if me() not in pref:
+        for peer in pref:
+            try:
+                resp = requests.post(f"http://localhost:{peer}/put",
+                                     data={"key": key, "value": value}, timeout=2)
+                return {**resp.json(), "forwarded_by": node_id}
+            except Exception:
+                continue
+        return {"status": "FAILED", "error": "no replica reachable", "node": node_id}
+
+    with store_lock:
+        existing = store.get(key)
+        new_vc = {node_id: (existing["vclock"].get(node_id, 0) + 1) if existing else 1}
+
+        if existing:
+            merged_vc = merge_vclocks(existing["vclock"], new_vc)
+        else:
+            merged_vc = new_vc
+
+        item = {
+            "value": value,
+            "vclock": merged_vc
+        }
+        store_set(key, item)
+
+    acks, hinted = 1, 0
+    futures = [replica_pool.submit(write_replica, p, key, item) for p in pref if p != me()]
+    for f in as_completed(futures):
+        if acks >= quorum["w"]:
+            break                       # stragglers finish in the background
+        outcome = f.result()
+        if outcome != "failed":
+            acks += 1
+            hinted += outcome == "hinted"
+
+    if acks < quorum["w"]:
+        return {"status": "FAILED", "error": "write quorum not met", "acks": acks, "node": node_id}
+    return {"status": "OK", "node": node_id, "acks": acks, "hinted": hinted}
+
+
+def coordinate_get(key):
+    pref = preference_list(key)
+    futures = {replica_pool.submit(read_replica, p, key): p for p in pref}
+    answers = {}
+    for f in as_completed(futures):
+        try:
+            answers[futures[f]] = f.result()
+        except Exception:
+            continue
+        if len(answers) >= quorum["r"]:
+            break
+
+    if len(answers) < quorum["r"]:
+        return {"value": None, "vclock": {}, "error": "read quorum not met"}
+
+    best = reconcile(answers.values())
+    if best is None:
+        return {"value": None, "vclock": {}}
+
+    # read repair: bring stale responders up to date
+    for peer, item in answers.items():
+        if item != best:
+            if peer == me():
+                with store_lock:
+                    merge_item(key, best)
+            else:
+                replica_pool.submit(write_replica, peer, key, best)
+    return best
+
+
+async def deliver_hints(counters):
+    async def deliver(peer, items):
+        try:
+            await transport.post(peer, "/replica/put", {"items": items, "hint": None}, counters)
+        except Exception:
+            return
+        with store_lock:
+            for key, item in items.items():
+                if hints[peer].get(key) is item:
+                    del hints[peer][key]
+
+    with store_lock:
+        pending = {peer: dict(h) for peer, h in hints.items() if h}
+    await asyncio.gather(*(deliver(p, items) for p, items in pending.items()))
+
+
+# -------------------------
+# Wire encoding
+# -------------------------
+MSGPACK = "application/msgpack"
+
+
+def encode(payload):
+    if msgpack is not None:
+        return msgpack.packb(payload), MSGPACK
+    return json.dumps(payload, separators=(",", ":")).encode(), "application/json"
+
+
+def decode(data, content_type):
+    if content_type.startswith(MSGPACK):
+        return msgpack.unpackb(data, strict_map_key=False)
+    return json.loads(data)
+
+
+async def read_body(request):
+    return decode(await request.body(), request.headers.get("content-type", ""))
+
+
+def reply(request, payload):
+    """Answer in the encoding the caller used."""
+    if request.headers.get("content-type", "").startswith(MSGPACK):
+        return Response(msgpack.packb(payload), media_type=MSGPACK)
+    return payload
+
+
 @app.post("/put")
 async def put(request: Request):
-    global store
     form = await request.form()
     key = form["key"]
     value = form["value"]
-
-    existing = store.get(key)
-    new_vc = {node_id: (existing["vclock"].get(node_id, 0) + 1) if existing else 1}
-
-    if existing:
-        merged_vc = merge_vclocks(existing["vclock"], new_vc)
-    else:
-        merged_vc = new_vc
-
-    store[key] = {
-        "value": value,
-        "vclock": merged_vc
-    }
-    return {"status": "OK", "node": node_id}
+    return await run_in_threadpool(coordinate_put, key, value)
 
 
 @app.get("/get")
 async def get(key: str):
-    item = store.get(key)
-    if not item:
-        return {"value": None, "vclock": {}}
-    return item
+    return await run_in_threadpool(coordinate_get, key)
 
 
-@app.post("/gossip")
-async def gossip(incoming: dict):
-    global store
-    for key, item in incoming.items():
-        if key not in store:
-            store[key] = item
-            continue
+@app.post("/replica/put")
+async def replica_put(request: Request):
+    body = await read_body(request)
+    with store_lock:
+        if body.get("hint") is not None:
+            parked = hints[int(body["hint"])]
+            for key, item in body["items"].items():
+                parked[key] = reconcile([parked.get(key), item])
+        else:
+            for key, item in body["items"].items():
+                merge_item(key, item)
+    return reply(request, {"status": "OK"})
 
-        local = store[key]
-        cmp = vclock_compare(local["vclock"], item["vclock"])
 
-        if cmp == -1:
-            store[key] = item
-        elif cmp == 0:
-            # concurrent -> keep both? For now we merge vector clocks, pick incoming value
-            merged_vc = merge_vclocks(local["vclock"], item["vclock"])
-            store[key] = {"value": item["value"], "vclock": merged_vc}
+@app.get("/replica/get")
+async def replica_get(key: str):
+    with store_lock:
+        return {"item": store.get(key)}
 
-    return {"status": "merged"}
 
+@app.post("/gossip")
+async def gossip(request: Request):
+    incoming = await read_body(request)
+    with store_lock:
+        for key, item in incoming.items():
+            merge_item(key, item)
+
+    return reply(request, {"status": "merged"})
+
+
+@app.post("/gossip/sync")
+async def gossip_sync(request: Request):
+    body = await read_body(request)
+    with store_lock:
+        for key, item in body["items"].items():
+            merge_item(key, item)
+        sender = int(body["node"])
+        shared = peer_leaves[sender]
+        if merkle_root(shared) == body["root"]:
+            # identical shared ranges: nothing we hold needs pushing back
+            peer_synced[sender] = change_seq
+            return reply(request, {"in_sync": True})
+        return reply(request, {"in_sync": False, "leaves": shared})
+
+
+@app.post("/gossip/diff")
+async def gossip_diff(request: Request):
+    """Given the caller's key digests for some buckets, return what it lacks and what we lack."""
+    body = await read_body(request)
+    send, want = {}, []
+    with store_lock:
+        theirs_by_bucket = {int(b): keys for b, keys in body["buckets"].items()}
+        ours_by_bucket = bucket_digests(theirs_by_bucket, int(body["node"]))
+        for b, theirs in theirs_by_bucket.items():
+            ours = ours_by_bucket[b]
+            for key, d in ours.items():
+                if theirs.get(key) != d:
+                    send[key] = store[key]
+            want.extend(key for key, d in theirs.items() if ours.get(key) != d)
+    return reply(request, {"items": send, "want": want})
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "node": node_id,
+        "keys": len(store),
+        "root": merkle_root(),
+        "ring": {"nodes": ring.nodes, **quorum},
+        "hints": {p: len(h) for p, h in hints.items() if h},
+        "storage": {**store.stats(), **storage_stats},
+        "change_log": len(change_log),
+        "encoding": "msgpack" if msgpack is not None else "json",
+        **gossip_stats,
+        "peers": transport.peer_stats if transport else {},
+    }
 
-def gossip_loop():
-    while True:
-        time.sleep(2)
-        for p in peers:
-            try:
-                requests.post(f"http://localhost:{p}/gossip", json=store, timeout=1)
-            except:
-                pass
 
+# -------------------------
+# Gossip transport
+# -------------------------
+class PeerTransport:
+    """One keep-alive HTTP client for all peers, with per-peer RTT and failure stats."""
+
+    def __init__(self, peer_ports, timeout=1.0):
+        self.client = httpx.AsyncClient(
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=4 * max(1, len(peer_ports)),
+                                max_keepalive_connections=2 * max(1, len(peer_ports))),
+        )
+        self.peer_stats = {
+            p: {"requests": 0, "failures": 0, "consecutive_failures": 0,
+                "rtt_ms_last": None, "rtt_ms_avg": None, "last_error": None}
+            for p in peer_ports
+        }
+
+    async def post(self, peer, path, payload, counters):
+        body, content_type = encode(payload)
+        stats = self.peer_stats[peer]
+        stats["requests"] += 1
+        started = time.perf_counter()
+        try:
+            resp = await self.client.post(f"http://localhost:{peer}{path}", content=body,
+                                          headers={"Content-Type": content_type})
+            resp.raise_for_status()
+        except Exception as e:
+            stats["failures"] += 1
+            stats["consecutive_failures"] += 1
+            stats["last_error"] = f"{type(e).__name__}: {e}"[:200]
+            raise
+
+        rtt = (time.perf_counter() - started) * 1000
+        stats["consecutive_failures"] = 0
+        stats["rtt_ms_last"] = round(rtt, 3)
+        avg = stats["rtt_ms_avg"]
+        stats["rtt_ms_avg"] = round(rtt if avg is None else 0.8 * avg + 0.2 * rtt, 3)
+
+        counters["requests"] += 1
+        counters["bytes_sent"] += len(body)
+        counters["bytes_received"] += len(resp.content)
+        return decode(resp.content, resp.headers.get("content-type", ""))
+
+
+MAX_DELTA_KEYS = 2000      # bigger backlogs (e.g. after a restart) go through the diff
+MAX_DIFF_BUCKETS = 32      # buckets reconciled per peer per round, keeps requests small
+
+
+async def sync_with(peer, counters):
+    with store_lock:
+        seq = change_seq
+        changed = [k for k in changed_since(peer_synced.get(peer, 0)) if shares(k, peer)]
+        backlog = len(changed) > MAX_DELTA_KEYS
+        delta = {} if backlog else {k: store[k] for k in changed}
+        shared = list(peer_leaves[peer])
+        root = merkle_root(shared)
+
+    answer = await transport.post(peer, "/gossip/sync",
+                                  {"node": node_id, "items": delta, "root": root}, counters)
+    counters["keys_sent"] += len(delta)
+    if answer["in_sync"]:
+        peer_synced[peer] = seq
+        counters["peers_in_sync"] += 1
+        return
+
+    with store_lock:
+        differing = [b for b, (a, c) in enumerate(zip(peer_leaves[peer], answer["leaves"])) if a != c]
+        partial = len(differing) > MAX_DIFF_BUCKETS
+        ours = bucket_digests(differing[:MAX_DIFF_BUCKETS], peer)
+    answer = await transport.post(peer, "/gossip/diff", {"node": node_id, "buckets": ours}, counters)
+
+    with store_lock:
+        for key, item in answer["items"].items():
+            merge_item(key, item)
+        wanted = {k: store[k] for k in answer["want"] if k in store}
+        # keys just merged came from this peer, so don't echo them back;
+        # anything else missed here shows up in the next root comparison
+        seq = change_seq
+    counters["keys_received"] += len(answer["items"])
+
+    if wanted:
+        await transport.post(peer, "/gossip", wanted, counters)
+        counters["keys_sent"] += len(wanted)
+    if not (backlog or partial):
+        peer_synced[peer] = seq
+
+
+async def gossip_loop():
+    async def sync_one(peer, counters):
+        try:
+            await sync_with(peer, counters)
+        except Exception:
+            counters["peers_failed"] += 1
 
-def start_gossip():
-    t = threading.Thread(target=gossip_loop, daemon=True)
-    t.start()
+    while True:
+        # jitter keeps nodes started together from gossiping in lockstep
+        jitter = gossip_config["jitter"]
+        await asyncio.sleep(gossip_config["interval"] * random.uniform(1 - jitter, 1 + jitter))
+        counters = dict.fromkeys(
+            ("requests", "bytes_sent", "bytes_received", "keys_sent",
+             "keys_received", "peers_in_sync", "peers_failed"), 0)
+        started = time.perf_counter()
+        await deliver_hints(counters)
+        await asyncio.gather(*(sync_one(p, counters) for p in peers))
+
+        with store_lock:
+            trim_change_log()
+        await maintain_storage()
+
+        counters["duration_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        gossip_stats["rounds"] += 1
+        gossip_stats["last_round"] = counters
+        for k in gossip_stats["total"]:
+            gossip_stats["total"][k] += counters[k]
+
+
+@asynccontextmanager
+async def gossip_lifespan(_app):
+    global transport
+    transport = PeerTransport(peers)
+    task = asyncio.create_task(gossip_loop())
+    storage_stats["startup_seconds"] = round(time.perf_counter() - storage_stats.pop("_t0"), 4)
+    print(f"node {node_id} ready in {storage_stats['startup_seconds']}s, "
+          f"storage: {json.dumps(store.stats())}", flush=True)
+    yield
+    task.cancel()
+    await transport.client.aclose()
+    store.sync()
+
+
+app.router.lifespan_context = gossip_lifespan
 
 
 # Run server
-def start(port, peer_ports):
-    global node_id, peers
+def start(port, peer_ports, replicas=3, read_quorum=2, write_quorum=2, vnodes=64,
+          gossip_interval=2.0, gossip_jitter=0.2,
+          storage="memory", data_dir=None, snapshot_mb=64, fsync="batch"):
+    global node_id, peers, ring
+    storage_stats["_t0"] = time.perf_counter()
     node_id = str(port)
     peers = peer_ports
-    start_gossip()
+    ring = HashRing([port] + list(peer_ports), vnodes)
+    n = min(replicas, len(ring.nodes))
+    quorum.update(n=n, r=min(read_quorum, n), w=min(write_quorum, n))
+    for p in peers:
+        peer_leaves[p] = [0] * MERKLE_BUCKETS
+    gossip_config.update(interval=gossip_interval, jitter=gossip_jitter)
+    open_storage(storage, data_dir, snapshot_mb, fsync)
     run(app, host="127.0.0.1", port=port)
 
 
@@ -140,6 +938,23 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--port", type=int, required=True)
     parser.add_argument("--peers", nargs="*", type=int, default=[])
+    parser.add_argument("--replicas", type=int, default=3, help="N: copies of each key")
+    parser.add_argument("--read-quorum", type=int, default=2, help="R: replies needed for /get")
+    parser.add_argument("--write-quorum", type=int, default=2, help="W: acks needed for /put")
+    parser.add_argument("--vnodes", type=int, default=64, help="virtual nodes per node on the ring")
+    parser.add_argument("--gossip-interval", type=float, default=2.0, help="seconds between rounds")
+    parser.add_argument("--gossip-jitter", type=float, default=0.2, help="+/- fraction of the interval")
+    parser.add_argument("--storage", choices=["memory", "log"], default="memory")
+    parser.add_argument("--data-dir", help="directory for --storage log")
+    parser.add_argument("--snapshot-mb", type=int, default=64,
+                        help="snapshot once the log is bigger than this and than the live data")
+    parser.add_argument("--fsync", choices=["always", "batch", "never"], default="batch",
+                        help="batch = fsync once per gossip round")
     args = parser.parse_args()
 
-    start(args.port, args.peers)
+    if args.storage == "log" and not args.data_dir:
+        parser.error("--storage log needs --data-dir")
+
+    start(args.port, args.peers, args.replicas, args.read_quorum, args.write_quorum, args.vnodes,
+          args.gossip_interval, args.gossip_jitter,
+          args.storage, args.data_dir, args.snapshot_mb, args.fsync)
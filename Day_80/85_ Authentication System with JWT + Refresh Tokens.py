@@ -10,11 +10,34 @@ Routes:
     POST /refresh
     POST /logout
     GET  /protected
+    GET  /stats
+
+bcrypt runs on a bounded thread pool (HASH_WORKERS threads, at most
+HASH_MAX_QUEUE calls waiting) so it never blocks the event loop; when the
+queue is full /register and /login answer 503. Verified access tokens are
+cached by token hash until their exp, so hot tokens skip the HMAC and JSON
+decoding.
+
+Revoked refresh-token ids live in a RevocationStore: sets bucketed by the
+token's exp, dropped whole once the bucket is past, with a bloom filter in
+front so the usual "not revoked" answer never touches the sets. Each user
+keeps at most MAX_REFRESH_PER_USER live refresh tokens; logging in past
+that revokes the oldest.
+
+Benchmark:
+    python "85_ Authentication System with JWT + Refresh Tokens.py" --bench
 """
 
 from fastapi import FastAPI, HTTPException, Depends, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import os
+import time
+import asyncio
+import math
+import hashlib
 import bcrypt
 import jwt
 import uuid
@@ -24,11 +47,17 @@ REFRESH_SECRET = "refreshsecret"
 ACCESS_TTL = 30        # seconds
 REFRESH_TTL = 300      # seconds
 
+HASH_WORKERS = os.cpu_count() or 2
+HASH_MAX_QUEUE = 64
+TOKEN_CACHE_SIZE = 10_000
+MAX_REFRESH_PER_USER = 10
+REVOCATION_BUCKETS = 10          # exp buckets spanning REFRESH_TTL
+BLOOM_FP_RATE = 0.01
+
 app = FastAPI()
 auth_scheme = HTTPBearer()
 
-users = {}             # username -> {password_hash, refresh_tokens:set}
-revoked_refresh_tokens = set()
+users = {}             # username -> {password_hash, refresh_tokens: {jti: exp}}
 
 
 def hash_pw(pw: str):
@@ -39,6 +68,218 @@ def check_pw(pw: str, hashed: str):
     return bcrypt.checkpw(pw.encode(), hashed.encode())
 
 
+class PasswordHasher:
+    """
+    Runs bcrypt on a small thread pool (bcrypt releases the GIL). Calls past
+    workers + max_queue are rejected with 503 instead of piling up.
+    workers=0 runs inline on the event loop, which is the old behaviour.
+    """
+
+    def __init__(self, workers=HASH_WORKERS, max_queue=HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.pool = ThreadPoolExecutor(workers, thread_name_prefix="bcrypt") if workers else None
+        self.pending = 0
+        self.peak_queue = 0
+        self.completed = 0
+        self.rejected = 0
+        self.busy_seconds = 0.0
+
+    async def run(self, fn, *args):
+        if self.pool is None:
+            return self._timed(fn, *args)
+
+        if self.pending >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise HTTPException(503, "Password hashing busy, retry later",
+                                headers={"Retry-After": "1"})
+        self.pending += 1
+        self.peak_queue = max(self.peak_queue, self.queue_depth())
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.pool, self._timed, fn, *args)
+        finally:
+            self.pending -= 1
+
+    def _timed(self, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self.busy_seconds += time.perf_counter() - started
+            self.completed += 1
+
+    def queue_depth(self):
+        return max(0, self.pending - self.workers)
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "in_flight": min(self.pending, self.workers),
+            "queue_depth": self.queue_depth(),
+            "peak_queue_depth": self.peak_queue,
+            "max_queue": self.max_queue,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_ms": round(self.busy_seconds / self.completed * 1000, 2) if self.completed else None,
+        }
+
+
+class VerifiedTokenCache:
+    """LRU of token hash -> (exp, payload); an entry is dropped once exp passes."""
+
+    def __init__(self, max_entries=TOKEN_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(token):
+        return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+    def get(self, token):
+        key = self.key(token)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        exp, payload = entry
+        if time.time() >= exp:
+            del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return payload
+
+    def put(self, token, payload):
+        if self.max_entries <= 0:
+            return
+        self.entries[self.key(token)] = (payload["exp"], payload)
+        if len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings; k bit positions by double hashing."""
+
+    def __init__(self, capacity, fp_rate=BLOOM_FP_RATE):
+        capacity = max(capacity, 1024)
+        self.capacity = capacity
+        self.bits = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self.array[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item):
+        return all(self.array[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RevocationStore:
+    """
+    Revoked jtis grouped into buckets by exp. A revoked token only matters
+    until it would have expired anyway, so whole buckets are dropped once
+    their end is in the past and memory tracks the live window, not history.
+    The bloom filter is rebuilt from the surviving buckets after each drop.
+    """
+
+    def __init__(self, ttl=REFRESH_TTL, buckets=REVOCATION_BUCKETS, clock=time.time):
+        self.width = max(1, math.ceil(ttl / buckets))
+        self.clock = clock
+        self.buckets = {}          # exp // width -> set of jti
+        self.size = 0
+        self.bloom = BloomFilter(1024)
+        self.checks = 0
+        self.bloom_negatives = 0
+        self.false_positives = 0
+        self.expired = 0
+        self.rebuilds = 0
+
+    def add(self, jti, exp):
+        self.expire()
+        bucket = int(exp) // self.width
+        if bucket < int(self.clock()) // self.width:
+            return                 # already expired; the JWT check rejects it
+        entries = self.buckets.setdefault(bucket, set())
+        if jti in entries:
+            return
+        entries.add(jti)
+        self.size += 1
+        if self.size > self.bloom.capacity:
+            self._rebuild()
+        else:
+            self.bloom.add(jti)
+
+    def __contains__(self, jti):
+        self.checks += 1
+        if jti not in self.bloom:
+            self.bloom_negatives += 1
+            return False
+        found = any(jti in entries for entries in self.buckets.values())
+        if not found:
+            self.false_positives += 1
+        return found
+
+    def expire(self):
+        current = int(self.clock()) // self.width
+        stale = [b for b in self.buckets if b < current]
+        if not stale:
+            return
+        for bucket in stale:
+            dropped = self.buckets.pop(bucket)
+            self.size -= len(dropped)
+            self.expired += len(dropped)
+        self._rebuild()
+
+    def _rebuild(self):
+        # sized at twice the live set so steady churn doesn't rebuild on every add
+        self.bloom = BloomFilter(self.size * 2)
+        for entries in self.buckets.values():
+            for jti in entries:
+                self.bloom.add(jti)
+        self.rebuilds += 1
+
+    def stats(self):
+        self.expire()
+        return {
+            "entries": self.size,
+            "buckets": len(self.buckets),
+            "bucket_seconds": self.width,
+            "bloom_bytes": len(self.bloom.array),
+            "bloom_hashes": self.bloom.hashes,
+            "checks": self.checks,
+            "bloom_negatives": self.bloom_negatives,
+            "false_positives": self.false_positives,
+            "expired": self.expired,
+            "rebuilds": self.rebuilds,
+        }
+
+
+hasher = PasswordHasher()
+token_cache = VerifiedTokenCache()
+revoked_refresh_tokens = RevocationStore()
+
+
 def make_access_token(username):
     payload = {
         "sub": username,
@@ -52,17 +293,34 @@ def make_refresh_token(username):
     payload = {
         "sub": username,
         "jti": token_id,
-        "exp": datetime.utcnow() + timedelta(seconds=REFRESH_TTL)
+        "exp": datetime.now(timezone.utc) + timedelta(seconds=REFRESH_TTL)
     }
     token = jwt.encode(payload, REFRESH_SECRET, algorithm="HS256")
-    return token, token_id
+    return token, token_id, payload["exp"].timestamp()
 
 
 def verify_access_token(token: str):
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
-        return jwt.decode(token, SECRET, algorithms=["HS256"])
+        payload = jwt.decode(token, SECRET, algorithms=["HS256"])
     except Exception:
         raise HTTPException(status_code=401, detail="Invalid or expired access token")
+    token_cache.put(token, payload)
+    return payload
+
+
+def remember_refresh_token(username, token_id, exp):
+    """Track a user's live refresh token, revoking the oldest past the cap."""
+    live = users[username]["refresh_tokens"]
+    now = time.time()
+    for jti in [jti for jti, jti_exp in live.items() if jti_exp <= now]:
+        del live[jti]
+    live[token_id] = exp
+    while len(live) > MAX_REFRESH_PER_USER:
+        oldest = next(iter(live))
+        revoked_refresh_tokens.add(oldest, live.pop(oldest))
 
 
 def verify_refresh_token(token: str):
@@ -81,8 +339,10 @@ async def register(request: Request):
     if username in users:
         raise HTTPException(400, "User exists")
 
-    pw_hash = hash_pw(password)
-    users[username] = {"password": pw_hash, "refresh_tokens": set()}
+    pw_hash = await hasher.run(hash_pw, password)
+    if username in users:          # registered by someone else while we were hashing
+        raise HTTPException(400, "User exists")
+    users[username] = {"password": pw_hash, "refresh_tokens": {}}
     return {"status": "registered", "user": username}
 
 
@@ -95,12 +355,12 @@ async def login(request: Request):
     if username not in users:
         raise HTTPException(400, "Unknown user")
 
-    if not check_pw(password, users[username]["password"]):
+    if not await hasher.run(check_pw, password, users[username]["password"]):
         raise HTTPException(400, "Wrong password")
 
     access_token = make_access_token(username)
-    refresh_token, token_id = make_refresh_token(username)
-    users[username]["refresh_tokens"].add(token_id)
+    refresh_token, token_id, exp = make_refresh_token(username)
+    remember_refresh_token(username, token_id, exp)
 
     return {"access": access_token, "refresh": refresh_token}
 
@@ -121,11 +381,11 @@ async def refresh(request: Request):
         raise HTTPException(401, "Refresh token not recognized")
 
     # rotate token
-    users[username]["refresh_tokens"].remove(jti)
-    revoked_refresh_tokens.add(jti)
+    del users[username]["refresh_tokens"][jti]
+    revoked_refresh_tokens.add(jti, payload["exp"])
 
-    new_refresh, new_jti = make_refresh_token(username)
-    users[username]["refresh_tokens"].add(new_jti)
+    new_refresh, new_jti, new_exp = make_refresh_token(username)
+    remember_refresh_token(username, new_jti, new_exp)
 
     new_access = make_access_token(username)
 
@@ -144,8 +404,8 @@ async def logout(request: Request):
     if jti in revoked_refresh_tokens:
         return {"status": "already revoked"}
 
-    revoked_refresh_tokens.add(jti)
-    users[username]["refresh_tokens"].discard(jti)
+    revoked_refresh_tokens.add(jti, payload["exp"])
+    users[username]["refresh_tokens"].pop(jti, None)
     return {"status": "logged out"}
 
 
@@ -154,3 +414,162 @@ async def protected(creds: HTTPAuthorizationCredentials = Depends(auth_scheme)):
     token = creds.credentials
     payload = verify_access_token(token)
     return {"message": "You accessed protected data", "user": payload["sub"]}
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "password_hashing": hasher.stats(),
+        "token_cache": token_cache.stats(),
+        "revocations": revoked_refresh_tokens.stats(),
+    }
+
+
+# -------------------------
+# Benchmark
+# -------------------------
+async def _drive(client, concurrency, seconds, request):
+    """Run `request` from `concurrency` tasks for `seconds`; return throughput and latency."""
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                resp = await request(client)
+                ok = resp.status_code == 200
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+
+    def pick(q):
+        if not latencies:
+            return None
+        return round(latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000, 2)
+
+    return {
+        "requests_per_s": round(len(latencies) / elapsed, 1),
+        "ok": len(latencies),
+        "errors": errors,
+        "p50_ms": pick(0.50),
+        "p99_ms": pick(0.99),
+    }
+
+
+async def _scenario(port, hash_workers, cache_size, concurrency, seconds, mixed):
+    """Start a fresh server process, then load it from this one."""
+    import sys
+    import subprocess
+    import httpx
+
+    proc = subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--port", str(port),
+         "--hash-workers", str(hash_workers), "--token-cache", str(cache_size)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        limits = httpx.Limits(max_connections=concurrency * 2)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}",
+                                     limits=limits, timeout=60) as client:
+            for _ in range(100):
+                try:
+                    await client.post("/register", json={"username": "bench", "password": "pw"})
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+            access = (await client.post("/login", json={"username": "bench", "password": "pw"})).json()["access"]
+            headers = {"Authorization": f"Bearer {access}"}
+
+            def login(c):
+                return c.post("/login", json={"username": "bench", "password": "pw"})
+
+            def protected(c):
+                return c.get("/protected", headers=headers)
+
+            if mixed:
+                # logins and /protected at once: inline bcrypt makes the
+                # cheap requests wait behind every hash
+                login_run, protected_run = await asyncio.gather(
+                    _drive(client, concurrency // 2, seconds, login),
+                    _drive(client, concurrency // 2, seconds, protected),
+                )
+                result = {"login": login_run, "protected": protected_run}
+            else:
+                result = {"protected": await _drive(client, concurrency, seconds, protected)}
+            result["server"] = (await client.get("/stats")).json()
+            return result
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def revocation_churn(rotations=300_000, step=0.005):
+    """Replay refresh rotations on a simulated clock; memory should plateau."""
+    now = [0.0]
+    store = RevocationStore(clock=lambda: now[0])
+    samples = []
+    started = time.perf_counter()
+    for i in range(rotations):
+        now[0] += step
+        store.add(uuid.uuid4().hex, now[0] + REFRESH_TTL)
+        # the hot path: a fresh token that was never revoked
+        uuid.uuid4().hex in store
+        if (i + 1) % (rotations // 6) == 0:
+            samples.append({"simulated_s": round(now[0]), "entries": store.size,
+                            "bloom_bytes": len(store.bloom.array)})
+    elapsed = time.perf_counter() - started
+    stats = store.stats()
+    return {
+        "rotations": rotations,
+        "ops_per_s": round(2 * rotations / elapsed),
+        "samples": samples,
+        "bloom_negative_ratio": round(stats["bloom_negatives"] / stats["checks"], 4),
+        "false_positives": stats["false_positives"],
+        "rebuilds": stats["rebuilds"],
+    }
+
+
+async def benchmark(port=8765, concurrency=32, seconds=5.0):
+    return {
+        "revocation_churn": revocation_churn(),
+        "mixed_inline_bcrypt": await _scenario(port, 0, TOKEN_CACHE_SIZE, concurrency, seconds, True),
+        "mixed_pooled_bcrypt": await _scenario(port, HASH_WORKERS, TOKEN_CACHE_SIZE, concurrency, seconds, True),
+        "protected_uncached": await _scenario(port, HASH_WORKERS, 0, concurrency, seconds, False),
+        "protected_cached": await _scenario(port, HASH_WORKERS, TOKEN_CACHE_SIZE, concurrency, seconds, False),
+    }
+
+
+if __name__ == "__main__":
+    import json
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="JWT auth service")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--hash-workers", type=int, default=HASH_WORKERS,
+                        help="bcrypt threads, 0 = hash on the event loop")
+    parser.add_argument("--hash-queue", type=int, default=HASH_MAX_QUEUE)
+    parser.add_argument("--token-cache", type=int, default=TOKEN_CACHE_SIZE,
+                        help="verified access tokens to cache, 0 = off")
+    parser.add_argument("--bench", action="store_true", help="run the throughput benchmark and exit")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if args.bench:
+        print(json.dumps(asyncio.run(benchmark(args.port, args.concurrency, args.seconds)), indent=2))
+    else:
+        hasher = PasswordHasher(args.hash_workers, args.hash_queue)
+        token_cache = VerifiedTokenCache(args.token_cache)
+        uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
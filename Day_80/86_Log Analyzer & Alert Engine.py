@@ -3,39 +3,494 @@ Project 86 — Log Analyzer & Alert Engine
 
 Run:
     python log_analyzer.py server.log
+    python log_analyzer.py big.log --stream --workers 4 --chunk-mb 32
+    python log_analyzer.py /var/log/app.log --follow --poll 0.2
 
 Features:
 - Counts INFO / WARN / ERROR logs
 - Finds error spikes in time windows
-- Detects repeated error messages
+- Groups error messages into templates and tracks the most frequent ones
 - Prints a summary report
+
+Streaming mode splits the file into line-aligned byte ranges and parses them
+in a process pool, a few chunks in flight at a time. Workers return counters
+(errors per second, not per line) and the parent feeds them in file order
+through a SpikeWindow that holds one window of points, so memory depends on
+the chunk size, not the file size. Overlapping spikes are collapsed into one
+entry with their peak count.
+
+Follow mode tails a live file (surviving rename-style rotation and
+truncation), keeps per-level counts for the last window in a ring of
+one-second slots, and prints an alert as soon as the error count in that
+window crosses the threshold. Alert delay is at most one poll interval plus
+the time to parse one read (bounded by MAX_READ_BYTES). Every
+--stats-interval it prints lines/s and how many bytes it is behind the
+writer; Ctrl-C prints the usual report.
+
+Error messages are masked (UUIDs, paths, hex, numbers) and clustered into
+templates Drain-style: messages with the same token count and first token
+share a group, and join the most similar template in it, turning differing
+tokens into <*>. Template counts live in a Space-Saving sketch of
+TOP_TEMPLATES entries, so memory stays fixed however many distinct messages
+the log has.
 """
 
-import sys
-from collections import defaultdict, Counter
+import os
+import re
+import time
+import argparse
+from calendar import timegm
+from functools import lru_cache
+from collections import defaultdict, Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 
 
 TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
 ERROR_SPIKE_THRESHOLD = 3        # errors
 ERROR_WINDOW_SECONDS = 60        # time window
+CHUNK_BYTES = 32 * 1024 * 1024   # streaming mode byte range per task
+MAX_READ_BYTES = 4 * 1024 * 1024 # follow mode read size per poll
+TOP_TEMPLATES = 200              # Space-Saving counters for error templates
+MAX_CLUSTERS = 5000              # templates the miner will hold
+CLUSTERS_PER_GROUP = 64
+TEMPLATE_SIMILARITY = 0.5
+
+EPOCH = datetime(1970, 1, 1)
+
+
+# -------------------------
+# Fast timestamp parsing
+# -------------------------
+@lru_cache(maxsize=4096)
+def _day_start(date_str):
+    """Epoch seconds at midnight of a YYYY-MM-DD string; raises on bad dates."""
+    day = datetime(int(date_str[:4]), int(date_str[5:7]), int(date_str[8:10]))
+    if date_str[4] != "-" or date_str[7] != "-":
+        raise ValueError(date_str)
+    return timegm(day.timetuple())
+
+
+def parse_timestamp(ts_str):
+    """
+    Epoch seconds for a fixed-layout "YYYY-MM-DD HH:MM:SS" string. Same
+    layout as TIME_FORMAT, but slices fields instead of calling strptime, and
+    caches the per-day offset since logs stay on one date for a long time.
+    """
+    if len(ts_str) != 19 or ts_str[10] != " " or ts_str[13] != ":" or ts_str[16] != ":":
+        raise ValueError(ts_str)
+    hour, minute, second = int(ts_str[11:13]), int(ts_str[14:16]), int(ts_str[17:19])
+    if hour > 23 or minute > 59 or second > 59:
+        raise ValueError(ts_str)
+    return _day_start(ts_str[:10]) + hour * 3600 + minute * 60 + second
+
+
+def split_line(line):
+    """(epoch_seconds, level, message) or None for lines that don't parse."""
+    try:
+        level, message = line[20:].strip().split(" ", 1)
+        return parse_timestamp(line[:19]), level, message
+    except ValueError:
+        return None
+
+
+# -------------------------
+# Message templates
+# -------------------------
+WILDCARD = "<*>"
+HAS_DIGIT = re.compile(r"\d")
+MASKS = [
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<UUID>"),
+    (re.compile(r"(?<![\w<])(?:[A-Za-z]:)?(?:[\\/][\w.\-]+)+[\\/]?"), "<PATH>"),
+    (re.compile(r"\b0[xX][0-9a-fA-F]+\b|\b(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{4,}\b"), "<HEX>"),
+    (re.compile(r"(?<![A-Za-z_])\d+(?:\.\d+)?"), "<NUM>"),
+]
+
+
+def mask_message(message):
+    for pattern, token in MASKS:
+        message = pattern.sub(token, message)
+    return message
+
+
+class TemplateMiner:
+    """
+    Drain-style clustering. Messages are masked and tokenised; clusters are
+    grouped by (token count, first token) and a message joins the group's
+    most similar template when at least TEMPLATE_SIMILARITY of its tokens
+    match. Past MAX_CLUSTERS, or CLUSTERS_PER_GROUP in a group, messages are
+    forced into the closest existing template (or one overflow template).
+    """
+
+    def __init__(self, max_clusters=MAX_CLUSTERS, similarity=TEMPLATE_SIMILARITY):
+        self.max_clusters = max_clusters
+        self.similarity = similarity
+        self.groups = {}           # (length, first token) -> [cluster id]
+        self.templates = []        # cluster id -> token list
+
+    def match(self, message):
+        """Cluster id for a raw message (or an already-mined template)."""
+        tokens = mask_message(message).split()
+        first = tokens[0] if tokens and not HAS_DIGIT.search(tokens[0]) else WILDCARD
+        key = (len(tokens), first)
+        group = self.groups.setdefault(key, [])
+
+        best, best_score = None, -1.0
+        for cluster in group:
+            template = self.templates[cluster]
+            same = sum(1 for a, b in zip(template, tokens) if a == b or a == WILDCARD)
+            score = same / len(tokens) if tokens else 1.0
+            if score > best_score:
+                best, best_score = cluster, score
+
+        full = len(group) >= CLUSTERS_PER_GROUP or len(self.templates) >= self.max_clusters
+        if best is not None and (best_score >= self.similarity or full):
+            template = self.templates[best]
+            for i, (a, b) in enumerate(zip(template, tokens)):
+                if a != b:
+                    template[i] = WILDCARD
+            return best
+        if full:
+            return self._overflow()
+
+        self.templates.append(tokens)
+        group.append(len(self.templates) - 1)
+        return len(self.templates) - 1
+
+    def _overflow(self):
+        key = (0, "<other>")
+        if key not in self.groups:
+            self.templates.append(["<other>"])
+            self.groups[key] = [len(self.templates) - 1]
+        return self.groups[key][0]
+
+    def template(self, cluster):
+        return " ".join(self.templates[cluster])
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters: at most `capacity` counters. A new key evicts
+    the smallest counter and inherits its count as overestimation error, so
+    every key with true frequency above total / capacity is guaranteed kept.
+    """
+
+    def __init__(self, capacity=TOP_TEMPLATES):
+        self.capacity = capacity
+        self.counts = {}           # key -> [count, error]
+        self.total = 0
+
+    def add(self, key, count=1, error=0):
+        self.total += count
+        entry = self.counts.get(key)
+        if entry is not None:
+            entry[0] += count
+            entry[1] += error
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = [count, error]
+            return
+        victim = min(self.counts, key=lambda k: self.counts[k][0])
+        floor = self.counts.pop(victim)[0]
+        self.counts[key] = [floor + count, floor + error]
+
+    def most_common(self, n=None):
+        ranked = sorted(self.counts.items(), key=lambda kv: kv[1][0], reverse=True)
+        return [(key, count, error) for key, (count, error) in ranked[:n]]
+
+
+class ErrorTemplates:
+    """Template miner + Space-Saving sketch; stands in for a Counter of messages."""
+
+    def __init__(self, capacity=TOP_TEMPLATES):
+        self.miner = TemplateMiner()
+        self.sketch = SpaceSaving(capacity)
+
+    def add(self, message, count=1, error=0):
+        self.sketch.add(self.miner.match(message), count, error)
+
+    def update(self, other):
+        """Merge another instance, e.g. from a streaming worker, by template text."""
+        for cluster, count, error in other.sketch.most_common():
+            self.add(other.miner.template(cluster), count, error)
+
+    def most_common(self, n=None):
+        """[(template, count, max overcount)] by estimated count."""
+        return [(self.miner.template(cluster), count, error)
+                for cluster, count, error in self.sketch.most_common(n)]
+
+
+# -------------------------
+# Spike detection
+# -------------------------
+def window_spikes(points, window, threshold=ERROR_SPIKE_THRESHOLD):
+    """
+    points: sorted (timestamp, count) pairs. For each point, count errors in
+    [timestamp, timestamp + window] with a two-pointer sweep, O(n) overall.
+    """
+    spikes = []
+    end = 0
+    in_window = 0
+    for ts, count in points:
+        limit = ts + window
+        while end < len(points) and points[end][0] <= limit:
+            in_window += points[end][1]
+            end += 1
+        if in_window >= threshold:
+            spikes.append((ts, in_window))
+        in_window -= count
+    return spikes
+
+
+class SpikeWindow:
+    """
+    Incremental window_spikes for points arriving in time order. A point is
+    reported once a later point shows its window has closed, so only the
+    points inside the current window are held.
+    """
+
+    def __init__(self, window=ERROR_WINDOW_SECONDS, threshold=ERROR_SPIKE_THRESHOLD):
+        self.window = window
+        self.threshold = threshold
+        self.points = deque()      # (ts, count), all within window of points[0]
+        self.total = 0
+
+    def add(self, ts, count=1):
+        spikes = []
+        if self.points and ts < self.points[-1][0]:
+            ts = self.points[-1][0]            # late line: count it with the newest second
+        while self.points and self.points[0][0] + self.window < ts:
+            spikes.extend(self._close())
+        if self.points and self.points[-1][0] == ts:
+            self.points[-1] = (ts, self.points[-1][1] + count)
+        else:
+            self.points.append((ts, count))
+        self.total += count
+        return spikes
+
+    def flush(self):
+        spikes = []
+        while self.points:
+            spikes.extend(self._close())
+        return spikes
+
+    def _close(self):
+        ts, count = self.points.popleft()
+        total = self.total
+        self.total -= count
+        return [(ts, total)] if total >= self.threshold else []
+
+
+class SpikeRuns:
+    """Merges spikes whose windows overlap into one (ts, count) at the run's peak."""
+
+    def __init__(self, window=ERROR_WINDOW_SECONDS):
+        self.window = window
+        self.runs = []
+        self.last = None
+
+    def extend(self, spikes):
+        for ts, count in spikes:
+            if self.last is not None and ts <= self.last + self.window:
+                if count > self.runs[-1][1]:
+                    self.runs[-1] = (ts, count)
+            else:
+                self.runs.append((ts, count))
+            self.last = ts
+
+
+class RollingCounts:
+    """
+    Per-level counts over the last `window` seconds of log time (inclusive,
+    like window_spikes), as a ring of one-second slots with running totals.
+    """
+
+    def __init__(self, window=ERROR_WINDOW_SECONDS):
+        self.span = window + 1
+        self.slots = [Counter() for _ in range(self.span)]
+        self.stamps = [None] * self.span
+        self.totals = Counter()
+        self.now = None
+
+    def advance(self, ts):
+        if self.now is not None and ts <= self.now:
+            return
+        first = ts - self.span + 1 if self.now is None else max(self.now + 1, ts - self.span + 1)
+        for sec in range(first, ts + 1):
+            i = sec % self.span
+            self.totals.subtract(self.slots[i])
+            self.slots[i].clear()
+            self.stamps[i] = sec
+        self.now = ts
+
+    def add(self, ts, level):
+        self.advance(ts)
+        if ts <= self.now - self.span:
+            return                             # older than the window
+        self.slots[ts % self.span][level] += 1
+        self.totals[level] += 1
+
+    def oldest(self, level):
+        """Earliest second in the window with a `level` line, or None."""
+        seconds = [self.stamps[i] for i in range(self.span) if self.slots[i][level]]
+        return min(seconds) if seconds else None
+
+
+# -------------------------
+# Follow mode
+# -------------------------
+class FileTailer:
+    """
+    Yields complete lines appended to `path`. A new inode at the path means
+    rotation: the old handle is read to its end, then the new file is read
+    from the start. A size below our offset means truncation: restart at 0.
+    """
+
+    def __init__(self, path, from_start=False):
+        self.path = path
+        self.f = None
+        self.inode = None
+        self.pos = 0
+        self.partial = b""
+        self.rotations = 0
+        self.truncations = 0
+        self.bytes_read = 0
+        self._open(seek_end=not from_start)
+
+    def _open(self, seek_end):
+        try:
+            self.f = open(self.path, "rb")
+        except FileNotFoundError:
+            self.f = None
+            return
+        st = os.fstat(self.f.fileno())
+        self.inode = (st.st_dev, st.st_ino)
+        self.pos = st.st_size if seek_end else 0
+        self.f.seek(self.pos)
+        self.partial = b""
+
+    def _read(self):
+        data = self.f.read(MAX_READ_BYTES)
+        if not data:
+            return []
+        self.pos += len(data)
+        self.bytes_read += len(data)
+        lines = (self.partial + data).split(b"\n")
+        self.partial = lines.pop()
+        return lines
+
+    def read_lines(self):
+        if self.f is None:
+            self._open(seek_end=False)             # file (re)appeared
+            if self.f is None:
+                return []
+
+        lines = self._read()
+        if lines:
+            return lines
+
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return lines                           # rotated away, not recreated yet
+
+        if (st.st_dev, st.st_ino) != self.inode:
+            if os.fstat(self.f.fileno()).st_size > self.pos:
+                return lines                       # old file still has data
+            tail = [self.partial] if self.partial else []
+            self.f.close()
+            self.rotations += 1
+            self._open(seek_end=False)
+            return tail + (self._read() if self.f else [])
+
+        if st.st_size < self.pos:
+            self.truncations += 1
+            self.f.seek(0)
+            self.pos = 0
+            self.partial = b""
+            return self._read()
+        return lines
+
+    def lag_bytes(self):
+        """Bytes written to the path that we haven't read yet."""
+        if self.f is None:
+            return 0
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return 0
+        if (st.st_dev, st.st_ino) != self.inode:
+            return os.fstat(self.f.fileno()).st_size - self.pos + st.st_size
+        return max(0, st.st_size - self.pos)
+
+    def close(self):
+        if self.f:
+            self.f.close()
+
+
+# -------------------------
+# Streaming workers
+# -------------------------
+def chunk_ranges(filepath, chunk_bytes=CHUNK_BYTES):
+    """Split a file into (start, end) byte ranges that begin on line starts."""
+    size = os.path.getsize(filepath)
+    ranges = []
+    with open(filepath, "rb") as f:
+        start = 0
+        while start < size:
+            f.seek(min(start + chunk_bytes, size))
+            f.readline()
+            end = min(f.tell(), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def scan_chunk(filepath, start, end):
+    """Parse one byte range; returns only aggregate counters."""
+    levels = Counter()
+    error_seconds = Counter()
+    error_messages = ErrorTemplates()
+    lines = bad = 0
+
+    with open(filepath, "rb") as f:
+        f.seek(start)
+        pos = start
+        for raw in f:
+            pos += len(raw)
+            lines += 1
+            parsed = split_line(raw.decode("utf-8", "replace").strip())
+            if parsed is None:
+                bad += 1
+            else:
+                ts, level, message = parsed
+                levels[level] += 1
+                if level == "ERROR":
+                    error_seconds[ts] += 1
+                    error_messages.add(message)
+            if pos >= end:
+                break
+
+    return {"lines": lines, "bad": bad, "levels": levels,
+            "error_seconds": sorted(error_seconds.items()),
+            "error_messages": error_messages}
 
 
 class LogAnalyzer:
     def __init__(self):
         self.level_count = Counter()
         self.errors = []
-        self.error_messages = Counter()
+        self.error_messages = ErrorTemplates()
+        self.spikes = None               # streaming/follow: (epoch, count)
+        self.stream_stats = None
+        self.follow_stats = None
 
     def parse_line(self, line):
-        try:
-            ts_str = line[:19]
-            rest = line[20:].strip()
-            level, message = rest.split(" ", 1)
-            timestamp = datetime.strptime(ts_str, TIME_FORMAT)
-            return timestamp, level, message
-        except Exception:
+        parsed = split_line(line)
+        if parsed is None:
             return None
+        ts, level, message = parsed
+        return EPOCH + timedelta(seconds=ts), level, message
 
     def process(self, filepath):
         with open(filepath, "r", encoding="utf-8") as f:
@@ -49,27 +504,122 @@ class LogAnalyzer:
 
                 if level == "ERROR":
                     self.errors.append(ts)
-                    self.error_messages[message] += 1
+                    self.error_messages.add(message)
 
-    def detect_error_spikes(self):
-        spikes = []
-        self.errors.sort()
+    def process_streaming(self, filepath, workers=None, chunk_bytes=CHUNK_BYTES):
+        """Parse byte ranges in a process pool and merge their counters."""
+        workers = workers or os.cpu_count() or 1
+        ranges = chunk_ranges(filepath, chunk_bytes)
+        started = time.perf_counter()
+        window = SpikeWindow()
+        spikes = SpikeRuns()
+        lines = bad = 0
+
+        def merge(result):
+            nonlocal lines, bad
+            lines += result["lines"]
+            bad += result["bad"]
+            self.level_count.update(result["levels"])
+            self.error_messages.update(result["error_messages"])
+            for ts, count in result["error_seconds"]:
+                spikes.extend(window.add(ts, count))
 
-        for i in range(len(self.errors)):
-            window_start = self.errors[i]
-            window_end = window_start + timedelta(seconds=ERROR_WINDOW_SECONDS)
-            count = 0
+        if workers == 1 or len(ranges) <= 1:
+            for start, end in ranges:
+                merge(scan_chunk(filepath, start, end))
+        else:
+            # results are merged in file order; cap in-flight chunks so a slow
+            # merge can't let finished results pile up
+            with ProcessPoolExecutor(workers) as pool:
+                pending = deque()
+                for start, end in ranges:
+                    pending.append(pool.submit(scan_chunk, filepath, start, end))
+                    if len(pending) >= workers * 2:
+                        merge(pending.popleft().result())
+                while pending:
+                    merge(pending.popleft().result())
+
+        spikes.extend(window.flush())
+        self.spikes = spikes.runs
+
+        elapsed = time.perf_counter() - started
+        self.stream_stats = {
+            "workers": workers,
+            "chunks": len(ranges),
+            "lines": lines,
+            "unparsed": bad,
+            "seconds": round(elapsed, 3),
+            "lines_per_s": round(lines / elapsed) if elapsed else 0,
+            "mb_per_s": round(os.path.getsize(filepath) / elapsed / 1e6, 1) if elapsed else 0,
+        }
+
+    def follow(self, filepath, poll=0.25, from_start=False, stats_interval=10.0, duration=None):
+        """Tail `filepath`, alerting on error spikes as lines arrive."""
+        tailer = FileTailer(filepath, from_start)
+        rolling = RollingCounts()
+        self.spikes = []
+        alerting = False
+        max_delay = 0.0
+        started = last_stats = time.monotonic()
+        lines_since = 0
+
+        try:
+            while True:
+                read_at = time.monotonic()
+                lines = tailer.read_lines()
+                for raw in lines:
+                    parsed = split_line(raw.decode("utf-8", "replace").strip())
+                    if parsed is None:
+                        continue
+                    ts, level, message = parsed
+                    self.level_count[level] += 1
+                    rolling.add(ts, level)
 
-            for j in range(i, len(self.errors)):
-                if self.errors[j] <= window_end:
-                    count += 1
-                else:
+                    if level == "ERROR":
+                        self.error_messages.add(message)
+                        if not alerting and rolling.totals["ERROR"] >= ERROR_SPIKE_THRESHOLD:
+                            alerting = True
+                            start = rolling.oldest("ERROR")
+                            self.spikes.append((start, rolling.totals["ERROR"]))
+                            max_delay = max(max_delay, time.monotonic() - read_at)
+                            print(f"⚠ ALERT {EPOCH + timedelta(seconds=ts)}: "
+                                  f"{rolling.totals['ERROR']} errors since "
+                                  f"{EPOCH + timedelta(seconds=start)}", flush=True)
+                    if alerting and rolling.totals["ERROR"] < ERROR_SPIKE_THRESHOLD:
+                        alerting = False
+                lines_since += len(lines)
+
+                now = time.monotonic()
+                if now - last_stats >= stats_interval:
+                    window = {lvl: n for lvl, n in rolling.totals.items() if n}
+                    print(f"[follow] {lines_since / (now - last_stats):.0f} lines/s, "
+                          f"lag {tailer.lag_bytes()} bytes, last {ERROR_WINDOW_SECONDS}s {window}, "
+                          f"rotations {tailer.rotations}, truncations {tailer.truncations}, "
+                          f"max alert delay {max_delay * 1000:.1f} ms", flush=True)
+                    last_stats, lines_since = now, 0
+                if duration is not None and now - started >= duration:
                     break
+                if not lines:
+                    time.sleep(poll)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            tailer.close()
+            self.follow_stats = {
+                "bytes_read": tailer.bytes_read,
+                "lag_bytes": tailer.lag_bytes(),
+                "rotations": tailer.rotations,
+                "truncations": tailer.truncations,
+                "max_alert_delay_ms": round(max_delay * 1000, 2),
+            }
 
-            if count >= ERROR_SPIKE_THRESHOLD:
-                spikes.append((window_start, count))
+    def detect_error_spikes(self):
+        if self.spikes is not None:
+            return [(EPOCH + timedelta(seconds=ts), count) for ts, count in self.spikes]
 
-        return spikes
+        self.errors.sort()
+        return window_spikes([(ts, 1) for ts in self.errors],
+                             timedelta(seconds=ERROR_WINDOW_SECONDS))
 
     def report(self):
         print("\n--- LOG ANALYSIS REPORT ---\n")
@@ -79,8 +629,9 @@ class LogAnalyzer:
             print(f"  {level}: {count}")
 
         print("\nMost Common Errors:")
-        for msg, count in self.error_messages.most_common(5):
-            print(f"  {count}x {msg}")
+        for template, count, error in self.error_messages.most_common(5):
+            bound = f" (±{error})" if error else ""
+            print(f"  {count}x{bound} {template}")
 
         spikes = self.detect_error_spikes()
         if spikes:
@@ -90,17 +641,45 @@ class LogAnalyzer:
         else:
             print("\nNo error spikes detected.")
 
+        if self.stream_stats:
+            stats = self.stream_stats
+            print(f"\nStreamed {stats['lines']} lines in {stats['chunks']} chunks "
+                  f"on {stats['workers']} workers: {stats['lines_per_s']} lines/s, "
+                  f"{stats['mb_per_s']} MB/s")
+
+        if self.follow_stats:
+            stats = self.follow_stats
+            print(f"\nFollowed {stats['bytes_read']} bytes, {stats['rotations']} rotations, "
+                  f"{stats['truncations']} truncations, lag {stats['lag_bytes']} bytes, "
+                  f"max alert delay {stats['max_alert_delay_ms']} ms")
+
         print("\n--- END REPORT ---\n")
 
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python log_analyzer.py <logfile>")
-        return
+    parser = argparse.ArgumentParser(description="Log analyzer and alert engine")
+    parser.add_argument("logfile")
+    parser.add_argument("--stream", action="store_true",
+                        help="parse byte-range chunks in a process pool")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / 1024 / 1024)
+    parser.add_argument("--follow", action="store_true", help="tail the file and alert live")
+    parser.add_argument("--from-start", action="store_true",
+                        help="follow mode: read existing content first")
+    parser.add_argument("--poll", type=float, default=0.25, help="follow mode poll seconds")
+    parser.add_argument("--stats-interval", type=float, default=10.0)
+    parser.add_argument("--duration", type=float, default=None,
+                        help="follow mode: stop after this many seconds")
+    args = parser.parse_args()
 
-    logfile = sys.argv[1]
     analyzer = LogAnalyzer()
-    analyzer.process(logfile)
+    if args.follow:
+        analyzer.follow(args.logfile, args.poll, args.from_start,
+                        args.stats_interval, args.duration)
+    elif args.stream:
+        analyzer.process_streaming(args.logfile, args.workers, int(args.chunk_mb * 1024 * 1024))
+    else:
+        analyzer.process(args.logfile)
     analyzer.report()
 
 
@@ -1,12 +1,42 @@
 # Project 95: Log File Analyzer + Anomaly Detector
+#
+# Run:
+#     python "95_ Log File Analyzer + Anomaly Detector.py" server.log
+#     python "95_ Log File Analyzer + Anomaly Detector.py" server.log --parser rows --no-cache
+#     python "95_ Log File Analyzer + Anomaly Detector.py" server.log --method seasonal --interval 15min
+#
+# load_logs reads the file in large blocks and splits fields with one regex
+# pass per block (pyarrow.compute when installed, pandas str.extract
+# otherwise), converting timestamps in bulk rather than per line. The parsed frame
+# is cached as Parquet next to the log, keyed by the file's mtime and size,
+# so a second run on an unchanged file skips parsing entirely.
+#
+# AnomalyEngine scores per-level and per-template counts in fixed intervals
+# against an EWMA or seasonal-median baseline; its state is saved beside the
+# cache so rerunning on a grown log only scores the appended lines.
 
 
+import os
 import re
+import json
+import hashlib
+import time
+import argparse
 import pandas as pd
 from collections import Counter
 from datetime import datetime
 
+try:
+    import pyarrow
+    import pyarrow.compute as pc
+except ImportError:
+    pyarrow = None
+    pc = None
+
 LOG_FILE = "server.log"
+BLOCK_BYTES = 64 * 1024 * 1024
+CACHE_DIR = ".log_cache"
+LINE_PATTERN = r"^(?P<Date>\d{4}-\d{2}-\d{2}) (?P<Time>\d{2}:\d{2}:\d{2}) (?P<Level>\w+) (?P<Message>.+)"
 
 # -----------------------------
 # Parse Log File
@@ -30,6 +60,102 @@ def parse_logs(file_path):
 
     return pd.DataFrame(records)
 
+# -----------------------------
+# Vectorized Parse + Parquet Cache
+# -----------------------------
+def read_blocks(file_path, block_bytes=BLOCK_BYTES):
+    """Yield decoded blocks of whole lines, about block_bytes each."""
+    with open(file_path, "rb") as file:
+        carry = b""
+        while True:
+            data = file.read(block_bytes)
+            if not data:
+                break
+            data = carry + data
+            cut = data.rfind(b"\n") + 1
+            if cut == 0:
+                carry = data
+                continue
+            carry = data[cut:]
+            yield data[:cut].decode("utf-8", errors="ignore")
+        if carry:
+            yield carry.decode("utf-8", errors="ignore")
+
+
+def parse_block(text):
+    if pc is not None:
+        return parse_block_arrow(text)
+    fields = pd.Series(text.splitlines()).str.strip().str.extract(LINE_PATTERN).dropna()
+    stamps = fields["Date"] + " " + fields["Time"]
+    timestamps = pd.to_datetime(stamps, format="%Y-%m-%d %H:%M:%S", errors="coerce")
+    frame = pd.DataFrame({
+        "Timestamp": timestamps,
+        "Level": fields["Level"],
+        "Message": fields["Message"],
+    })
+    # to_datetime accepts second 60 and rolls it into the next minute
+    valid = ((timestamps.dt.day == fields["Date"].str[8:10].astype(int))
+             & (timestamps.dt.second == fields["Time"].str[6:8].astype(int)))
+    return frame[valid]
+
+
+def parse_block_arrow(text):
+    lines = pc.utf8_trim_whitespace(pyarrow.array(text.splitlines(), pyarrow.string()))
+    fields = pc.extract_regex(lines, LINE_PATTERN)
+    fields = fields.filter(fields.is_valid())
+    stamps = pc.binary_join_element_wise(fields.field("Date"), fields.field("Time"), " ")
+    timestamps = pc.strptime(stamps, format="%Y-%m-%d %H:%M:%S", unit="s", error_is_null=True)
+    # strptime rolls day 30 of February and second 60 over instead of failing;
+    # keep only timestamps whose day and second match the text
+    valid = pc.and_(
+        pc.equal(pc.day(timestamps), pc.cast(pc.utf8_slice_codeunits(stamps, 8, 10), pyarrow.int64())),
+        pc.equal(pc.second(timestamps), pc.cast(pc.utf8_slice_codeunits(stamps, 17, 19), pyarrow.int64())),
+    )
+    valid = pc.fill_null(valid, False)
+    table = pyarrow.table({
+        "Timestamp": timestamps.cast(pyarrow.timestamp("us")),
+        "Level": fields.field("Level"),
+        "Message": fields.field("Message"),
+    })
+    return table.filter(valid).to_pandas()
+
+
+def parse_logs_vectorized(file_path, block_bytes=BLOCK_BYTES):
+    frames = [parse_block(text) for text in read_blocks(file_path, block_bytes)]
+    if not frames:
+        return pd.DataFrame(columns=["Timestamp", "Level", "Message"])
+    df = pd.concat(frames, ignore_index=True)
+    df["Level"] = df["Level"].astype("category")
+    return df
+
+
+def cache_path(file_path):
+    stat = os.stat(file_path)
+    folder = os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR)
+    name = os.path.basename(file_path)
+    return os.path.join(folder, f"{name}.{stat.st_mtime_ns}.{stat.st_size}.parquet")
+
+
+def load_logs(file_path, use_cache=True):
+    """Parsed log frame, from the Parquet cache when the file is unchanged."""
+    if not use_cache or pyarrow is None:
+        return parse_logs_vectorized(file_path)
+
+    cached = cache_path(file_path)
+    if os.path.exists(cached):
+        return pd.read_parquet(cached)
+
+    df = parse_logs_vectorized(file_path)
+    folder = os.path.dirname(cached)
+    os.makedirs(folder, exist_ok=True)
+    # only this log's entries: app.log must not remove app.log.1's cache
+    own = re.compile(re.escape(os.path.basename(file_path)) + r"\.\d+\.\d+\.parquet")
+    for entry in os.listdir(folder):
+        if own.fullmatch(entry):
+            os.remove(os.path.join(folder, entry))
+    df.to_parquet(cached, index=False)
+    return df
+
 # -----------------------------
 # Log Summary
 # -----------------------------
@@ -51,19 +177,331 @@ def frequent_errors(df, top_n=5):
 # Anomaly Detection (Spike in Errors)
 # -----------------------------
 def detect_anomalies(df, threshold=5):
-    df["Hour"] = df["Timestamp"].dt.hour
-    hourly_errors = df[df["Level"] == "ERROR"].groupby("Hour").size()
+    errors = df[df["Level"] == "ERROR"]
+    hourly_errors = errors.groupby(errors["Timestamp"].dt.hour).size()
 
     print("\n--- Anomaly Detection ---")
     for hour, count in hourly_errors.items():
         if count >= threshold:
             print(f"⚠ High error count at hour {hour}: {count} errors")
 
+# -----------------------------
+# Statistical Anomaly Engine
+# Buckets events per level and per message template and scores each
+# closed bucket against a baseline that is updated in place, so feeding
+# only the new rows is enough. The newest bucket stays open until later
+# data arrives. A line whose timestamp is more than max_skew away from the
+# median of its SKEW_CONTEXT neighbours on each side (a typo'd year, a
+# rolled-over date) is rejected so it can't drag the clock forward; a jump
+# in the last lines of a run is left unread until later lines confirm it.
+# Lines landing in an already scored bucket are counted and skipped.
+# -----------------------------
+TEMPLATE_MASKS = [
+    (r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b", "<UUID>"),
+    (r"(?:[A-Za-z]:)?(?:[\\/][\w.\-]+)+", "<PATH>"),
+    (r"\b0[xX][0-9a-fA-F]+\b|\b[0-9a-fA-F]{8,}\b", "<HEX>"),
+    (r"\b[A-Za-z_]+\d\w*\b", "<ID>"),
+    (r"\d+(?:\.\d+)?", "<NUM>"),
+]
+TEMPLATE_LEVELS = ("ERROR", "WARN")
+MAX_TEMPLATE_SERIES = 100
+MAX_ANOMALIES = 200
+FINGERPRINT_BYTES = 4096
+SKEW_CONTEXT = 50
+
+
+def message_templates(messages):
+    """Mask ids, paths and numbers; regexes run once per distinct message."""
+    codes, uniques = pd.factorize(messages)
+    masked = pd.Series(uniques, dtype="str")
+    for pattern, token in TEMPLATE_MASKS:
+        masked = masked.str.replace(pattern, token, regex=True)
+    return pd.Series(masked.to_numpy()[codes], index=messages.index)
+
+
+class AnomalyEngine:
+    """
+    method="ewma": z = (count - mean) / std of an exponentially weighted
+    mean/variance per series. method="seasonal": z against the median (and
+    MAD) of the same bucket-of-day over the last `seasons` days.
+    """
+
+    def __init__(self, interval="5min", method="ewma", alpha=0.3, z_threshold=3.0,
+                 min_history=12, season="1D", seasons=7, max_skew="1h"):
+        self.interval = pd.Timedelta(interval)
+        self.method = method
+        self.alpha = alpha
+        self.z_threshold = z_threshold
+        self.min_history = min_history
+        self.slots = int(pd.Timedelta(season) / self.interval)
+        self.seasons = seasons
+        self.max_skew = pd.Timedelta(max_skew)
+        self.series = {}           # "level:ERROR" / "template:..." -> baseline state
+        self.slot_seen = {}        # seasonal: slot -> buckets closed in that slot
+        self.buckets_closed = 0
+        self.last_bucket = None    # newest closed bucket
+        self.open_bucket = None
+        self.open_counts = {}
+        self.rows_seen = 0
+        self.recent = []           # seconds of the last SKEW_CONTEXT accepted rows
+        self.late_rows = 0         # rows whose bucket was already scored
+        self.skewed_rows = 0       # rows rejected as out of order
+        self.deferred_rows = 0     # rows left for the next update
+        self.anomalies = []
+
+    # -- input --
+    def update(self, df, final=False):
+        """
+        Feed rows not seen yet; returns anomalies from buckets closed by them.
+        Unless final, a trailing jump may be left unread (see deferred_rows);
+        rows_seen only counts the rows consumed.
+        """
+        df = self._drop_skewed(df, final)
+        if self.last_bucket is not None:
+            late = df["Timestamp"].dt.floor(self.interval) <= self.last_bucket
+            self.late_rows += int(late.sum())
+            df = df[~late]
+        buckets = df["Timestamp"].dt.floor(self.interval)
+        keys = [("level:" + df["Level"].astype(str), buckets)]
+        picked = df["Level"].isin(TEMPLATE_LEVELS)
+        if picked.any():
+            templates = message_templates(df.loc[picked, "Message"])
+            keys.append((self._template_keys(templates), buckets[picked]))
+
+        counts = {}
+        for key, bucket in keys:
+            grouped = pd.DataFrame({"key": key, "bucket": bucket}).groupby(["bucket", "key"]).size()
+            for (bucket_ts, series_key), count in grouped.items():
+                counts.setdefault(bucket_ts, {})
+                counts[bucket_ts][series_key] = counts[bucket_ts].get(series_key, 0) + int(count)
+
+        if self.open_bucket is not None:
+            pending = counts.setdefault(self.open_bucket, {})
+            for series_key, count in self.open_counts.items():
+                pending[series_key] = pending.get(series_key, 0) + count
+
+        found = []
+        if counts:
+            newest = max(counts)
+            bucket_ts = min(counts) if self.last_bucket is None else self.last_bucket + self.interval
+            while bucket_ts < newest or (final and bucket_ts == newest):
+                found.extend(self._close(bucket_ts, counts.get(bucket_ts, {})))
+                bucket_ts += self.interval
+            self.open_bucket = None if final else newest
+            self.open_counts = {} if final else counts[newest]
+
+        self.anomalies = sorted(self.anomalies + found, key=lambda a: a["score"],
+                                reverse=True)[:MAX_ANOMALIES]
+        return sorted(found, key=lambda a: a["score"], reverse=True)
+
+    def _drop_skewed(self, df, final):
+        seconds = (df["Timestamp"] - pd.Timestamp(0)) / pd.Timedelta(seconds=1)
+        context = pd.Series(self.recent, dtype="float64")
+        window = pd.concat([context, seconds], ignore_index=True)
+        median = window.rolling(2 * SKEW_CONTEXT + 1, center=True, min_periods=1).median()
+        offset = seconds.to_numpy() - median.to_numpy()[len(context):]
+        limit = self.max_skew.total_seconds()
+        ahead, behind = offset > limit, offset < -limit
+
+        consumed = len(df)
+        if not final:
+            # too few later rows to tell a real gap in the log from a bad line
+            unconfirmed = ahead[-SKEW_CONTEXT:].nonzero()[0]
+            if len(unconfirmed):
+                consumed = max(0, len(df) - SKEW_CONTEXT) + int(unconfirmed[0])
+        self.deferred_rows = len(df) - consumed
+        self.rows_seen += consumed
+
+        skewed = (ahead | behind)[:consumed]
+        self.skewed_rows += int(skewed.sum())
+        kept = ~skewed
+        self.recent = (self.recent + seconds.iloc[:consumed][kept].iloc[-SKEW_CONTEXT:].tolist())[-SKEW_CONTEXT:]
+        return df.iloc[:consumed][kept]
+
+    def _template_keys(self, templates):
+        known = {key[len("template:"):] for key in self.series if key.startswith("template:")}
+        room = MAX_TEMPLATE_SERIES - len(known)
+        for template in templates.value_counts().index:
+            if template not in known:
+                if room <= 0:
+                    break
+                known.add(template)
+                room -= 1
+        return "template:" + templates.where(templates.isin(known), "<other>")
+
+    # -- scoring --
+    def _close(self, bucket_ts, counts):
+        slot = int((bucket_ts - pd.Timestamp(0)) / self.interval) % self.slots
+        found = []
+        for key in set(self.series) | set(counts):
+            state = self.series.get(key)
+            if state is None:
+                # a series seen for the first time was zero in every earlier bucket
+                state = self.series[key] = {"mean": 0.0, "var": 0.0, "n": self.buckets_closed,
+                                            "history": {}}
+            count = counts.get(key, 0)
+            baseline, spread = self._baseline(state, slot)
+            if baseline is not None:
+                score = (count - baseline) / spread
+                if score >= self.z_threshold:
+                    found.append({
+                        "bucket": bucket_ts.isoformat(),
+                        "series": key,
+                        "count": count,
+                        "baseline": round(baseline, 2),
+                        "score": round(score, 2),
+                    })
+            self._learn(state, slot, count)
+        self.slot_seen[slot] = self.slot_seen.get(slot, 0) + 1
+        self.buckets_closed += 1
+        self.last_bucket = bucket_ts
+        return found
+
+    def _baseline(self, state, slot):
+        if self.method == "ewma":
+            if state["n"] < self.min_history:
+                return None, None
+            mean = state["mean"]
+            return mean, max(state["var"] ** 0.5, max(mean, 1.0) ** 0.5)
+
+        seen = min(self.seasons, self.slot_seen.get(slot, 0))
+        if seen < 2:
+            return None, None
+        history = state["history"].get(str(slot), [])
+        values = sorted(history + [0] * (seen - len(history)))
+        median = values[len(values) // 2]
+        mad = sorted(abs(v - median) for v in values)[len(values) // 2]
+        return median, max(1.4826 * mad, max(median, 1.0) ** 0.5)
+
+    def _learn(self, state, slot, count):
+        diff = count - state["mean"]
+        state["mean"] += self.alpha * diff
+        state["var"] = (1 - self.alpha) * (state["var"] + self.alpha * diff * diff)
+        state["n"] += 1
+        if self.method == "seasonal":
+            history = state["history"].setdefault(str(slot), [])
+            history.append(count)
+            del history[:-self.seasons]
+
+    # -- persistence --
+    def state(self):
+        return {
+            "interval": str(self.interval), "method": self.method, "alpha": self.alpha,
+            "z_threshold": self.z_threshold, "min_history": self.min_history,
+            "slots": self.slots, "seasons": self.seasons, "max_skew": str(self.max_skew),
+            "series": self.series, "slot_seen": self.slot_seen,
+            "buckets_closed": self.buckets_closed, "rows_seen": self.rows_seen,
+            "recent": self.recent, "late_rows": self.late_rows, "skewed_rows": self.skewed_rows,
+            "last_bucket": self.last_bucket.isoformat() if self.last_bucket is not None else None,
+            "open_bucket": self.open_bucket.isoformat() if self.open_bucket is not None else None,
+            "open_counts": self.open_counts, "anomalies": self.anomalies,
+        }
+
+    @classmethod
+    def from_state(cls, data):
+        engine = cls(data["interval"], data["method"], data["alpha"], data["z_threshold"],
+                     data["min_history"], pd.Timedelta(data["interval"]) * data["slots"],
+                     data["seasons"], data["max_skew"])
+        engine.series = data["series"]
+        engine.slot_seen = {int(k): v for k, v in data["slot_seen"].items()}
+        engine.buckets_closed = data["buckets_closed"]
+        engine.rows_seen = data["rows_seen"]
+        engine.recent = data["recent"]
+        engine.late_rows = data["late_rows"]
+        engine.skewed_rows = data["skewed_rows"]
+        engine.last_bucket = pd.Timestamp(data["last_bucket"]) if data["last_bucket"] else None
+        engine.open_bucket = pd.Timestamp(data["open_bucket"]) if data["open_bucket"] else None
+        engine.open_counts = data["open_counts"]
+        engine.anomalies = data["anomalies"]
+        return engine
+
+
+def state_path(file_path, engine):
+    folder = os.path.join(os.path.dirname(os.path.abspath(file_path)), CACHE_DIR)
+    name = os.path.basename(file_path)
+    return os.path.join(folder, f"{name}.anomaly-{engine.method}-{int(engine.interval.total_seconds())}s.json")
+
+
+def head_fingerprint(file_path, length):
+    with open(file_path, "rb") as file:
+        return hashlib.blake2b(file.read(length), digest_size=16).hexdigest()
+
+
+def score_logs(df, file_path, engine, persist=True):
+    """
+    Run the engine over rows it hasn't seen. With persist, its state is kept
+    next to the Parquet cache, so on an appended log only new rows are
+    bucketed and scored. The state is only resumed when the file still
+    starts with the same bytes; a rotated or rewritten log starts over.
+    """
+    path = state_path(file_path, engine)
+    size = os.path.getsize(file_path)
+    head_bytes = min(size, FINGERPRINT_BYTES)
+    if persist and os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as file:
+            saved = json.load(file)
+        same_file = (saved.get("head_bytes") is not None
+                     and saved["head_bytes"] <= size
+                     and head_fingerprint(file_path, saved["head_bytes"]) == saved["head"])
+        if same_file and saved["file_size"] <= size and saved["engine"]["rows_seen"] <= len(df):
+            z_threshold, max_skew = engine.z_threshold, engine.max_skew
+            engine = AnomalyEngine.from_state(saved["engine"])
+            engine.z_threshold, engine.max_skew = z_threshold, max_skew
+
+    new_rows = df.iloc[engine.rows_seen:]
+    found = engine.update(new_rows) if len(new_rows) else []
+
+    if persist:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump({
+                "file_size": size,
+                "head_bytes": head_bytes,
+                "head": head_fingerprint(file_path, head_bytes),
+                "engine": engine.state(),
+            }, file)
+    return engine, found, len(new_rows)
+
+
+def report_statistical_anomalies(engine, found, new_rows, top_n=10):
+    width = int(engine.interval.total_seconds())
+    print(f"\n--- Statistical Anomalies ({engine.method}, {width}s buckets) ---")
+    print(f"Scored {new_rows} new lines; {engine.buckets_closed} buckets closed, "
+          f"{len(engine.series)} series, {len(found)} new anomalies")
+    if engine.skewed_rows or engine.late_rows:
+        print(f"Skipped {engine.skewed_rows} lines more than {engine.max_skew} out of order "
+              f"with their neighbours, {engine.late_rows} lines in already scored buckets")
+    if engine.deferred_rows:
+        print(f"Held back {engine.deferred_rows} trailing lines after a time jump "
+              f"until later lines confirm it")
+    for anomaly in engine.anomalies[:top_n]:
+        print(f"⚠ z={anomaly['score']:>6} {anomaly['bucket']} {anomaly['series']}: "
+              f"{anomaly['count']} vs baseline {anomaly['baseline']}")
+
 # -----------------------------
 # MAIN
 # -----------------------------
 def main():
-    df = parse_logs(LOG_FILE)
+    parser = argparse.ArgumentParser(description="Log file analyzer and anomaly detector")
+    parser.add_argument("logfile", nargs="?", default=LOG_FILE)
+    parser.add_argument("--parser", choices=["vectorized", "rows"], default="vectorized")
+    parser.add_argument("--no-cache", action="store_true", help="always re-parse the file")
+    parser.add_argument("--interval", default="5min", help="bucket width, e.g. 1min, 15min, 1h")
+    parser.add_argument("--method", choices=["ewma", "seasonal"], default="ewma")
+    parser.add_argument("--z", type=float, default=3.0, help="score needed to flag a bucket")
+    parser.add_argument("--max-skew", default="1h",
+                        help="reject lines this far out of order with their neighbours")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--reset-state", action="store_true",
+                        help="ignore saved engine state and rescore the whole log")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.parser == "rows":
+        df = parse_logs(args.logfile)
+    else:
+        df = load_logs(args.logfile, use_cache=not args.no_cache)
+    print(f"Loaded {len(df)} log lines in {time.perf_counter() - started:.2f}s")
 
     if df.empty:
         print("No valid log data found.")
@@ -73,5 +511,13 @@ def main():
     frequent_errors(df)
     detect_anomalies(df)
 
+    engine = AnomalyEngine(args.interval, args.method, z_threshold=args.z, max_skew=args.max_skew)
+    if args.reset_state:
+        path = state_path(args.logfile, engine)
+        if os.path.exists(path):
+            os.remove(path)
+    engine, found, new_rows = score_logs(df, args.logfile, engine, persist=not args.no_cache)
+    report_statistical_anomalies(engine, found, new_rows, args.top)
+
 if __name__ == "__main__":
     main()
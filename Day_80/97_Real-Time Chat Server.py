@@ -1,7 +1,17 @@
 # Project 97: Real-Time Chat Server
 ##################################### #######  server.py  ##################################### #######      
 
+#
+# Two server modes:
+#   --mode selectors (default)  one thread, non-blocking sockets on an epoll/kqueue
+#                               selector, newline-framed messages, per-connection
+#                               write buffers, O(1) disconnects
+#   --mode threads              the original thread-per-client server
+
 import socket
+import argparse
+import resource
+import selectors
 import threading
 
 HOST = "127.0.0.1"
@@ -40,7 +50,7 @@ def receive():
         print(f"Connected with {str(address)}")
 
         client.send("NICK".encode("utf-8"))
-        nickname = client.recv(1024).decode("utf-8")
+        nickname = client.recv(1024).decode("utf-8").strip()
         nicknames.append(nickname)
         clients.append(client)
 
@@ -50,8 +60,160 @@ def receive():
         thread = threading.Thread(target=handle_client, args=(client,))
         thread.start()
 
+# ---------------- event-loop mode ----------------
+
+MAX_LINE = 64 * 1024          # longest message before the client is dropped
+MAX_OUTBUF = 1024 * 1024      # unsent bytes allowed per client before it is dropped
+
+
+class Connection:
+    __slots__ = ("sock", "nickname", "inbuf", "outbuf", "writing")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.nickname = None
+        self.inbuf = b""
+        self.outbuf = bytearray()
+        self.writing = False
+
+
+class EventLoopServer:
+    def __init__(self, host=HOST, port=PORT):
+        self.host = host
+        self.port = port
+        self.sel = selectors.DefaultSelector()
+        self.conns = {}        # socket -> Connection, so removal is O(1)
+        self.pending = set()   # connections with unsent output this iteration
+
+    def serve_forever(self):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        listener.bind((self.host, self.port))
+        listener.listen(1024)
+        listener.setblocking(False)
+        self.sel.register(listener, selectors.EVENT_READ, None)
+
+        print("Server started (selectors)...")
+
+        while True:
+            for key, mask in self.sel.select():
+                conn = key.data
+                if conn is None:
+                    self.accept(key.fileobj)
+                    continue
+                if mask & selectors.EVENT_READ:
+                    self.on_readable(conn)
+                if mask & selectors.EVENT_WRITE and conn.sock in self.conns:
+                    self.flush(conn)
+            # one send() per connection per round, however many broadcasts
+            # were queued for it; flushing can queue more (a drop() inside
+            # flush() announces the departure), so repeat until nothing is
+            # left rather than waiting for the next select() wake-up
+            while self.pending:
+                pending, self.pending = self.pending, set()
+                for conn in pending:
+                    if conn.sock in self.conns and not conn.writing:
+                        self.flush(conn)
+
+    def accept(self, listener):
+        while True:
+            try:
+                client, address = listener.accept()
+            except BlockingIOError:
+                return
+            client.setblocking(False)
+            conn = Connection(client)
+            self.conns[client] = conn
+            self.sel.register(client, selectors.EVENT_READ, conn)
+            self.queue(conn, "NICK".encode("utf-8"))
+
+    def on_readable(self, conn):
+        try:
+            data = conn.sock.recv(65536)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.drop(conn)
+            return
+
+        *lines, conn.inbuf = (conn.inbuf + data).split(b"\n")
+        for line in lines:
+            self.on_line(conn, line.rstrip(b"\r"))
+            if conn.sock not in self.conns:
+                return
+        if len(conn.inbuf) > MAX_LINE:
+            self.drop(conn)
+
+    def on_line(self, conn, line):
+        if conn.nickname is None:
+            conn.nickname = line.decode("utf-8", "replace").strip() or f"user{conn.sock.fileno()}"
+            print(f"Nickname is {conn.nickname}")
+            self.broadcast(f"{conn.nickname} joined the chat!\n".encode("utf-8"))
+        else:
+            self.broadcast(line + b"\n")
+
+    def broadcast(self, message):
+        for conn in list(self.conns.values()):
+            if conn.nickname is not None:
+                self.queue(conn, message)
+
+    def queue(self, conn, data):
+        if conn.sock not in self.conns:
+            return
+        conn.outbuf += data
+        if len(conn.outbuf) > MAX_OUTBUF:
+            self.drop(conn)
+        else:
+            self.pending.add(conn)
+
+    def flush(self, conn):
+        try:
+            sent = conn.sock.send(conn.outbuf)
+        except BlockingIOError:
+            return
+        except OSError:
+            self.drop(conn)
+            return
+        del conn.outbuf[:sent]
+        # wait for EVENT_WRITE only while the kernel buffer is full
+        if conn.outbuf and not conn.writing:
+            conn.writing = True
+            self.sel.modify(conn.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, conn)
+        elif not conn.outbuf and conn.writing:
+            conn.writing = False
+            self.sel.modify(conn.sock, selectors.EVENT_READ, conn)
+
+    def drop(self, conn):
+        if self.conns.pop(conn.sock, None) is None:
+            return
+        self.sel.unregister(conn.sock)
+        conn.sock.close()
+        if conn.nickname is not None:
+            self.broadcast(f"{conn.nickname} left the chat.\n".encode("utf-8"))
+
+
+def raise_fd_limit():
+    # 10k idle clients need 10k descriptors
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
 if __name__ == "__main__":
-    receive()
+    parser = argparse.ArgumentParser(description="Real-time chat server")
+    parser.add_argument("--mode", choices=["selectors", "threads"], default="selectors")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    args = parser.parse_args()
+    HOST, PORT = args.host, args.port
+
+    if args.mode == "threads":
+        receive()
+    else:
+        raise_fd_limit()
+        EventLoopServer(args.host, args.port).serve_forever()
 
 
 
@@ -75,9 +237,9 @@ def receive():
         try:
             message = client.recv(1024).decode("utf-8")
             if message == "NICK":
-                client.send(nickname.encode("utf-8"))
+                client.send(f"{nickname}\n".encode("utf-8"))
             else:
-                print(message)
+                print(message.rstrip("\n"))
         except:
             print("Disconnected from server.")
             client.close()
@@ -85,7 +247,7 @@ def receive():
 
 def write():
     while True:
-        message = f"{nickname}: {input('')}"
+        message = f"{nickname}: {input('')}\n"
         client.send(message.encode("utf-8"))
 
 receive_thread = threading.Thread(target=receive)